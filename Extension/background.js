@@ -72,10 +72,7 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
         // If all validations pass, proceed with sending data
         console.log('All data validated, proceeding with sending...');
 
-        await sendChatbot(difyData.ids, difyData.riskAssessment, difyData.riskNotification, difyData.recentChat, difyData.contextChat);
-        await sendConversation(difyData.ids, difyData.riskAssessment, difyData.riskNotification, difyData.recentChat, difyData.contextChat);
-        await sendMessage(difyData.ids, difyData.riskAssessment, difyData.riskNotification, difyData.recentChat, difyData.contextChat);
-        await sendAlert(difyData.ids, difyData.riskAssessment, difyData.riskNotification, difyData.recentChat, difyData.contextChat);
+        await sendBatch(difyData.ids, difyData.riskAssessment, difyData.riskNotification, difyData.recentChat, difyData.contextChat);
         
         
         
@@ -190,153 +187,96 @@ async function sendToDifyAPI(messages, pendingMessage) {
     console.log('Starting sendToDifyAPI process...');
     console.log('Input messages:', messages);
 
-    const maxRetries = 3;
-    let currentTry = 0;
-    let data;
-    let riskAssessment, riskNotification;
-    let ids;
-    let recentChat, contextChat;
+    // Split messages into recent and context
+    const recent_message = messages.slice(-2);
+    const context = messages.slice(0, -2);
+    
+    // Convert both to strings
+    const recentChat = recent_message.map(msg => 
+      `${msg.sender_type}: ${msg.content}`
+    ).join('\n');
+    
+    const contextChat = context.map(msg => 
+      `${msg.sender_type}: ${msg.content}`
+    ).join('\n');
+
+    console.log('Processed messages:', {
+      recentChat,
+      contextChat,
+      recentMessageCount: recent_message.length,
+      contextMessageCount: context.length
+    });
 
-    while (currentTry < maxRetries) {
-      currentTry++;
-      console.log(`Attempt ${currentTry} of ${maxRetries}`);
+    // Get current user IDs
+    console.log('Fetching user IDs...');
+    const { userId, childUserId } = await getCurrentUserIds();
+    console.log('Current user IDs:', { userId, childUserId });
 
-      // Split messages into recent and context
-      const recent_message = messages.slice(-2);
-      const context = messages.slice(0, -2);
-      
-      // Convert both to strings
-      recentChat = recent_message.map(msg => 
-        `${msg.sender_type}: ${msg.content}`
-      ).join('\n');
-      
-      contextChat = context.map(msg => 
-        `${msg.sender_type}: ${msg.content}`
-      ).join('\n');
-
-      console.log('Processed messages:', {
-        recentChat,
-        contextChat,
-        recentMessageCount: recent_message.length,
-        contextMessageCount: context.length
-      });
+    // Get IDs first
+    console.log('Generating IDs from backend...');
+    const idsResponse = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/ids/generate', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      },
+      body: JSON.stringify({
+        userId,
+        childUserId,
+        platform: "CharacterAI"
+      })
+    });
 
-      // Get current user IDs
-      console.log('Fetching user IDs...');
-      const { userId, childUserId } = await getCurrentUserIds();
-      console.log('Current user IDs:', { userId, childUserId });
-
-      // Get IDs first
-      console.log('Generating IDs from backend...');
-      const idsResponse = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/ids/generate', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
-        },
-        body: JSON.stringify({
-          userId,
-          childUserId,
-          platform: "CharacterAI"
-        })
+    if (!idsResponse.ok) {
+      const errorText = await idsResponse.text();
+      console.error('ID generation failed:', {
+        status: idsResponse.status,
+        statusText: idsResponse.statusText,
+        errorText
       });
+      throw new Error(`Failed to generate IDs: ${idsResponse.status} - ${errorText}`);
+    }
 
-      if (!idsResponse.ok) {
-        const errorText = await idsResponse.text();
-        console.error('ID generation failed:', {
-          status: idsResponse.status,
-          statusText: idsResponse.statusText,
-          errorText
-        });
-        throw new Error(`Failed to generate IDs: ${idsResponse.status} - ${errorText}`);
-      }
+    const ids = await idsResponse.json();
+    console.log('Successfully generated IDs:', ids);
 
-      ids = await idsResponse.json();
-      console.log('Successfully generated IDs:', ids);
+    // The backend calls the risk model (retrying empty outputs) and caches the result
+    console.log('Requesting risk assessment from backend...');
+    const response = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/risk/assess', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      },
+      body: JSON.stringify({
+        contextChat: contextChat,
+        recentChat: recentChat,
+        character_profile: "default",
+        user: userId
+      })
+    });
 
-      // Call Dify API
-      console.log('Calling Dify API...');
-      const response = await fetch('[YOUR_DIFY_API_URL]', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': '[YOUR_DIFY_API_KEY]'
-        },
-        body: JSON.stringify({
-          inputs: {
-            contextChat: contextChat,
-            recentChat: recentChat,
-            character_profile: "default"
-          },
-          response_mode: "blocking",
-          user: userId
-        })
+    if (!response.ok) {
+      const errorText = await response.text();
+      console.error('Risk assessment error:', {
+        status: response.status,
+        statusText: response.statusText,
+        errorText
       });
-
-      if (!response.ok) {
-        const errorText = await response.text();
-        console.error('Dify API Error:', {
-          status: response.status,
-          statusText: response.statusText,
-          errorText
-        });
-        throw new Error(`Dify API error! status: ${response.status}, response: ${errorText}`);
-      }
-
-      const responseText = await response.text();
-      console.log('Raw Dify API Response:', responseText);
-
-      try {
-        data = JSON.parse(responseText);
-      } catch (parseError) {
-        console.error('Failed to parse Dify API response:', {
-          responseText,
-          parseError
-        });
-        throw new Error(`Failed to parse Dify API response: ${parseError.message}`);
-      }
-
-      console.log('Parsed Dify API Response:', data);
-
-      // Check if response contains valid data
-      if (!data.data?.outputs?.['Risk Assessment'] || data.data.outputs['Risk Assessment'] === '' ||
-          !data.data?.outputs?.['Risk Notification'] || data.data.outputs['Risk Notification'] === '') {
-        console.log(`Empty response received on attempt ${currentTry}, retrying...`);
-        await new Promise(resolve => setTimeout(resolve, 2000 * currentTry));
-        continue;
-      }
-
-      // If we get here, we have valid data
-      try {
-        riskAssessment = JSON.parse(data.data.outputs['Risk Assessment']);
-        riskNotification = JSON.parse(data.data.outputs['Risk Notification']);
-        break;
-      } catch (parseError) {
-        console.error('Failed to parse risk data:', {
-          outputs: data.data?.outputs,
-          parseError
-        });
-        if (currentTry === maxRetries) {
-          throw new Error(`Failed to parse risk data: ${parseError.message}`);
-        }
-        await new Promise(resolve => setTimeout(resolve, 2000 * currentTry));
-        continue;
-      }
+      throw new Error(`Risk assessment error! status: ${response.status}, response: ${errorText}`);
     }
 
-    if (currentTry >= maxRetries && (!riskAssessment || !riskNotification)) {
-      throw new Error(`Failed to get valid response from Dify API after ${maxRetries} attempts`);
-    }
-
-    console.log('Successfully received and parsed risk data:', {
-      assessment: riskAssessment,
-      notification: riskNotification
+    const data = await response.json();
+    console.log('Successfully received risk data:', {
+      assessment: data.riskAssessment,
+      notification: data.riskNotification,
+      cached: data.cached
     });
 
     return {
       ids: ids,
-      riskAssessment: riskAssessment,
-      riskNotification: riskNotification,
+      riskAssessment: data.riskAssessment,
+      riskNotification: data.riskNotification,
       recentChat: recentChat,
       contextChat: contextChat
     };
@@ -405,85 +345,51 @@ function extractMessages() {
   };
 } 
 
-async function sendToBackend(Data, dataType) {
-  try {
-    console.log('Attempting to send data to backend...');
-    console.log(dataType);
-    let response;
-    if (dataType === 'alert') {
-      response = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/alerts/receive', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
-        },
-        body: JSON.stringify(Data)
-    });
-    }
-    else if (dataType === 'conversation') {
-      response = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/conversations/receive', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
-      },
-      body: JSON.stringify(Data)
-    });
-    }
-    else if (dataType === 'message') {
-      response = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/messages/receive', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
-        },
-        body: JSON.stringify(Data)
-      });
-    }
-    else if (dataType === 'chatbot') {
-      response = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/chatbots/receive', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
+// Sends the chatbot, conversation, message and alert of one analyzed turn in a single request
+async function sendBatch(ids, riskAssessment, riskNotification, recentChat, contextChat) {
+  const timestamp = new Date().toISOString();
+  const records = [
+    {
+      type: 'chatbot',
+      data: {
+        chatbot_id: ids.chatbotId,
+        name: 'testBot',
+        metadata: {
+          "version": "1.0",
+          "language": "en"
         },
-        body: JSON.stringify(Data)
-      });
-    }
-
-    if (!response.ok) {
-      const errorText = await response.text();
-      console.error('Backend Error Details:', {
-        status: response.status,
-        statusText: response.statusText,
-        body: errorText,
-        sentData: Data
-      });
-      throw new Error(`HTTP error! status: ${response.status}`);
-    }
-
-    const result = await response.json();
-    console.log('Successfully sent to backend:', result);
-    return result;
-
-  } catch (error) {
-    console.error('Error sending to backend:', {
-      message: error.message,
-      stack: error.stack
-    });
-    throw error;
-  }
-}
-
-async function sendAlert(ids, riskAssessment, riskNotification, recentChat, contextChat) {
-      if (!ids) {
-        console.error('IDs object is undefined');
-        return;
+        chatbotPlatform: "CharacterAI"
       }
-  
-  // Prepare data for backend
-      console.log('Preparing alert data...');
-      const alertData = {
+    },
+    {
+      type: 'conversation',
+      data: {
+        user: "extension-user",
+        conversation_id: ids.conversationId,
+        child_user_id: 3,
+        chatbot_id: ids.chatbotId,
+        start_time: timestamp,
+        end_time: timestamp,
+        conversation_topic: riskNotification.conversation_topic,
+        conversation_summary: riskNotification.conversation_summary,
+        messages: contextChat,
+        platform: "CharacterAI"
+      }
+    },
+    {
+      type: 'message',
+      data: {
+        message_id: ids.messageId,
+        conversation_id: ids.conversationId,
+        sender: "extension-user",
+        message_text: recentChat,
+        timestamp: timestamp,
+        sender_type: "CharacterAI"
+      }
+    },
+    {
+      type: 'alert',
+      data: {
         user: "extension-user",
         alert_type: "risk_assessment",
         alert_details: JSON.stringify({
@@ -493,98 +399,37 @@ async function sendAlert(ids, riskAssessment, riskNotification, recentChat, cont
           riskLevel: riskAssessment.risk_level,
           riskType: riskAssessment.risk_type,
           riskyReason: riskAssessment.risky_reason,
-          timestamp: new Date().toISOString(),
+          timestamp: timestamp,
           messages: recentChat
         })
-      };
-      console.log('Alert data prepared:', alertData);
-      console.log('Sending alert to backend...');
-      await sendToBackend(alertData, 'alert');
-      console.log('Alert sent successfully');
-}
-
-async function sendConversation(ids, riskAssessment, riskNotification, recentChat, contextChat) {
-  console.log('Preparing conversation data...');
-  const conversationData = {
-    conversation_id: ids.conversationId,
-    child_user_id: 3,
-    chatbot_id: ids.chatbotId,
-    start_time: new Date().toISOString(),
-    end_time: new Date().toISOString(),
-    conversation_topic: riskNotification.conversation_topic,
-    conversation_summary: riskNotification.conversation_summary,
-    messages: contextChat,
-    platform: "CharacterAI"
-  };
-  console.log('Conversation data prepared:', conversationData);
+      }
+    }
+  ];
+
+  console.log('Sending batch to backend...', records);
+  const response = await fetch('https://preview.teen-ai.salt-lab.org/api/v1/ingest/batch', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': 'application/json'
+    },
+    body: JSON.stringify({ records })
+  });
 
-  try {
-    // First try to update existing conversation
-    console.log('Attempting to update existing conversation...');
-    const updateResponse = await fetch(`https://preview.teen-ai.salt-lab.org/api/v1/conversations/update/${ids.conversationId}`, {
-      method: 'PUT',
-      headers: {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'
-      },
-      body: JSON.stringify(conversationData)
+  if (!response.ok) {
+    const errorText = await response.text();
+    console.error('Batch ingest failed:', {
+      status: response.status,
+      statusText: response.statusText,
+      errorText
     });
+    throw new Error(`Batch ingest failed: ${response.status} - ${errorText}`);
+  }
 
-    if (updateResponse.status === 404) {
-      // If conversation doesn't exist, create new one
-      console.log('Conversation not found, creating new one...');
-      await sendToBackend(conversationData, 'conversation');
-    } else if (!updateResponse.ok) {
-      // If update failed for other reasons
-      const errorText = await updateResponse.text();
-      console.error('Failed to update conversation:', {
-        status: updateResponse.status,
-        statusText: updateResponse.statusText,
-        errorText
-      });
-      throw new Error(`Failed to update conversation: ${updateResponse.status} - ${errorText}`);
-    } else {
-      console.log('Successfully updated existing conversation');
-    }
-  } catch (error) {
-    console.error('Error in sendConversation:', error);
-    throw error;
+  const result = await response.json();
+  if (!result.ok) {
+    console.error('Some records were not saved:', result.results.filter(r => !r.ok));
   }
+  console.log('Batch sent to backend:', result);
+  return result;
 }
-
-async function sendMessage(ids, riskAssessment, riskNotification, recentChat, contextChat) {
-        
-      console.log('Preparing message data');
-      const messageData = {
-        child_user_id: 3,
-        message_id: ids.messageId,
-        conversation_id: ids.conversationId,
-        sender: "extension-user",
-        message_text: recentChat,
-        timestamp: new Date().toISOString(),
-        sender_type: "CharacterAI"
-      };
-      
-      console.log('Sending messages to backend...');
-      await sendToBackend(messageData, 'message');
-      console.log('Messages sent successfully');
-    }
-
-    async function sendChatbot(ids, riskAssessment, riskNotification, recentChat, contextChat) {
-      console.log('Preparing chatbot data...');
-      const chatbotData = {
-        chatbot_id: ids.chatbotId,
-        name: 'testBot',
-        metadata: {
-          "version": "1.0",
-          "language": "en"
-        },
-        chatbotPlatform: "CharacterAI"
-      };
-      console.log('Chatbot data prepared:', chatbotData);
-  
-      // Send to backend
-      console.log('Sending chatbot to backend...');
-      await sendToBackend(chatbotData, 'chatbot');
-      console.log('Chatbot sent successfully');
-    }
\ No newline at end of file
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+import jwt
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified JWT claims, keyed by a digest of the token so raw
+    tokens are never kept in memory. An entry expires at the token's `exp`.
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        # per-process key: digests cannot be precomputed from outside
+        self._key = os.urandom(16)
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=20, key=self._key).digest()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return claims
+
+    def put(self, digest: bytes, claims: dict) -> None:
+        if not isinstance(claims.get("exp"), (int, float)):
+            return  # a token without exp is re-verified every time
+        self._entries[digest] = (claims["exp"], claims)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens (signature, audience, expiry). Valid
+    tokens are cached until they expire, so repeated requests with the same
+    token skip the HMAC check and claim parsing. Invalid tokens are never cached.
+    """
+
+    def __init__(self, secret: str, algorithm: str = "HS256", audience: str = "authenticated", cache_size: int = 10000) -> None:
+        self.secret = secret
+        self.algorithm = algorithm
+        self.audience = audience
+        self.cache = VerifiedTokenCache(cache_size) if cache_size > 0 else None
+
+    def verify(self, token: str) -> Optional[dict]:
+        """Claims of a valid token, or None if it is invalid or expired."""
+        if self.cache is not None:
+            digest = self.cache.digest(token)
+            claims = self.cache.get(digest)
+            if claims is not None:
+                return claims
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[self.algorithm], audience=self.audience)
+        except jwt.InvalidTokenError:  # includes ExpiredSignatureError
+            return None
+        if self.cache is not None:
+            self.cache.put(digest, claims)
+        return claims
+
+
+class AppUserDirectory:
+    """
+    Resolves the `sub` of a verified token (a Supabase auth user UUID) to the
+    app user linked to it: the integer user_id the tables key families by,
+    and its role. Links do not change, so resolved users are kept in a bounded
+    LRU; a `sub` without a user is looked up again on its next request.
+    """
+
+    def __init__(self, lookup: Callable[[str], Awaitable[Optional[dict]]], max_entries: int = 10000) -> None:
+        self.lookup = lookup
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, auth_user_id: str) -> Optional[dict]:
+        user = self._entries.get(auth_user_id)
+        if user is not None:
+            self._entries.move_to_end(auth_user_id)
+            self.hits += 1
+            return user
+        self.misses += 1
+        user = await self.lookup(auth_user_id)
+        if user is not None and self.max_entries > 0:
+            self._entries[auth_user_id] = user
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
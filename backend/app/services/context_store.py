@@ -0,0 +1,149 @@
+"""
+Rolling transcript per conversation, so clients send only new turns.
+
+The extension used to rebuild contextChat from the whole scraped transcript
+for every analysis. With POST /conversations/{id}/turns it sends the turns it
+has not sent yet, numbered from `seq`; the store appends them to the
+conversation's last `max_turns` turns and rebuilds the (contextChat,
+recentChat) window on the server.
+
+Recently active conversations stay in memory (at most `max_conversations` per
+worker); every append is also written through to the storage backend's
+conversation_context table with a compare-and-set on next_seq, so a
+conversation can continue on another worker or after a restart. A turn number
+beyond what the store has raises SequenceGap, and the client resends from the
+expected number (or the whole window with reset).
+"""
+import asyncio
+import contextlib
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from app.services.risk_assessment import split_messages
+
+
+class SequenceGap(Exception):
+    def __init__(self, expected_seq: int) -> None:
+        super().__init__(f"Expected turn {expected_seq}")
+        self.expected_seq = expected_seq
+
+
+class ConversationContext:
+    __slots__ = ("next_seq", "turns", "stored")
+
+    def __init__(self, next_seq: int, turns: List[dict], max_turns: int, stored: bool) -> None:
+        self.next_seq = next_seq
+        self.turns = deque(turns, maxlen=max_turns)
+        # whether the storage backend has a row for it (the compare-and-set needs its next_seq)
+        self.stored = stored
+
+    def window(self, recent: int = 2) -> Tuple[str, str]:
+        """(contextChat, recentChat) as the extension builds them."""
+        return split_messages(list(self.turns), recent)
+
+
+class ConversationContextStore:
+    def __init__(self, storage, max_turns: int = 50, max_conversations: int = 10000, recent_turns: int = 2) -> None:
+        self.storage = storage
+        self.max_turns = max_turns
+        self.max_conversations = max_conversations
+        self.recent_turns = recent_turns
+        self._contexts: "OrderedDict[int, ConversationContext]" = OrderedDict()
+        # conversation_id -> [lock, holders and waiters]
+        self._locks: Dict[int, list] = {}
+
+        self.appended = 0
+        self.resent = 0
+        self.gaps = 0
+        self.conflicts = 0
+        self.loads = 0
+
+    async def append(self, conversation_id: int, seq: int, turns: List[dict], reset: bool = False) -> Tuple[ConversationContext, int]:
+        """
+        Add turns[i] as turn seq + i and return the context with the number of
+        turns that were new. Turns the store already has are skipped; with
+        `reset` the turns replace the stored transcript.
+        """
+        turns = [{"sender_type": turn.get("sender_type"), "content": turn.get("content")} for turn in turns]
+        async with self._locked(conversation_id):
+            context = await self._get(conversation_id)
+            # a stale in-memory copy (another worker appended since) gets one reload
+            for attempt in range(2):
+                if reset:
+                    next_seq, kept, added = seq + len(turns), turns, len(turns)
+                elif seq > context.next_seq:
+                    if attempt == 0:
+                        context = await self._get(conversation_id, reload=True)
+                        continue
+                    self.gaps += 1
+                    raise SequenceGap(context.next_seq)
+                else:
+                    fresh = turns[context.next_seq - seq:]
+                    self.resent += len(turns) - len(fresh)
+                    if not fresh:
+                        return context, 0
+                    next_seq, kept, added = context.next_seq + len(fresh), list(context.turns) + fresh, len(fresh)
+                kept = kept[-self.max_turns:]
+                expected_seq = context.next_seq if context.stored else None
+                if await self.storage.save_conversation_context(conversation_id, next_seq, kept, expected_seq):
+                    context = ConversationContext(next_seq, kept, self.max_turns, stored=True)
+                    self._remember(conversation_id, context)
+                    self.appended += added
+                    return context, added
+                self.conflicts += 1
+                context = await self._get(conversation_id, reload=True)
+            # lost the compare-and-set twice; the client retries from the current number
+            self.gaps += 1
+            raise SequenceGap(context.next_seq)
+
+    async def _get(self, conversation_id: int, reload: bool = False) -> ConversationContext:
+        context = self._contexts.get(conversation_id)
+        if context is not None and not reload:
+            self._contexts.move_to_end(conversation_id)
+            return context
+        self.loads += 1
+        stored = await self.storage.load_conversation_context(conversation_id)
+        if stored is None:
+            context = ConversationContext(0, [], self.max_turns, stored=False)
+        else:
+            context = ConversationContext(stored["next_seq"], stored["turns"], self.max_turns, stored=True)
+        self._remember(conversation_id, context)
+        return context
+
+    def _remember(self, conversation_id: int, context: ConversationContext) -> None:
+        self._contexts[conversation_id] = context
+        self._contexts.move_to_end(conversation_id)
+        while len(self._contexts) > self.max_conversations:
+            # already written through, so evicting only drops the in-memory copy
+            self._contexts.popitem(last=False)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, conversation_id: int):
+        entry = self._locks.get(conversation_id)
+        if entry is None:
+            entry = self._locks[conversation_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[conversation_id]
+
+    def stats(self) -> dict:
+        return {
+            "conversations": len(self._contexts),
+            "appended": self.appended,
+            "resent": self.resent,
+            "gaps": self.gaps,
+            "conflicts": self.conflicts,
+            "loads": self.loads,
+        }
+
+
+def build_context_store(storage, max_turns: int, max_conversations: int, recent_turns: int) -> Optional[ConversationContextStore]:
+    """Store over `storage`, or None when max_turns is 0 (the turns endpoint is then off)."""
+    if max_turns <= 0:
+        return None
+    return ConversationContextStore(storage, max_turns, max_conversations, recent_turns)
@@ -0,0 +1,141 @@
+"""
+Decryption of encrypted extension payloads.
+
+Two formats are accepted:
+
+- legacy: base64(AES-ECB(PKCS7(plaintext))), as handled by the original
+  `decrypt_data`. Not authenticated.
+- "v2:" + base64(nonce[12] + AES-GCM ciphertext + tag[16]). Authenticated;
+  new producers should use this (see `encrypt`).
+
+The key is the UTF-8 encoded key string (16, 24 or 32 bytes). Cipher objects
+are built once per key and reused across calls.
+"""
+import base64
+import binascii
+import os
+from functools import lru_cache
+from typing import List, Sequence
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+GCM_PREFIX = "v2:"
+NONCE_SIZE = 12
+BLOCK_SIZE = 16
+# average legacy payload size (bytes) above which batches are decrypted in place
+LARGE_BATCH_AVERAGE = 4096
+
+
+class DecryptionError(ValueError):
+    """Raised for payloads that are malformed, tampered with or encrypted with another key."""
+
+
+class PayloadCipher:
+    def __init__(self, key: bytes) -> None:
+        if len(key) not in (16, 24, 32):
+            raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+        self.ecb = Cipher(algorithms.AES(key), modes.ECB())
+        self.gcm = AESGCM(key)
+
+    def decrypt(self, payload: str) -> str:
+        payload = payload.strip()
+        if not payload:
+            return payload
+        if payload.startswith(GCM_PREFIX):
+            return self._decrypt_gcm(payload)
+        return self.decrypt_many([payload])[0]
+
+    def decrypt_many(self, payloads: Sequence[str]) -> List[str]:
+        """
+        Decrypt a batch of payloads, in order. Legacy payloads of the batch
+        share one ECB context (ECB blocks are independent) and one output
+        buffer, instead of a cipher context and several allocations per payload.
+        """
+        results: List[str] = [""] * len(payloads)
+        legacy_indexes, legacy_blobs = [], []
+        for index, payload in enumerate(payloads):
+            payload = payload.strip()
+            if not payload:
+                continue
+            if payload.startswith(GCM_PREFIX):
+                results[index] = self._decrypt_gcm(payload)
+                continue
+            blob = _b64decode(payload)
+            if not blob or len(blob) % BLOCK_SIZE:
+                raise DecryptionError("Legacy payload is not a whole number of AES blocks")
+            legacy_indexes.append(index)
+            legacy_blobs.append(blob)
+
+        if legacy_blobs:
+            decryptor = self.ecb.decryptor()
+            total = sum(len(blob) for blob in legacy_blobs)
+            if total < LARGE_BATCH_AVERAGE * len(legacy_blobs):
+                # small payloads: one update over the joined batch beats a call per payload
+                plaintext = memoryview(decryptor.update(b"".join(legacy_blobs)))
+            else:
+                # large payloads: decrypt in place without copying the batch into one buffer
+                # (update_into needs block_size - 1 bytes of headroom)
+                plaintext = memoryview(bytearray(total + BLOCK_SIZE - 1))
+                offset = 0
+                for blob in legacy_blobs:
+                    offset += decryptor.update_into(blob, plaintext[offset:])
+            decryptor.finalize()
+            offset = 0
+            for index, blob in zip(legacy_indexes, legacy_blobs):
+                results[index] = _unpad(plaintext[offset:offset + len(blob)])
+                offset += len(blob)
+        return results
+
+    def encrypt(self, plaintext: str) -> str:
+        """Encrypt in the authenticated "v2:" format."""
+        nonce = os.urandom(NONCE_SIZE)
+        return GCM_PREFIX + base64.b64encode(nonce + self.gcm.encrypt(nonce, plaintext.encode(), None)).decode()
+
+    def encrypt_legacy(self, plaintext: str) -> str:
+        """Encrypt in the legacy ECB format (only for migration tests and benchmarks)."""
+        data = plaintext.encode()
+        pad = BLOCK_SIZE - len(data) % BLOCK_SIZE
+        encryptor = self.ecb.encryptor()
+        return base64.b64encode(encryptor.update(data + bytes([pad]) * pad) + encryptor.finalize()).decode()
+
+    def _decrypt_gcm(self, payload: str) -> str:
+        blob = _b64decode(payload[len(GCM_PREFIX):])
+        if len(blob) < NONCE_SIZE + 16:
+            raise DecryptionError("Authenticated payload is too short")
+        try:
+            return self.gcm.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], None).decode()
+        except InvalidTag:
+            raise DecryptionError("Authenticated payload failed verification")
+
+
+def _b64decode(data: str) -> bytes:
+    try:
+        return base64.b64decode(data)
+    except binascii.Error as e:
+        raise DecryptionError(f"Payload is not valid base64: {str(e)}")
+
+
+def _unpad(block: memoryview) -> str:
+    pad = block[-1]
+    if not 1 <= pad <= BLOCK_SIZE or block[-pad:] != bytes([pad]) * pad:
+        raise DecryptionError("Invalid PKCS7 padding")
+    return str(block[:-pad], "utf-8")
+
+
+@lru_cache(maxsize=32)
+def get_cipher(key: str) -> PayloadCipher:
+    return PayloadCipher(key.encode("utf-8"))
+
+
+def decrypt(payload: str, key: str) -> str:
+    return get_cipher(key).decrypt(payload)
+
+
+def decrypt_many(payloads: Sequence[str], key: str) -> List[str]:
+    return get_cipher(key).decrypt_many(payloads)
+
+
+def encrypt(plaintext: str, key: str) -> str:
+    return get_cipher(key).encrypt(plaintext)
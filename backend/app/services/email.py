@@ -1,15 +1,34 @@
+import argparse
+import asyncio
+import logging
+import queue
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Dict, Iterator, List, Optional, Tuple
 from settings import app_settings
+from app.services.metrics import SMTP_CONNECT_SECONDS, SMTP_SEND_SECONDS
 
-def send_email_notification(to_email: str, subject: str, body: str):
+logger = logging.getLogger(__name__)
+
+
+def build_email(to_email: str, subject: str, body: str) -> MIMEMultipart:
     msg = MIMEMultipart()
     msg['From'] = f"{app_settings.smtp_sender_name} <{app_settings.smtp_from}>"
     msg['To'] = to_email
     msg['Subject'] = subject
 
     msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def send_email_notification(to_email: str, subject: str, body: str):
+    """Send one email over a new SMTP session. Request handlers should use EmailDispatcher instead."""
+    msg = build_email(to_email, subject, body)
 
     try:
         with smtplib.SMTP(app_settings.smtp_host, app_settings.smtp_port) as server:
@@ -18,3 +37,327 @@ def send_email_notification(to_email: str, subject: str, body: str):
             server.sendmail(app_settings.smtp_from, to_email, msg.as_string())
     except Exception as e:
         raise Exception(f"Failed to send email: {str(e)}")
+
+
+class EmailQueueFull(Exception):
+    """Raised by EmailDispatcher.submit when the pending-email limit is reached."""
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP sessions kept open and shared between sends. A session
+    idle for longer than `check_after` seconds is probed with NOOP before it
+    is reused, and a session that fails is closed and replaced on next use.
+    Thread-safe: sends run in worker threads.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 2,
+        starttls: bool = True,
+        timeout: float = 30.0,
+        check_after: float = 30.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        start = time.perf_counter()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        SMTP_CONNECT_SECONDS.observe(time.perf_counter() - start)
+        self.connects += 1
+        return server
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """Borrow a session; it goes back to the pool unless the block raised."""
+        with self._slots:
+            server = None
+            while server is None:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    server = self._connect()
+                    break
+                if time.monotonic() - last_used > self.check_after and not _alive(server):
+                    _quietly_close(server)
+                    server = None
+            try:
+                yield server
+            except Exception:
+                _quietly_close(server)
+                raise
+            self._idle.put((server, time.monotonic()))
+
+    def close(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                _quietly_close(server)
+
+
+def _alive(server: smtplib.SMTP) -> bool:
+    try:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _quietly_close(server: smtplib.SMTP) -> None:
+    try:
+        server.close()
+    except OSError:
+        pass
+
+
+@dataclass
+class OutgoingEmail:
+    to_email: str
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+class EmailDispatcher:
+    """
+    Background email sender. `submit` queues an email and returns at once;
+    `workers` tasks each take up to `max_batch` queued emails and send them
+    over one pooled SMTP session in a worker thread. Emails that fail with a
+    temporary error are retried with exponential backoff up to `max_attempts`
+    times; emails the server rejects permanently (5xx) are dropped and logged.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        sender: str,
+        workers: int = 2,
+        max_batch: int = 20,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 300.0,
+        max_pending: int = 10000,
+    ) -> None:
+        self.pool = pool
+        self.sender = sender
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_pending = max_pending
+
+        self._queue: "asyncio.Queue[OutgoingEmail]" = asyncio.Queue()
+        self._retries: Dict[asyncio.TimerHandle, OutgoingEmail] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._outstanding = 0
+
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+
+    def submit(self, to_email: str, subject: str, body: str) -> None:
+        if self._outstanding >= self.max_pending:
+            raise EmailQueueFull(f"Email queue is full ({self.max_pending} emails pending)")
+        self._outstanding += 1
+        self.submitted += 1
+        self._queue.put_nowait(OutgoingEmail(to_email, subject, body))
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Retry waiting emails right away and wait for the queue to drain."""
+        for handle, email in list(self._retries.items()):
+            handle.cancel()
+            self._queue.put_nowait(email)
+        self._retries.clear()
+        self.retry_delay = 0.0
+        deadline = time.monotonic() + timeout
+        while self._outstanding and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._outstanding:
+            logger.error("Email queue drain timed out with %s emails pending", self._outstanding)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(self.pool.close)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._outstanding,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "batches": self.batches,
+            "smtp_connects": self.pool.connects,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                sent, retry, failed = await asyncio.to_thread(self._send_batch, batch)
+            except Exception as e:  # could not get a session at all
+                logger.error("Error sending %s emails: %s", len(batch), e)
+                sent, retry, failed = [], batch, []
+            self.batches += 1
+            self.sent += len(sent)
+            for email in failed:
+                self._finish_failed(email)
+            for email in retry:
+                self._schedule_retry(email)
+            self._outstanding -= len(sent)
+
+    def _send_batch(self, batch: List[OutgoingEmail]) -> Tuple[list, list, list]:
+        """Runs in a worker thread. Returns (sent, to retry, permanently failed)."""
+        sent, retry, failed = [], [], []
+        try:
+            with self.pool.connection() as server:
+                for position, email in enumerate(batch):
+                    msg = build_email(email.to_email, email.subject, email.body)
+                    start = time.perf_counter()
+                    try:
+                        server.sendmail(self.sender, email.to_email, msg.as_string())
+                        SMTP_SEND_SECONDS.observe(time.perf_counter() - start, "sent")
+                        sent.append(email)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        SMTP_SEND_SECONDS.observe(time.perf_counter() - start, "rejected")
+                        # the session is still usable; only this email is affected
+                        if _permanent(e):
+                            logger.error("Email to %s rejected: %s", email.to_email, e)
+                            failed.append(email)
+                        else:
+                            retry.append(email)
+                        try:
+                            server.rset()
+                        except (smtplib.SMTPException, OSError):
+                            raise _SessionFailed(position + 1)
+                    except (smtplib.SMTPException, OSError) as e:
+                        SMTP_SEND_SECONDS.observe(time.perf_counter() - start, "error")
+                        logger.warning("SMTP session failed after %s emails: %s", len(sent), e)
+                        raise _SessionFailed(position)
+        except _SessionFailed as e:
+            # the pool discarded the broken session; the rest of the batch is retried later
+            return sent, retry + batch[e.position:], failed
+        return sent, retry, failed
+
+    def _schedule_retry(self, email: OutgoingEmail) -> None:
+        email.attempts += 1
+        if email.attempts >= self.max_attempts:
+            logger.error("Giving up on email to %s after %s attempts", email.to_email, email.attempts)
+            self._finish_failed(email)
+            return
+        self.retried += 1
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (email.attempts - 1))
+        handle = asyncio.get_running_loop().call_later(delay, self._requeue, email)
+        self._retries[handle] = email
+
+    def _requeue(self, email: OutgoingEmail) -> None:
+        for handle, waiting in list(self._retries.items()):
+            if waiting is email:
+                del self._retries[handle]
+        self._queue.put_nowait(email)
+
+    def _finish_failed(self, email: OutgoingEmail) -> None:
+        self.failed += 1
+        self._outstanding -= 1
+
+
+class _SessionFailed(Exception):
+    def __init__(self, position: int) -> None:
+        self.position = position
+
+
+def _permanent(e: smtplib.SMTPException) -> bool:
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in e.recipients.values())
+    return 500 <= getattr(e, "smtp_code", 0) < 600
+
+
+def build_email_dispatcher() -> Optional[EmailDispatcher]:
+    """Dispatcher for the configured SMTP server, or None when SMTP is not configured."""
+    if not app_settings.smtp_host:
+        return None
+    pool = SMTPConnectionPool(
+        app_settings.smtp_host,
+        int(app_settings.smtp_port),
+        app_settings.smtp_user,
+        app_settings.smtp_password,
+        size=app_settings.smtp_pool_size,
+        starttls=app_settings.smtp_starttls,
+    )
+    return EmailDispatcher(
+        pool,
+        app_settings.smtp_from,
+        workers=app_settings.smtp_pool_size,
+        max_batch=app_settings.smtp_max_batch,
+        max_attempts=app_settings.smtp_max_attempts,
+        max_pending=app_settings.smtp_max_pending,
+    )
+
+
+async def send_newsletter(subject: str, body: str) -> dict:
+    """Send one email to every newsletter subscriber through a dispatcher."""
+    from db_utils.storage_backend import build_storage_backend
+
+    client = build_storage_backend()
+    dispatcher = build_email_dispatcher()
+    if dispatcher is None:
+        raise Exception("SMTP is not configured")
+    await dispatcher.start()
+    try:
+        for subscriber in await client.get_all_user_email_newsletter_subscribed():
+            dispatcher.submit(subscriber["email"], subject, body)
+    finally:
+        await dispatcher.stop(timeout=600)
+        await client.aclose()
+    return dispatcher.stats()
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Email tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    newsletter = subcommands.add_parser("newsletter", help="send an email to every newsletter subscriber")
+    newsletter.add_argument("--subject", required=True)
+    newsletter.add_argument("--body-file", required=True, help="plain-text body")
+    args = parser.parse_args(argv)
+
+    if args.command == "newsletter":
+        with open(args.body_file, encoding="utf-8") as body_file:
+            body = body_file.read()
+        print(asyncio.run(send_newsletter(args.subject, body)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import abc
+import asyncio
+import glob
+import json
+import logging
+import os
+import socket
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One subscriber's view of a channel. Events are buffered up to `max_queue`;
+    when a slow subscriber falls behind, the oldest buffered events are dropped
+    so publishing never waits on a client.
+    """
+
+    def __init__(self, broker: "Broker", channel: str, max_queue: int) -> None:
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.dropped = 0
+
+    def put(self, event: Any) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Broker(abc.ABC):
+    """
+    Fans events out to the subscribers of a channel (one channel per parent).
+    Subscribers are always local to the worker; brokers differ in how events
+    published by other workers reach this one.
+    """
+
+    def __init__(self, max_queue: int = 100) -> None:
+        self.max_queue = max_queue
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, channel: Any) -> Subscription:
+        subscription = Subscription(self, str(channel), self.max_queue)
+        self._subscriptions.setdefault(subscription.channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.channel)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+    def deliver(self, channel: str, event: Any) -> None:
+        """Hand an event to this worker's subscribers of `channel`."""
+        for subscription in self._subscriptions.get(channel, ()):
+            subscription.put(event)
+            self.delivered += 1
+
+    @abc.abstractmethod
+    async def publish(self, channel: Any, event: Any) -> None:
+        pass
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self).__name__,
+            "channels": len(self._subscriptions),
+            "subscribers": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(s.dropped for subscriptions in self._subscriptions.values() for s in subscriptions),
+        }
+
+
+class InProcessBroker(Broker):
+    """Delivers only to subscribers of this worker; enough for a single worker."""
+
+    async def publish(self, channel: Any, event: Any) -> None:
+        self.published += 1
+        self.deliver(str(channel), event)
+
+
+class UnixSocketBroker(Broker):
+    """
+    Broker shared by the workers of one host. Every worker binds a Unix
+    datagram socket `worker-<pid>.sock` in `socket_dir`; a publish delivers
+    locally and sends one datagram to every other worker's socket. Sockets of
+    dead workers are removed the first time a send to them is refused.
+    """
+
+    def __init__(self, socket_dir: str, max_queue: int = 100) -> None:
+        super().__init__(max_queue)
+        self.socket_dir = socket_dir
+        self.path: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self.send_errors = 0
+
+    async def start(self) -> None:
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self.path = os.path.join(self.socket_dir, f"worker-{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    async def stop(self) -> None:
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def publish(self, channel: Any, event: Any) -> None:
+        self.published += 1
+        channel = str(channel)
+        self.deliver(channel, event)
+        if self._sock is None:
+            return
+        datagram = json.dumps({"channel": channel, "event": event}).encode()
+        for peer in glob.glob(os.path.join(self.socket_dir, "worker-*.sock")):
+            if peer == self.path:
+                continue
+            try:
+                self._sock.sendto(datagram, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_stale(peer)
+            except OSError as e:  # peer's receive buffer is full or the event is too large
+                self.send_errors += 1
+                logger.warning("Dropped event for %s: %s", peer, e)
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                datagram = self._sock.recv(262144)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                message = json.loads(datagram)
+            except json.JSONDecodeError:
+                continue
+            self.deliver(message["channel"], message["event"])
+
+    @staticmethod
+    def _remove_stale(peer: str) -> None:
+        try:
+            os.unlink(peer)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["send_errors"] = self.send_errors
+        return stats
+
+
+def build_broker(socket_dir: Optional[str] = None, max_queue: int = 100) -> Broker:
+    return UnixSocketBroker(socket_dir, max_queue) if socket_dir else InProcessBroker(max_queue)
@@ -0,0 +1,299 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.services.metrics import INGEST_DEAD_LETTERED
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """Raised by WriteBehindQueue.submit when the pending-record limit is reached."""
+
+
+class WriteBehindQueue:
+    """
+    In-process write-behind buffer for ingest writes.
+
+    Records are acknowledged as soon as they are queued and written by a
+    background task in bulk, whenever `max_batch` records of one kind are
+    pending or `flush_interval` seconds have passed. Failed flushes keep the
+    records queued and retry with exponential backoff. `submit` raises
+    IngestQueueFull once `max_pending` records are waiting.
+
+    After `max_attempts` failed flushes in a row, a batch is written in halves
+    down to single records, so one record the database rejects cannot hold
+    back the records queued behind it. Records that still fail on their own
+    are dead-lettered: appended to dead-letter-ingest.jsonl in `spool_dir`
+    (or logged), and counted in ingest_dead_lettered_total. When no part of
+    the batch can be written, the database is taken to be down and the batch
+    stays queued.
+
+    With a `spool_dir`, every record is also appended to a per-process spool
+    file before it is acknowledged. Spool files left behind by dead processes
+    are replayed on start, so the bulk writers must be idempotent upserts: a
+    crash during replay can leave the same records in two spools.
+    """
+
+    def __init__(
+        self,
+        writers: Dict[str, Callable[[List[dict]], Awaitable]],
+        max_batch: int = 200,
+        flush_interval: float = 0.5,
+        max_pending: int = 10000,
+        spool_dir: Optional[str] = None,
+        max_retry_delay: float = 30.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self.writers = writers
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+
+        self._pending: Dict[str, Deque[dict]] = {kind: deque() for kind in writers}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._spool_path: Optional[str] = None
+        self._spool_file = None
+        self._spooled_since_compact = 0
+        # failed flushes in a row, per kind
+        self._attempts: Dict[str, int] = {kind: 0 for kind in writers}
+
+        self.submitted = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(records) for records in self._pending.values())
+
+    def submit(self, kind: str, details: dict) -> None:
+        """Queue one record for the `kind` writer; never waits on the database."""
+        if self.depth >= self.max_pending:
+            self.rejected += 1
+            raise IngestQueueFull(f"Ingest queue is full ({self.max_pending} records pending)")
+        if self._spool_file is not None:
+            self._spool_file.write(json.dumps({"kind": kind, "details": details}) + "\n")
+            self._spool_file.flush()
+            self._spooled_since_compact += 1
+        self._pending[kind].append(details)
+        self.submitted += 1
+        if len(self._pending[kind]) >= self.max_batch:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool_path = os.path.join(self.spool_dir, f"ingest-{os.getpid()}.jsonl")
+            claimed = self._replay_orphaned_spools()
+            self._spool_file = open(self._spool_path, "a", encoding="utf-8")
+            # the replayed records are in this process's spool before the claimed files go
+            self._compact_spool()
+            for path in claimed:
+                os.remove(path)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued. Records that cannot be written stay in the spool."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                logger.error("Ingest queue drain timed out with %s records pending", self.depth)
+        if self._spool_file is not None:
+            self._compact_spool()
+            self._spool_file.close()
+            self._spool_file = None
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_ms": self.last_flush_seconds * 1000,
+            "avg_flush_ms": self.total_flush_seconds / self.batches * 1000 if self.batches else 0.0,
+            "max_flush_ms": self.max_flush_seconds * 1000,
+        }
+
+    async def _run(self) -> None:
+        retry_delay = 0.0
+        while True:
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), retry_delay or self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            ok = await self.flush()
+            if ok:
+                retry_delay = 0.0
+            else:
+                retry_delay = min(self.max_retry_delay, max(self.flush_interval, retry_delay * 2))
+            if self._stopping and (self.depth == 0 or not ok):
+                return
+
+    async def flush(self) -> bool:
+        """Write all pending records in batches of at most `max_batch`. Returns False if any writer failed."""
+        ok = True
+        for kind, records in self._pending.items():
+            while records:
+                batch = [records.popleft() for _ in range(min(self.max_batch, len(records)))]
+                start = time.perf_counter()
+                try:
+                    await self.writers[kind](batch)
+                    written = len(batch)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    self._attempts[kind] += 1
+                    logger.error("Error flushing %s %s records: %s", len(batch), kind, e)
+                    rejected = await self._write_isolating(kind, batch) if self._attempts[kind] >= self.max_attempts else None
+                    if rejected is None:
+                        records.extendleft(reversed(batch))
+                        ok = False
+                        break
+                    self._dead_letter(kind, rejected)
+                    written = len(batch) - len(rejected)
+                self._attempts[kind] = 0
+                elapsed = time.perf_counter() - start
+                self.batches += 1
+                self.flushed += written
+                self.last_flush_seconds = elapsed
+                self.total_flush_seconds += elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        if self._spool_file is not None and (self.depth == 0 or self._spooled_since_compact >= self.max_batch * 10):
+            self._compact_spool()
+        return ok
+
+    async def _write_isolating(self, kind: str, batch: List[dict]) -> Optional[List[dict]]:
+        """
+        Write `batch` in halves, down to single records. Returns the records
+        that failed on their own, or None if no part could be written (the
+        batch is then left for the next flush).
+        """
+        rejected: List[dict] = []
+        written = failures = 0
+        # a database that is down fails every part; give up after about one failed path down the halves
+        max_failures = len(batch).bit_length() + 1
+        parts = [batch[len(batch) // 2:], batch[:len(batch) // 2]]
+        while parts:
+            part = parts.pop()
+            if not part:
+                continue
+            try:
+                await self.writers[kind](part)
+                written += len(part)
+            except Exception as e:
+                if not written:
+                    failures += 1
+                    if failures > max_failures:
+                        return None
+                if len(part) == 1:
+                    logger.error("%s record rejected on its own: %s", kind, e)
+                    rejected.append(part[0])
+                else:
+                    parts += [part[len(part) // 2:], part[:len(part) // 2]]
+        return rejected if written else None
+
+    def _dead_letter(self, kind: str, rejected: List[dict]) -> None:
+        if not rejected:
+            return
+        self.dead_lettered += len(rejected)
+        INGEST_DEAD_LETTERED.inc(kind, amount=len(rejected))
+        lines = [json.dumps({"kind": kind, "details": details}) for details in rejected]
+        if self.spool_dir:
+            # not named ingest-*.jsonl, so it is never replayed as a spool
+            path = os.path.join(self.spool_dir, "dead-letter-ingest.jsonl")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            logger.error("Dead-lettered %s %s records to %s", len(rejected), kind, path)
+        else:
+            for line in lines:
+                logger.error("Dead-lettered ingest record: %s", line)
+
+    def _compact_spool(self) -> None:
+        """Rewrite this process's spool with only the records still pending."""
+        tmp_path = self._spool_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as tmp:
+            for kind, records in self._pending.items():
+                for details in records:
+                    tmp.write(json.dumps({"kind": kind, "details": details}) + "\n")
+        self._spool_file.close()
+        os.replace(tmp_path, self._spool_path)
+        self._spool_file = open(self._spool_path, "a", encoding="utf-8")
+        self._spooled_since_compact = 0
+
+    def _replay_orphaned_spools(self) -> List[str]:
+        """
+        Queue the records of spools left by dead processes, including spools
+        another process claimed for replay but died before finishing. Returns
+        the claimed files; the caller removes them once the records are in
+        this process's spool.
+        """
+        claimed_paths = []
+        paths = glob.glob(os.path.join(self.spool_dir, "ingest-*.jsonl"))
+        paths += glob.glob(os.path.join(self.spool_dir, "ingest-*.jsonl.*.replay"))
+        for path in paths:
+            owner = _spool_owner(path)
+            if owner != os.getpid() and _pid_alive(owner):
+                continue
+            spool_path = path[:path.index(".jsonl") + len(".jsonl")]
+            claimed = f"{spool_path}.{os.getpid()}.replay"
+            try:
+                os.rename(path, claimed)  # another worker may claim it first
+            except FileNotFoundError:
+                continue
+            replayed = 0
+            with open(claimed, encoding="utf-8") as spool:
+                for line in spool:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from a crash
+                    if record["kind"] in self._pending:
+                        self._pending[record["kind"]].append(record["details"])
+                        replayed += 1
+            if claimed not in claimed_paths:  # an old claim on a reused pid's spool lands on the same name
+                claimed_paths.append(claimed)
+            logger.info("Replayed %s ingest records from %s", replayed, path)
+        return claimed_paths
+
+
+def _spool_owner(path: str) -> int:
+    """The pid that wrote a spool (ingest-<pid>.jsonl) or claimed it for replay (ingest-<pid>.jsonl.<pid>.replay)."""
+    name = os.path.basename(path)
+    if name.endswith(".replay"):
+        return int(name.split(".")[-2])
+    return int(name[len("ingest-"):-len(".jsonl")])
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
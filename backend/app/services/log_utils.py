@@ -0,0 +1,134 @@
+"""
+Structured, cheap request logging.
+
+`log_event(logger, level, "message.received", message_id=..., content=...)`
+writes one logfmt line (`event=message.received message_id=12 content="..."`).
+Nothing is formatted unless the level is enabled and the event passes its
+sample rate, and values are shortened while they are formatted (long strings
+cut, long lists and dicts elided), so a chat transcript costs a few hundred
+characters instead of its full size. `configure_logging` routes all records
+through a queue so the stream writes happen on a background thread.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Any, Dict, Optional
+
+DEFAULT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+# per-event sample rates for INFO and DEBUG events (warnings and errors are always logged)
+SAMPLE_RATES: Dict[str, float] = {}
+# longest string value written before it is cut
+MAX_FIELD_CHARS = 200
+# items written per list or dict before the rest is elided
+MAX_ITEMS = 10
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "message.received=0.01,alert.received=0.5" into {event: rate}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+def shorten(value: Any, max_chars: int = None, depth: int = 3) -> Any:
+    """Copy of `value` with long strings cut and long collections elided, for logging."""
+    max_chars = MAX_FIELD_CHARS if max_chars is None else max_chars
+    if isinstance(value, str):
+        if len(value) > max_chars:
+            return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+        return value
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "model_dump"):  # pydantic models
+        value = value.model_dump()
+    if depth == 0:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, dict):
+        items = list(value.items())
+        short = {str(key): shorten(item, max_chars, depth - 1) for key, item in items[:MAX_ITEMS]}
+        if len(items) > MAX_ITEMS:
+            short["..."] = f"+{len(items) - MAX_ITEMS} keys"
+        return short
+    if isinstance(value, (list, tuple)):
+        short = [shorten(item, max_chars, depth - 1) for item in value[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            short.append(f"...(+{len(value) - MAX_ITEMS} items)")
+        return short
+    return shorten(str(value), max_chars, 0)
+
+
+class StructuredMessage:
+    """Log message formatted on first use, i.e. only when a handler emits it."""
+
+    __slots__ = ("event", "fields", "_text")
+
+    def __init__(self, event: str, fields: Dict[str, Any]) -> None:
+        self.event = event
+        self.fields = fields
+        self._text = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            parts = [f"event={self.event}"]
+            for key, value in self.fields.items():
+                value = shorten(value)
+                if isinstance(value, str):
+                    text = json.dumps(value) if (not value or " " in value or '"' in value or "=" in value) else value
+                else:
+                    text = json.dumps(value, default=str)
+                parts.append(f"{key}={text}")
+            self._text = " ".join(parts)
+        return self._text
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        rate = SAMPLE_RATES.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+    logger.log(level, StructuredMessage(event, fields))
+
+
+def configure_logging(level: str = "INFO", queued: bool = True, sample_rates: str = "", max_field_chars: int = 200) -> None:
+    """
+    Set up the root logger once per process. With `queued`, handlers write
+    from a listener thread; records are formatted before they are queued.
+    """
+    global _listener, MAX_FIELD_CHARS
+    SAMPLE_RATES.update(parse_sample_rates(sample_rates))
+    MAX_FIELD_CHARS = max_field_chars
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listener is not None or any(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers):
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    if not queued:
+        root.addHandler(stream_handler)
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
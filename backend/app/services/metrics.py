@@ -0,0 +1,190 @@
+"""
+In-process metrics in the Prometheus text format, served on /metrics.
+
+Counters and histograms are plain dicts keyed by label values, updated from
+the event loop (and from email worker threads, where a lost increment under
+contention is acceptable). Every worker process keeps its own values, so
+with several gunicorn workers a scrape reports the worker that answered it;
+scrape each worker, or sum over instances, for totals.
+"""
+import bisect
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import httpx
+
+# request and round-trip latencies, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list = []
+        # name -> (help, callback returning {label tuple: value}, label names), sampled at scrape time
+        self.gauges: Dict[str, Tuple[str, Callable[[], Dict[Tuple[str, ...], float]], Tuple[str, ...]]] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, callback: Callable[[], Dict[Tuple[str, ...], float]], labels: Sequence[str] = ()) -> None:
+        self.gauges[name] = (help, callback, tuple(labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for name, (help, callback, labels) in self.gauges.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for label_values, value in callback().items():
+                lines.append(f"{name}{_labels(labels, label_values)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "API request latency by route template.", ("method", "route", "status"),
+)
+SUPABASE_REQUEST_SECONDS = REGISTRY.histogram(
+    "supabase_request_duration_seconds", "PostgREST round-trip latency.", ("table", "operation", "status"),
+)
+SUPABASE_ROWS = REGISTRY.counter(
+    "supabase_rows_total", "Rows returned by PostgREST (from Content-Range).", ("table", "operation"),
+)
+SUPABASE_RESPONSE_BYTES = REGISTRY.counter(
+    "supabase_response_bytes_total", "PostgREST response body bytes (from Content-Length).", ("table", "operation"),
+)
+SMTP_CONNECT_SECONDS = REGISTRY.histogram(
+    "smtp_connect_duration_seconds", "SMTP connect, STARTTLS and login time.",
+)
+SMTP_SEND_SECONDS = REGISTRY.histogram(
+    "smtp_send_duration_seconds", "Time to send one email over an open SMTP session.", ("result",),
+)
+SLOW_REQUEST_PROFILES = REGISTRY.counter(
+    "slow_request_profiles_total", "Sampled requests that were slow enough to write a profile.", ("route",),
+)
+INGEST_DEAD_LETTERED = REGISTRY.counter(
+    "ingest_dead_lettered_total", "Write-behind records the database rejected on their own and that were set aside.", ("kind",),
+)
+RISK_ASSESSMENTS = REGISTRY.counter(
+    "risk_assessments_total", "Risk assessments answered, by source (cache, prescreen, shared or model).", ("source",),
+)
+RISK_MODEL_SECONDS = REGISTRY.histogram(
+    "risk_model_duration_seconds", "Risk model call latency by provider.", ("provider", "result"),
+    buckets=LATENCY_BUCKETS + (20.0, 30.0, 60.0),
+)
+
+_POSTGREST_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "PUT": "upsert", "DELETE": "delete"}
+
+
+def _postgrest_target(request: httpx.Request) -> Tuple[str, str]:
+    """(table or rpc name, operation) of a PostgREST request."""
+    path = request.url.path.rsplit("/rest/v1/", 1)[-1].strip("/")
+    if path.startswith("rpc/"):
+        return path[4:], "rpc"
+    operation = _POSTGREST_OPERATIONS.get(request.method, request.method.lower())
+    if operation == "insert" and "resolution=merge-duplicates" in request.headers.get("prefer", ""):
+        operation = "upsert"
+    return path, operation
+
+
+def _content_range_rows(value: str) -> int:
+    """Row count from a Content-Range header such as "0-24/*" (0 for "*/*")."""
+    span = value.split("/", 1)[0]
+    if "-" not in span:
+        return 0
+    first, last = span.split("-", 1)
+    return int(last) - int(first) + 1
+
+
+def instrument_postgrest(session: httpx.AsyncClient) -> None:
+    """Time every request of a PostgREST session with httpx event hooks."""
+
+    async def on_request(request: httpx.Request) -> None:
+        request.extensions["metrics_start"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        start = response.request.extensions.get("metrics_start")
+        if start is None:
+            return
+        table, operation = _postgrest_target(response.request)
+        SUPABASE_REQUEST_SECONDS.observe(time.perf_counter() - start, table, operation, str(response.status_code))
+        content_range = response.headers.get("content-range")
+        if content_range:
+            try:
+                SUPABASE_ROWS.inc(table, operation, amount=_content_range_rows(content_range))
+            except ValueError:
+                pass
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            SUPABASE_RESPONSE_BYTES.inc(table, operation, amount=int(content_length))
+
+    hooks = session.event_hooks
+    session.event_hooks = {
+        "request": hooks.get("request", []) + [on_request],
+        "response": hooks.get("response", []) + [on_response],
+    }
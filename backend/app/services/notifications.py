@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+from app.services.email import EmailDispatcher, EmailQueueFull
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ["low", "medium", "high"]
+
+
+def risk_rank(level: Optional[str]) -> int:
+    """Position of a risk level in RISK_LEVELS (-1 for unknown levels)."""
+    level = (level or "").lower()
+    return RISK_LEVELS.index(level) if level in RISK_LEVELS else -1
+
+
+@dataclass
+class PendingAlert:
+    risk_type: str
+    risk_level: str
+    reason: str
+    link: str
+
+
+@dataclass
+class PendingDigest:
+    email: str
+    child_name: str
+    # the highest-risk alerts, at most max_alerts_listed; `overflow` counts the rest
+    alerts: List[PendingAlert] = field(default_factory=list)
+    overflow: int = 0
+    handle: Optional[asyncio.TimerHandle] = None
+
+
+class NotificationCoalescer:
+    """
+    Collects risk alerts per (parent, child) and emails one digest per
+    `window` seconds instead of one email per alert. The first alert for a
+    pair opens the window; alerts arriving before it closes join the same
+    digest. Each parent gets at most `max_per_hour` digests per hour across
+    children; a digest over the limit is held (and keeps collecting alerts)
+    until the parent is under the limit again. A digest keeps at most
+    `max_alerts_listed` alerts, the highest risk levels first, and counts the
+    others.
+
+    State is per worker, so with several workers a burst may yield one digest
+    per worker and the hourly limit applies per worker.
+    """
+
+    def __init__(
+        self,
+        dispatcher: EmailDispatcher,
+        window: float = 300.0,
+        max_per_hour: int = 6,
+        max_alerts_listed: int = 20,
+    ) -> None:
+        self.dispatcher = dispatcher
+        self.window = window
+        self.max_per_hour = max_per_hour
+        self.max_alerts_listed = max_alerts_listed
+        self._pending: Dict[Tuple[Hashable, Hashable], PendingDigest] = {}
+        self._sent_at: Dict[Hashable, Deque[float]] = {}
+
+        self.alerts = 0
+        self.digests = 0
+        self.rate_limited = 0
+
+    def add(self, parent: Hashable, child: Hashable, email: str, child_name: str, alert: PendingAlert) -> None:
+        self.alerts += 1
+        key = (parent, child)
+        digest = self._pending.get(key)
+        if digest is None:
+            digest = self._pending[key] = PendingDigest(email, child_name)
+            digest.handle = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        if len(digest.alerts) < max(self.max_alerts_listed, 1):
+            digest.alerts.append(alert)
+            return
+        digest.overflow += 1
+        lowest = min(range(len(digest.alerts)), key=lambda index: risk_rank(digest.alerts[index].risk_level))
+        if risk_rank(alert.risk_level) > risk_rank(digest.alerts[lowest].risk_level):
+            digest.alerts[lowest] = alert
+
+    def _flush(self, key: Tuple[Hashable, Hashable]) -> None:
+        digest = self._pending.get(key)
+        if digest is None:
+            return
+        parent = key[0]
+        wait = self._rate_limit_wait(parent)
+        if wait > 0:
+            self.rate_limited += 1
+            digest.handle = asyncio.get_running_loop().call_later(wait, self._flush, key)
+            return
+        del self._pending[key]
+        self._send(parent, digest)
+
+    def _rate_limit_wait(self, parent: Hashable) -> float:
+        """Seconds until the parent may receive another digest (0 if now)."""
+        sent_at = self._sent_at.get(parent)
+        if not sent_at:
+            return 0.0
+        now = time.monotonic()
+        while sent_at and now - sent_at[0] >= 3600:
+            sent_at.popleft()
+        if len(sent_at) < self.max_per_hour:
+            return 0.0
+        return 3600 - (now - sent_at[0])
+
+    def _send(self, parent: Hashable, digest: PendingDigest) -> None:
+        subject, body = self.render(digest)
+        try:
+            self.dispatcher.submit(digest.email, subject, body)
+        except EmailQueueFull as e:
+            logger.error("Dropping risk digest for %s: %s", digest.child_name, e)
+            return
+        self.digests += 1
+        self._sent_at.setdefault(parent, deque()).append(time.monotonic())
+
+    def render(self, digest: PendingDigest) -> Tuple[str, str]:
+        alerts = sorted(digest.alerts, key=lambda alert: -risk_rank(alert.risk_level))
+        top_level = alerts[0].risk_level
+        total = len(alerts) + digest.overflow
+        if total == 1:
+            alert = alerts[0]
+            subject = f"AI Chat Risk Notification for {digest.child_name}"
+            summary = f"We have detected a {alert.risk_level} risk level in your child's AI chat activities."
+        else:
+            subject = f"AI Chat Risk Notification for {digest.child_name}: {total} alerts"
+            summary = (
+                f"We have detected {total} risky moments (highest level: {top_level}) "
+                f"in your child's AI chat activities."
+            )
+        lines = [
+            f"- {alert.risk_level.capitalize()} | {alert.risk_type}" + (f": {alert.reason}" if alert.reason else "")
+            + f"\n  {alert.link}"
+            for alert in alerts
+        ]
+        if digest.overflow:
+            lines.append(f"- ... and {digest.overflow} more")
+        body = (
+            f"Dear Parent,\n\n{summary}\n\n"
+            + "\n".join(lines)
+            + "\n\nPlease open the links above to view the conversations.\n\nBest regards,\nYouthSafeAgent Team"
+        )
+        return subject, body
+
+    def flush_all(self) -> None:
+        """Send every held digest now, ignoring the window and rate limits (shutdown)."""
+        for key, digest in list(self._pending.items()):
+            if digest.handle is not None:
+                digest.handle.cancel()
+            del self._pending[key]
+            self._send(key[0], digest)
+
+    def stats(self) -> dict:
+        return {
+            "alerts": self.alerts,
+            "digests": self.digests,
+            "pending_digests": len(self._pending),
+            "rate_limited": self.rate_limited,
+        }
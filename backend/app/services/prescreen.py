@@ -0,0 +1,215 @@
+"""
+Local pre-screen of chat turns ahead of the risk model.
+
+Most windows the extension sends come back as "No Risk". The pre-screen scores
+the recent turns locally, from a compiled lexicon of risk terms plus a linear
+model over hashed word and word-pair features, evaluated in batch with numpy.
+Only windows scoring at or above RISK_PRESCREEN_THRESHOLD go on to the model.
+
+Without trained weights the score comes from the lexicon alone. Train weights
+on labeled turns (JSON lines of {"text": ..., "risky": true/false}) with
+
+    python -m app.services.prescreen train turns.jsonl --output prescreen_weights.npz
+
+and check precision and recall at the chosen threshold with
+benchmarks/bench_prescreen.py before enabling it.
+"""
+import argparse
+import json
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LEXICON = {
+    "self-harm": (
+        "kill myself", "killing myself", "hurt myself", "hurting myself", "cut myself", "cutting myself",
+        "suicide", "suicidal", "self harm", "self-harm", "want to die", "end my life", "end it all",
+        "better off dead", "no reason to live", "overdose",
+    ),
+    "sexual content": (
+        "nude", "nudes", "naked", "sexy", "undress", "take off your clothes", "sext", "explicit photo",
+        "send pics", "send a pic", "hook up",
+    ),
+    "violence": (
+        "gun", "knife", "stab", "shoot", "kill you", "kill him", "kill her", "beat you up", "bomb", "blood",
+        "weapon",
+    ),
+    "bullying": (
+        "stupid", "loser", "ugly", "hate you", "worthless", "nobody likes you", "fat", "idiot", "kill yourself",
+    ),
+    "substances": (
+        "drunk", "vodka", "weed", "vape", "pills", "get high", "cocaine", "drugs",
+    ),
+    "personal information": (
+        "my address", "home address", "phone number", "what school", "meet up", "meet in person", "where do you live",
+        "password",
+    ),
+}
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dims: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & (dims - 1)
+
+
+def _features(text: str) -> List[str]:
+    """Words and adjacent word pairs of a lowercased turn."""
+    words = _TOKEN.findall(text)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class PreScreener:
+    """
+    Risk score in [0, 1] per turn: sigmoid of the lexicon category hit counts
+    (capped at 3) and the hashed features, each times its weight, plus a bias.
+    """
+
+    def __init__(
+        self,
+        dims: int = 1 << 14,
+        token_weights: Optional[np.ndarray] = None,
+        lexicon_weights: Optional[np.ndarray] = None,
+        bias: float = -3.0,
+    ) -> None:
+        if dims & (dims - 1):
+            raise ValueError(f"dims must be a power of two, got {dims}")
+        self.dims = dims
+        self.categories = list(LEXICON)
+        self.token_weights = np.zeros(dims) if token_weights is None else np.asarray(token_weights, dtype=np.float64)
+        # one lexicon hit alone clears the default threshold
+        self.lexicon_weights = (
+            np.full(len(self.categories), 4.0) if lexicon_weights is None else np.asarray(lexicon_weights, dtype=np.float64)
+        )
+        self.bias = float(bias)
+        # one alternation per category; the matched group says which category hit
+        self.pattern = re.compile("|".join(
+            r"\b(" + "|".join(re.escape(term) for term in sorted(LEXICON[category], key=len, reverse=True)) + r")\b"
+            for category in self.categories
+        ))
+
+    def features(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row, column) of every hashed feature present, and the capped lexicon counts per row."""
+        rows, columns = [], []
+        lexicon = np.zeros((len(texts), len(self.categories)))
+        for row, text in enumerate(texts):
+            text = " ".join((text or "").lower().split())
+            buckets = {_bucket(feature, self.dims) for feature in _features(text)}
+            rows.extend([row] * len(buckets))
+            columns.extend(buckets)
+            for match in self.pattern.finditer(text):
+                lexicon[row, match.lastindex - 1] += 1
+        return np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp), np.minimum(lexicon, 3.0)
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        rows, columns, lexicon = self.features(texts)
+        logits = np.bincount(rows, weights=self.token_weights[columns], minlength=len(texts))
+        logits += lexicon @ self.lexicon_weights + self.bias
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def score(self, text: str) -> float:
+        return float(self.score_batch([text])[0])
+
+    def fit(self, texts: Sequence[str], labels: Sequence[bool], epochs: int = 300, learning_rate: float = 0.5,
+            l2: float = 1e-3, positive_weight: float = 3.0) -> None:
+        """
+        Logistic regression by full-batch gradient descent, starting from the
+        current weights. Risky turns count `positive_weight` times, since a
+        missed risk costs more than an unneeded model call.
+        """
+        rows, columns, lexicon = self.features(texts)
+        tokens = np.zeros((len(texts), self.dims))
+        tokens[rows, columns] = 1.0
+        y = np.asarray(labels, dtype=np.float64)
+        sample_weights = np.where(y > 0, positive_weight, 1.0)
+        sample_weights /= sample_weights.sum()
+        for _ in range(epochs):
+            logits = tokens @ self.token_weights + lexicon @ self.lexicon_weights + self.bias
+            error = (1.0 / (1.0 + np.exp(-logits)) - y) * sample_weights
+            self.token_weights -= learning_rate * (tokens.T @ error + l2 * self.token_weights)
+            self.lexicon_weights -= learning_rate * (lexicon.T @ error)
+            self.bias -= learning_rate * float(error.sum())
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path, token_weights=self.token_weights, lexicon_weights=self.lexicon_weights,
+            bias=self.bias, categories=np.asarray(self.categories),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PreScreener":
+        with np.load(path) as weights:
+            if list(weights["categories"]) != list(LEXICON):
+                raise ValueError(f"{path} was trained with different lexicon categories; retrain it")
+            return cls(
+                dims=len(weights["token_weights"]), token_weights=weights["token_weights"],
+                lexicon_weights=weights["lexicon_weights"], bias=float(weights["bias"]),
+            )
+
+
+def screened_out_result(score: float) -> dict:
+    """Assessment returned for a window the pre-screen let through without the model."""
+    return {
+        "riskAssessment": {
+            "risk_level": "low",
+            "risk_type": "No Risk",
+            "risky_reason": f"No risk signals found by the local pre-screen (score {score:.2f}).",
+        },
+        "riskNotification": {
+            "conversation_topic": "General conversation",
+            "conversation_summary": "Not assessed by the risk model: the pre-screen found no risk signals.",
+        },
+    }
+
+
+def evaluate(screener: PreScreener, texts: Sequence[str], labels: Sequence[bool], threshold: float) -> dict:
+    """Precision and recall of "score >= threshold" as the risky prediction, and the share of turns it would skip."""
+    flagged = screener.score_batch(texts) >= threshold
+    risky = np.asarray(labels, dtype=bool)
+    true_positives = int(np.sum(flagged & risky))
+    return {
+        "threshold": threshold,
+        "turns": len(texts),
+        "risky": int(risky.sum()),
+        "precision": true_positives / max(int(flagged.sum()), 1),
+        "recall": true_positives / max(int(risky.sum()), 1),
+        "skipped": float(1.0 - flagged.mean()) if len(texts) else 0.0,
+    }
+
+
+def load_labeled(path: str) -> Tuple[List[str], List[bool]]:
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record["text"])
+                labels.append(bool(record["risky"]))
+    return texts, labels
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the local risk pre-screen")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train = subcommands.add_parser("train", help="fit weights on labeled turns")
+    train.add_argument("labeled", help='JSON lines of {"text": ..., "risky": true/false}')
+    train.add_argument("--output", default="prescreen_weights.npz")
+    train.add_argument("--dims", type=int, default=1 << 14)
+    train.add_argument("--epochs", type=int, default=300)
+    train.add_argument("--threshold", type=float, default=0.3)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        texts, labels = load_labeled(args.labeled)
+        screener = PreScreener(dims=args.dims)
+        screener.fit(texts, labels, epochs=args.epochs)
+        screener.save(args.output)
+        print(json.dumps(evaluate(screener, texts, labels, args.threshold)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+A sampled request starts a background thread that records the event loop
+thread's Python stack every `interval` seconds. If the request then takes
+longer than `slow_seconds`, the samples are written to `output_dir` in the
+collapsed-stack format ("frame;frame;frame count" per line) read by
+flamegraph.pl and speedscope. The loop thread runs every request of the
+worker, so a profile also shows whatever concurrent requests were doing.
+Only one request is profiled at a time; with sampling off the middleware
+skips all of this.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class SlowRequestProfiler:
+    def __init__(self, sample_rate: float, slow_seconds: float, output_dir: str, interval: float = 0.005) -> None:
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.output_dir = output_dir
+        self.interval = interval
+        self._active = False
+
+    def begin(self) -> Optional[StackSampler]:
+        """A running sampler if this request is sampled, else None."""
+        if self._active or random.random() >= self.sample_rate:
+            return None
+        self._active = True
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        return sampler
+
+    def end(self, sampler: StackSampler, route: str, elapsed: float) -> Optional[str]:
+        """Stop sampling; write and return the profile path if the request was slow."""
+        sampler.stop()
+        self._active = False
+        if elapsed < self.slow_seconds or not sampler.samples:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_") or "root"
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{name}.collapsed")
+        with open(path, "w") as profile:
+            profile.write(sampler.collapsed())
+        return path
@@ -0,0 +1,52 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable
+
+
+class SlidingWindowLimiter:
+    """
+    Allows each key at most `limit` calls in any `window` seconds.
+
+    State is kept per worker, so with several workers a client can make up to
+    `limit` calls per worker. Keys idle for a whole window are dropped once
+    more than `max_keys` are tracked.
+    """
+
+    def __init__(self, limit: int, window: float = 60.0, max_keys: int = 100000) -> None:
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._calls: Dict[Hashable, Deque[float]] = {}
+
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: Hashable) -> float:
+        """Record a call for `key` and return 0, or return the seconds until it may call again."""
+        now = time.monotonic()
+        calls = self._calls.get(key)
+        if calls is None:
+            if len(self._calls) >= self.max_keys:
+                self._drop_idle(now)
+            calls = self._calls[key] = deque()
+        while calls and now - calls[0] >= self.window:
+            calls.popleft()
+        if len(calls) >= self.limit:
+            self.limited += 1
+            return self.window - (now - calls[0])
+        calls.append(now)
+        self.allowed += 1
+        return 0.0
+
+    def _drop_idle(self, now: float) -> None:
+        for key in [key for key, calls in self._calls.items() if not calls or now - calls[-1] >= self.window]:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window,
+            "clients": len(self._calls),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
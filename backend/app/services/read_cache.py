@@ -0,0 +1,201 @@
+import abc
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class CacheBackend(abc.ABC):
+    """
+    Storage for ReadCache entries. Every parent has a generation number that
+    `invalidate` bumps; `set` only stores a value loaded under the current
+    generation, so a read racing with a write cannot cache stale data.
+    Methods are coroutines so a backend doing I/O never blocks the event loop.
+    """
+
+    @abc.abstractmethod
+    async def get(self, parent_id: str, key: str) -> Any:
+        """Return the cached value, or _MISSING."""
+
+    @abc.abstractmethod
+    async def set(self, parent_id: str, key: str, value: Any, ttl: float, generation: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def generation(self, parent_id: str) -> int:
+        pass
+
+    @abc.abstractmethod
+    async def invalidate(self, parent_id: str) -> None:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU with TTL. Other workers only see an invalidation once their entries expire."""
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, parent_id: str, key: str) -> Any:
+        entry = self._entries.get((parent_id, key))
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[(parent_id, key)]
+            return _MISSING
+        self._entries.move_to_end((parent_id, key))
+        return value
+
+    async def set(self, parent_id: str, key: str, value: Any, ttl: float, generation: int) -> None:
+        if self._generations.get(parent_id, 0) != generation:
+            return
+        self._entries[(parent_id, key)] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end((parent_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def generation(self, parent_id: str) -> int:
+        return self._generations.get(parent_id, 0)
+
+    async def invalidate(self, parent_id: str) -> None:
+        self._generations[parent_id] = self._generations.get(parent_id, 0) + 1
+        for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == parent_id]:
+            del self._entries[entry_key]
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache shared by all gunicorn workers on a host through one SQLite file
+    (WAL mode). Invalidations are visible to every worker immediately.
+    Least recently used entries beyond `max_entries` are evicted on write.
+    Statements run on one dedicated thread, so a worker waiting for another's
+    write lock (up to the 5 s busy timeout) does not stall its event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="read-cache")
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS read_cache (parent_id TEXT, key TEXT, value TEXT, expires_at REAL, "
+            "last_used REAL, PRIMARY KEY (parent_id, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS read_cache_last_used ON read_cache (last_used)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS read_cache_generations (parent_id TEXT PRIMARY KEY, generation INTEGER)")
+
+    async def _run(self, work: Callable, *args):
+        """Run `work(*args)` on the cache thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, work, *args)
+
+    async def get(self, parent_id: str, key: str) -> Any:
+        return await self._run(self._get, parent_id, key)
+
+    async def set(self, parent_id: str, key: str, value: Any, ttl: float, generation: int) -> None:
+        await self._run(self._set, parent_id, key, value, ttl, generation)
+
+    async def generation(self, parent_id: str) -> int:
+        return await self._run(self._generation, parent_id)
+
+    async def invalidate(self, parent_id: str) -> None:
+        await self._run(self._invalidate, parent_id)
+
+    def _get(self, parent_id: str, key: str) -> Any:
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT value FROM read_cache WHERE parent_id = ? AND key = ? AND expires_at > ?", (parent_id, key, now)
+        ).fetchone()
+        if row is None:
+            return _MISSING
+        self.conn.execute("UPDATE read_cache SET last_used = ? WHERE parent_id = ? AND key = ?", (now, parent_id, key))
+        return json.loads(row[0])
+
+    def _set(self, parent_id: str, key: str, value: Any, ttl: float, generation: int) -> None:
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._generation(parent_id) == generation:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO read_cache VALUES (?, ?, ?, ?, ?)",
+                    (parent_id, key, json.dumps(value), now + ttl, now),
+                )
+                self.conn.execute(
+                    "DELETE FROM read_cache WHERE rowid IN (SELECT rowid FROM read_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def _generation(self, parent_id: str) -> int:
+        row = self.conn.execute("SELECT generation FROM read_cache_generations WHERE parent_id = ?", (parent_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _invalidate(self, parent_id: str) -> None:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT INTO read_cache_generations VALUES (?, 1) "
+                "ON CONFLICT (parent_id) DO UPDATE SET generation = generation + 1",
+                (parent_id,),
+            )
+            self.conn.execute("DELETE FROM read_cache WHERE parent_id = ?", (parent_id,))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+
+class ReadCache:
+    """
+    Read-through cache for the parent dashboard, keyed by parent user.
+    Write paths call `invalidate_parent` for the parents whose data changed.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 30.0) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, parent_id: Hashable, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        parent_id = str(parent_id)
+        value = await self.backend.get(parent_id, key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        generation = await self.backend.generation(parent_id)
+        value = await loader()
+        await self.backend.set(parent_id, key, value, self.ttl, generation)
+        return value
+
+    async def invalidate_parent(self, parent_id: Hashable) -> None:
+        self.invalidations += 1
+        await self.backend.invalidate(str(parent_id))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def build_read_cache(ttl: float, max_entries: int, sqlite_path: Optional[str] = None) -> ReadCache:
+    backend = SQLiteCacheBackend(sqlite_path, max_entries) if sqlite_path else MemoryCacheBackend(max_entries)
+    return ReadCache(backend, ttl)
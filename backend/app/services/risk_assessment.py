@@ -0,0 +1,358 @@
+"""
+Risk assessment of chat turns, on behalf of the extension.
+
+`RiskAssessmentGateway.assess` answers with the risk assessment
+(risk_level, risk_type, risky_reason) and notification (conversation_topic,
+conversation_summary) of a conversation window. Results are cached by a hash
+of the normalized `(contextChat, recentChat, character_profile)`, concurrent
+requests for the same window share one model call, and at most
+`max_concurrency` calls are in flight to the provider per worker. With a
+PreScreener (app/services/prescreen.py), windows whose recent turns score
+below the threshold are answered "No Risk" without calling the model.
+
+The model behind it is a RiskModel: the Dify workflow the extension used to
+call itself, an OpenAI-compatible chat completions endpoint, or a local
+keyword stub for development and load tests (RISK_MODEL_PROVIDER).
+"""
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from settings import app_settings
+from app.chains.custom_openai_exception import CustomOpenAIException
+from app.services.metrics import RISK_ASSESSMENTS, RISK_MODEL_SECONDS
+from app.services.prescreen import PreScreener, screened_out_result
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+
+
+def normalize_chat(text: str) -> str:
+    """Chat transcript with runs of spaces collapsed and blank lines dropped, for cache keys."""
+    lines = (_WHITESPACE.sub(" ", line).strip() for line in (text or "").split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def assessment_key(context_chat: str, recent_chat: str, character_profile: str) -> str:
+    canonical = json.dumps(
+        [normalize_chat(context_chat), normalize_chat(recent_chat), (character_profile or "default").strip()],
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def split_messages(messages: list, recent: int = 2) -> Tuple[str, str]:
+    """(contextChat, recentChat) of a message list, as the extension builds them."""
+    lines = [f"{message.get('sender_type')}: {message.get('content')}" for message in messages]
+    return "\n".join(lines[:-recent]), "\n".join(lines[-recent:])
+
+
+class RiskModelError(Exception):
+    """The provider failed or returned no usable assessment."""
+
+
+class RiskModel(abc.ABC):
+    name = "model"
+
+    @abc.abstractmethod
+    async def assess(self, context_chat: str, recent_chat: str, character_profile: str, user: Optional[str] = None) -> dict:
+        """{"riskAssessment": {...}, "riskNotification": {...}} for the window; raises RiskModelError."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class StubRiskModel(RiskModel):
+    """
+    Deterministic local stand-in: flags the recent turns by keyword. For
+    development without provider credentials and for load tests; `latency`
+    simulates the provider's response time.
+    """
+
+    name = "stub"
+
+    KEYWORDS = {
+        "self-harm": ("kill myself", "hurt myself", "suicide", "self harm", "cut myself"),
+        "sexual content": ("nude", "sexy", "undress"),
+        "violence": ("gun", "stab", "fight you", "kill you"),
+        "bullying": ("stupid", "loser", "ugly", "hate you"),
+    }
+    LEVELS = {"self-harm": "high", "sexual content": "high", "violence": "medium", "bullying": "medium"}
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    async def assess(self, context_chat: str, recent_chat: str, character_profile: str, user: Optional[str] = None) -> dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        recent = recent_chat.lower()
+        risk_type, keyword = next(
+            ((risk_type, word) for risk_type, words in self.KEYWORDS.items() for word in words if word in recent),
+            ("No Risk", None),
+        )
+        words = normalize_chat(f"{context_chat}\n{recent_chat}").split()
+        return {
+            "riskAssessment": {
+                "risk_level": self.LEVELS.get(risk_type, "low"),
+                "risk_type": risk_type,
+                "risky_reason": f'The recent messages mention "{keyword}".' if keyword else "No risky content found.",
+            },
+            "riskNotification": {
+                "conversation_topic": " ".join(words[1:6]) or "unknown",
+                "conversation_summary": f"Conversation of {len(words)} words.",
+            },
+        }
+
+
+class DifyWorkflowModel(RiskModel):
+    """
+    The Dify workflow with `contextChat`, `recentChat` and `character_profile`
+    inputs and "Risk Assessment" / "Risk Notification" JSON outputs. An empty
+    or unparsable output is retried up to `max_attempts` times with linear
+    backoff, as the extension did.
+    """
+
+    name = "dify"
+
+    def __init__(self, url: str, api_key: str, timeout: float = 60.0, max_attempts: int = 3, retry_delay: float = 2.0) -> None:
+        self.url = url
+        self.api_key = api_key
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def assess(self, context_chat: str, recent_chat: str, character_profile: str, user: Optional[str] = None) -> dict:
+        payload = {
+            "inputs": {"contextChat": context_chat, "recentChat": recent_chat, "character_profile": character_profile},
+            "response_mode": "blocking",
+            "user": user or "youthsafe-backend",
+        }
+        headers = {"Authorization": self.api_key if " " in self.api_key else f"Bearer {self.api_key}"}
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = await self.client.post(self.url, json=payload, headers=headers)
+            except httpx.HTTPError as e:
+                raise RiskModelError(f"Dify request failed: {str(e)}")
+            if response.status_code >= 400:
+                raise RiskModelError(f"Dify API error {response.status_code}: {response.text[:500]}")
+            try:
+                outputs = response.json()["data"]["outputs"]
+                return {
+                    "riskAssessment": json.loads(outputs["Risk Assessment"]),
+                    "riskNotification": json.loads(outputs["Risk Notification"]),
+                }
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Empty or invalid Dify output on attempt %s of %s", attempt, self.max_attempts)
+            if attempt < self.max_attempts:
+                await asyncio.sleep(self.retry_delay * attempt)
+        raise RiskModelError(f"No valid Dify output after {self.max_attempts} attempts")
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class OpenAIChatModel(RiskModel):
+    """Chat completions endpoint (OPENAI_API_BASE, OPENAI_API_KEY) asked for the same JSON as the workflow."""
+
+    name = "openai"
+
+    PROMPT = (
+        "You review a child's conversation with an AI chatbot for a parental safety dashboard. "
+        "Assess only the recent messages, using the earlier ones as context. Answer with a JSON object "
+        '{"riskAssessment": {"risk_level": "low" | "medium" | "high", "risk_type": <short category, or "No Risk">, '
+        '"risky_reason": <one sentence>}, "riskNotification": {"conversation_topic": <a few words>, '
+        '"conversation_summary": <one or two sentences>}}.'
+    )
+
+    def __init__(self, base_url: str, api_key: str, model: str, timeout: float = 60.0) -> None:
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.model = model
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def assess(self, context_chat: str, recent_chat: str, character_profile: str, user: Optional[str] = None) -> dict:
+        payload = {
+            "model": self.model,
+            "response_format": {"type": "json_object"},
+            "temperature": 0,
+            "messages": [
+                {"role": "system", "content": self.PROMPT},
+                {"role": "user", "content": (
+                    f"Chatbot character: {character_profile}\n\nEarlier messages:\n{context_chat}\n\nRecent messages:\n{recent_chat}"
+                )},
+            ],
+        }
+        try:
+            response = await self.client.post(self.url, json=payload, headers={"Authorization": f"Bearer {self.api_key}"})
+        except httpx.HTTPError as e:
+            raise RiskModelError(f"OpenAI request failed: {str(e)}")
+        if response.status_code >= 400:
+            raise RiskModelError(f"OpenAI API error {response.status_code}: {response.text[:500]}")
+        try:
+            result = json.loads(response.json()["choices"][0]["message"]["content"])
+            return {"riskAssessment": dict(result["riskAssessment"]), "riskNotification": dict(result["riskNotification"])}
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise RiskModelError(f"Invalid OpenAI output: {str(e)}")
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class RiskAssessmentGateway:
+    def __init__(
+        self, model: RiskModel, cache_size: int = 10000, cache_ttl: float = 3600.0, max_concurrency: int = 8,
+        prescreen: Optional[PreScreener] = None, prescreen_threshold: float = 0.3,
+    ) -> None:
+        self.model = model
+        self.prescreen = prescreen
+        self.prescreen_threshold = prescreen_threshold
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+
+        self.hits = 0
+        self.screened_out = 0
+        self.shared = 0
+        self.model_calls = 0
+        self.errors = 0
+        self.waiting = 0
+
+    async def assess(
+        self, context_chat: str, recent_chat: str, character_profile: str = "default", user: Optional[str] = None,
+    ) -> Tuple[dict, str]:
+        """
+        The assessment and where it came from: "cache", "prescreen" (no risk
+        signals, model skipped), "shared" (joined an identical call) or "model".
+        """
+        key = assessment_key(context_chat, recent_chat, character_profile)
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at >= time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                RISK_ASSESSMENTS.inc("cache")
+                return result, "cache"
+            del self._cache[key]
+
+        if self.prescreen is not None:
+            score = self.prescreen.score(recent_chat)
+            if score < self.prescreen_threshold:
+                self.screened_out += 1
+                RISK_ASSESSMENTS.inc("prescreen")
+                return screened_out_result(score), "prescreen"
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared += 1
+            source = "shared"
+        else:
+            # the call runs as its own task so a caller that disconnects does not cancel it for the others
+            task = asyncio.create_task(self._call_model(context_chat, recent_chat, character_profile, user))
+            task.add_done_callback(lambda task: self._finished(key, task))
+            self._in_flight[key] = task
+            source = "model"
+        RISK_ASSESSMENTS.inc(source)
+        return await asyncio.shield(task), source
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        del self._in_flight[key]
+        # errors are not cached; the next request for the window calls the model again
+        if not task.cancelled() and task.exception() is None:
+            self._remember(key, task.result())
+
+    async def _call_model(self, context_chat: str, recent_chat: str, character_profile: str, user: Optional[str]) -> dict:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        start = time.perf_counter()
+        try:
+            self.model_calls += 1
+            result = await self.model.assess(context_chat, recent_chat, character_profile, user)
+        except Exception:
+            self.errors += 1
+            RISK_MODEL_SECONDS.observe(time.perf_counter() - start, self.model.name, "error")
+            raise
+        finally:
+            self._slots.release()
+        RISK_MODEL_SECONDS.observe(time.perf_counter() - start, self.model.name, "ok")
+        return result
+
+    def _remember(self, key: str, result: dict) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.model.name,
+            "cached": len(self._cache),
+            "in_flight": len(self._in_flight),
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "hits": self.hits,
+            "screened_out": self.screened_out,
+            "shared": self.shared,
+            "model_calls": self.model_calls,
+            "errors": self.errors,
+        }
+
+    async def aclose(self) -> None:
+        await self.model.aclose()
+
+
+def provider_error(e: RiskModelError) -> CustomOpenAIException:
+    """Exception answered by the CustomOpenAIException handler in main.py (status 491)."""
+    return CustomOpenAIException(type(e), str(e))
+
+
+def build_risk_gateway() -> Optional[RiskAssessmentGateway]:
+    """Gateway for RISK_MODEL_PROVIDER, or None when that provider is not configured."""
+    provider = app_settings.risk_model_provider
+    if provider == "stub":
+        model = StubRiskModel(app_settings.risk_stub_latency)
+    elif provider == "dify":
+        if not app_settings.risk_dify_url or not app_settings.risk_dify_api_key:
+            return None
+        model = DifyWorkflowModel(
+            app_settings.risk_dify_url, app_settings.risk_dify_api_key,
+            timeout=app_settings.risk_model_timeout, max_attempts=app_settings.risk_model_max_attempts,
+        )
+    elif provider == "openai":
+        if not app_settings.openai_api_key:
+            return None
+        model = OpenAIChatModel(
+            app_settings.openai_api_base or "https://api.openai.com/v1", app_settings.openai_api_key,
+            app_settings.risk_openai_model, timeout=app_settings.risk_model_timeout,
+        )
+    else:
+        raise ValueError(f"Unknown RISK_MODEL_PROVIDER: {provider}")
+    prescreen = None
+    if app_settings.risk_prescreen_enabled:
+        weights = app_settings.risk_prescreen_weights
+        prescreen = PreScreener.load(weights) if weights else PreScreener()
+    return RiskAssessmentGateway(
+        model,
+        cache_size=app_settings.risk_cache_size,
+        cache_ttl=app_settings.risk_cache_ttl,
+        max_concurrency=app_settings.risk_max_concurrency,
+        prescreen=prescreen,
+        prescreen_threshold=app_settings.risk_prescreen_threshold,
+    )
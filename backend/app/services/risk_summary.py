@@ -0,0 +1,83 @@
+"""
+Risk summary for the dashboard charts.
+
+The counts live in the risk_summary_daily table (db_utils/sql/risk_summary.sql)
+and are kept current by the storage backend's increment_risk_summary on every
+alert write. This module shapes the daily buckets for the charts and provides the
+rebuild command:
+
+    python -m app.services.risk_summary rebuild
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+from typing import Optional
+
+RISK_LEVELS = ("low", "medium", "high")
+
+
+def default_range(days: int = 7) -> tuple:
+    """The last `days` days, today included, as ISO dates."""
+    end = date.today()
+    return (end - timedelta(days=days - 1)).isoformat(), end.isoformat()
+
+
+def summarize_buckets(buckets: list, start_date: str, end_date: str) -> dict:
+    """
+    Fold risk_summary_daily rows into the series the dashboard draws:
+    per-day counts by risk level and risk type, plus the risk type and
+    platform distributions over the whole range.
+    """
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = (start + timedelta(days=offset)).isoformat()
+        days[day] = {"date": day, "lowRisk": 0, "mediumRisk": 0, "highRisk": 0, "riskTypeCount": {}}
+
+    risk_types, platforms = {}, {}
+    total = 0
+    for bucket in buckets:
+        day = days.get(str(bucket["day"])[:10])
+        if day is None:
+            continue
+        count = bucket["count"]
+        total += count
+        if bucket["riskLevel"] in RISK_LEVELS:
+            day[f"{bucket['riskLevel']}Risk"] += count
+        day["riskTypeCount"][bucket["riskType"]] = day["riskTypeCount"].get(bucket["riskType"], 0) + count
+        risk_types[bucket["riskType"]] = risk_types.get(bucket["riskType"], 0) + count
+        platforms[bucket["platform"]] = platforms.get(bucket["platform"], 0) + count
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "total": total,
+        "days": list(days.values()),
+        "riskTypeDistribution": [{"name": name, "value": value} for name, value in risk_types.items()],
+        "platformDistribution": [{"name": name, "value": value} for name, value in platforms.items()],
+    }
+
+
+async def rebuild(client=None) -> int:
+    if client is None:
+        from db_utils.storage_backend import build_storage_backend
+        client = build_storage_backend()
+    try:
+        return await client.rebuild_risk_summary()
+    finally:
+        await client.aclose()
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the risk_summary_daily table")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild", help="recompute every bucket from risky_events_log")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        buckets = asyncio.run(rebuild())
+        print(f"Rebuilt risk summary: {buckets} buckets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Full-text search over a parent's history (GET /parental_control/search).
+
+The index covers message texts, conversation topics and summaries, and the
+type and reason of risky events. Every write of the storage backend adds its
+documents (index_search_documents): an FTS5 table on the SQLite backend, the
+search_documents table with a GIN-indexed tsvector on Supabase
+(db_utils/sql/search_index.sql). Rows written before the index existed, or
+while SEARCH_INDEX_ENABLED was off, are added with
+
+    python -m app.services.search rebuild
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+
+async def rebuild(client=None) -> int:
+    if client is None:
+        from db_utils.storage_backend import build_storage_backend
+        client = build_storage_backend()
+    try:
+        return await client.rebuild_search_index()
+    finally:
+        await client.aclose()
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the full-text search index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild", help="reindex every conversation, risky event and message")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        documents = asyncio.run(rebuild())
+        print(f"Rebuilt search index: {documents} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Benchmark of the API's ingest and dashboard read paths.
+
+Seeds a fresh SQLite storage backend (STORAGE_BACKEND=sqlite) with synthetic
+families, conversations, messages and risk events, then drives the app
+in-process (one event loop, like one worker) scenario by scenario at each
+concurrency level: /ids/generate, the four /receive endpoints and the
+parental_control and family reads, each parent authenticated with its own
+token. Every run with the same arguments sees the same data and requests.
+
+For each scenario and concurrency it reports p50/p95/p99 latency, throughput
+and database calls per request (round-trips to the storage thread and SQL
+statements, including write-behind flushes caused by the phase). Save the
+JSON with --output and check a later run against it with --compare:
+
+    cd backend
+    python -m benchmarks.bench_api --families 200 --concurrency 1 16 --output baseline.json
+    python -m benchmarks.bench_api --families 200 --concurrency 1 16 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PLATFORMS = ("CharacterAI", "ChatGPT", "Replika", "Talkie")
+RISK_TYPES = ("bullying", "self-harm", "sexual content", "violence", "No Risk")
+RISK_LEVELS = ("low", "medium", "high")
+START = datetime(2026, 1, 1)
+
+INGEST_SCENARIOS = ("ids_generate", "chatbots_receive", "conversations_receive", "messages_receive", "alerts_receive")
+READ_SCENARIOS = (
+    "get_all_conversations", "get_all_conversations_page", "get_all_convo", "get_all_convo_page",
+    "get_risky_event_by_id", "get_conversation_times", "risk_summary", "get_all_children",
+)
+# compared by --compare: metric -> True if higher is better
+COMPARED_METRICS = {"p95_ms": False, "throughput_rps": True, "db_calls_per_request": False}
+
+
+def auth_user_id(parent_user_id: int) -> str:
+    """The Supabase auth user (token `sub`) linked to a parent."""
+    return f"00000000-0000-4000-8000-{parent_user_id:012d}"
+
+
+def seed_database(path: str, args: argparse.Namespace) -> dict:
+    """Write the synthetic dataset; returns the IDs the scenarios pick from."""
+    from db_utils.sqlite_rds import SCHEMA
+
+    rng = random.Random(args.seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    users, relations, conversations, events, messages = [], [], [], [], []
+    chatbots = [(chatbot_id, f"bench-bot-{chatbot_id}", "{}", PLATFORMS[chatbot_id % len(PLATFORMS)]) for chatbot_id in range(1, 41)]
+    parents = list(range(1, args.families + 1))
+    users += [(parent, f"parent-{parent}", "parent", 40, auth_user_id(parent)) for parent in parents]
+    next_user = args.families + 1
+    families, family_events = {}, {}
+    for parent in parents:
+        families[parent] = []
+        family_events[parent] = []
+        for _ in range(args.children):
+            child = next_user
+            next_user += 1
+            users.append((child, f"child-{child}", "child", rng.randint(8, 17), None))
+            relations.append((parent, child))
+            families[parent].append(child)
+            for _ in range(args.conversations):
+                conversation_id = len(conversations) + 1
+                start = START + timedelta(minutes=rng.randrange(60 * 24 * 60))
+                conversations.append((
+                    conversation_id, child, rng.choice(chatbots)[0], start.isoformat(),
+                    (start + timedelta(minutes=rng.randint(1, 90))).isoformat(),
+                    rng.choice(("games", "homework", "friends", "music")), "bench conversation", "web",
+                ))
+                for turn in range(args.messages):
+                    messages.append((
+                        len(messages) + 1, conversation_id, "child" if turn % 2 == 0 else "bot",
+                        f"message {turn} of conversation {conversation_id}",
+                        (start + timedelta(seconds=30 * turn)).isoformat(), "user" if turn % 2 == 0 else "bot",
+                    ))
+                for _ in range(args.events):
+                    family_events[parent].append(len(events) + 1)
+                    events.append((
+                        len(events) + 1, conversation_id, child, rng.choice(RISK_LEVELS), rng.choice(RISK_TYPES),
+                        "bench", (start + timedelta(minutes=rng.randint(0, 90))).isoformat(),
+                    ))
+
+    conn.executemany("INSERT INTO users (user_id, username, role, user_age, auth_user_id) VALUES (?, ?, ?, ?, ?)", users)
+    conn.executemany("INSERT INTO parent_child_relations (parent_user_id, child_user_id) VALUES (?, ?)", relations)
+    conn.executemany('INSERT INTO chatbots (chatbot_id, name, metadata, "chatbotPlatform") VALUES (?, ?, ?, ?)', chatbots)
+    conn.executemany(
+        'INSERT INTO conversations (conversation_id, child_user_id, chatbot_id, start_time, end_time, "conversationTopic", '
+        '"conversationSummary", platform) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', conversations,
+    )
+    conn.executemany(
+        "INSERT INTO messages (message_id, conversation_id, sender, message_text, timestamp, sender_type) VALUES (?, ?, ?, ?, ?, ?)",
+        messages,
+    )
+    conn.executemany(
+        'INSERT INTO risky_events_log (risky_event_id, conversation_id, child_user_id, "riskLevel", "riskType", "riskyReason", timestamp) '
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", events,
+    )
+    conn.commit()
+    conn.close()
+    return {
+        "families": families,
+        "family_events": family_events,
+        "conversations": [(conversation[0], conversation[1]) for conversation in conversations],
+        "chatbots": [chatbot[0] for chatbot in chatbots],
+        "events": len(events),
+        "counts": {
+            "users": len(users), "conversations": len(conversations), "messages": len(messages),
+            "risky_events": len(events), "chatbots": len(chatbots),
+        },
+    }
+
+
+def access_token(parent_user_id: int) -> str:
+    import jwt
+    from settings import app_settings
+
+    claims = {"sub": auth_user_id(parent_user_id), "aud": "authenticated", "exp": int(time.time()) + 24 * 3600}
+    return jwt.encode(claims, app_settings.jwt_secret, algorithm="HS256")
+
+
+class RequestFactory:
+    """Deterministic (method, path, json, headers) for each scenario."""
+
+    def __init__(self, dataset: dict, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.dataset = dataset
+        self.parents = list(dataset["families"])
+        self.tokens = {parent: {"Authorization": f"Bearer {access_token(parent)}"} for parent in self.parents}
+        # IDs above the seeded ones, as /ids/generate would hand out
+        self.next_conversation_id = len(dataset["conversations"]) + 1_000_000
+        self.next_risk_event_id = dataset["events"] + 1_000_000
+
+    def _child(self) -> tuple:
+        parent = self.rng.choice(self.parents)
+        return parent, self.rng.choice(self.dataset["families"][parent])
+
+    def build(self, scenario: str) -> tuple:
+        rng = self.rng
+        parent, child = self._child()
+        headers = self.tokens[parent]
+        if scenario == "ids_generate":
+            return "POST", "/api/v1/ids/generate", {"userId": str(parent), "childUserId": child, "platform": rng.choice(PLATFORMS)}, None
+        if scenario == "chatbots_receive":
+            chatbot_id = rng.choice(self.dataset["chatbots"])
+            # the extension re-sends the same chatbot with every turn
+            return "POST", "/api/v1/chatbots/receive", {
+                "chatbot_id": chatbot_id, "name": f"bench-bot-{chatbot_id}", "metadata": {},
+                "chatbotPlatform": PLATFORMS[chatbot_id % len(PLATFORMS)],
+            }, None
+        if scenario == "conversations_receive":
+            self.next_conversation_id += 1
+            start = START + timedelta(minutes=rng.randrange(60 * 24 * 60))
+            return "POST", "/api/v1/conversations/receive", {
+                "user": str(parent), "conversation_id": self.next_conversation_id, "chatbot_id": rng.choice(self.dataset["chatbots"]),
+                "child_user_id": child, "start_time": start.isoformat(), "conversation_topic": "games",
+                "conversation_summary": "bench conversation", "platform": "web",
+            }, None
+        if scenario == "messages_receive":
+            conversation_id, _ = rng.choice(self.dataset["conversations"])
+            # overlapping chat windows: about a third of the texts are re-sends
+            return "POST", "/api/v1/messages/receive", {
+                "conversation_id": conversation_id, "sender": "child", "sender_type": "user",
+                "message_text": f"bench message {rng.randrange(3 * len(self.dataset['conversations']) + 1)}",
+            }, None
+        if scenario == "alerts_receive":
+            self.next_risk_event_id += 1
+            conversation_id, conversation_child = rng.choice(self.dataset["conversations"])
+            details = {
+                "risk_event_id": self.next_risk_event_id, "conversation_id": conversation_id, "child_user_id": conversation_child,
+                "riskLevel": rng.choice(RISK_LEVELS), "riskType": rng.choice(RISK_TYPES), "riskyReason": "bench",
+                "timestamp": (START + timedelta(minutes=rng.randrange(60 * 24 * 60))).isoformat(),
+            }
+            return "POST", "/api/v1/alerts/receive", {"user": str(parent), "alert_type": "risk", "alert_details": json.dumps(details)}, None
+        if scenario == "get_all_conversations":
+            return "GET", "/api/v1/parental_control/get_all_conversations", None, headers
+        if scenario == "get_all_conversations_page":
+            return "GET", "/api/v1/parental_control/get_all_conversations?limit=50", None, headers
+        if scenario == "get_all_convo":
+            return "GET", "/api/v1/parental_control/get_all_convo", None, headers
+        if scenario == "get_all_convo_page":
+            return "GET", "/api/v1/parental_control/get_all_convo?limit=50", None, headers
+        if scenario == "get_risky_event_by_id":
+            # one of the parent's own events; the route answers 404 for other parents' events
+            event_id = rng.choice(self.dataset["family_events"][parent] or [0])
+            return "GET", f"/api/v1/parental_control/get_risky_event_by_id/{event_id}", None, headers
+        if scenario == "get_conversation_times":
+            return "GET", "/api/v1/parental_control/get_conversation_times", None, headers
+        if scenario == "risk_summary":
+            return "GET", "/api/v1/parental_control/risk_summary?start_date=2026-01-01&end_date=2026-03-01", None, headers
+        if scenario == "get_all_children":
+            return "GET", "/api/v1/family/get_all_children", None, headers
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+class DBCallCounter:
+    """Counts round-trips to the SQLite storage thread and the statements they run."""
+
+    def __init__(self, storage) -> None:
+        self.calls = 0
+        self.statements = 0
+        run = storage._run
+
+        async def counted_run(work, *args):
+            self.calls += 1
+            return await run(work, *args)
+
+        storage._run = counted_run
+        storage._conn.set_trace_callback(self._statement)
+
+    def _statement(self, sql: str) -> None:
+        if not sql.startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+            self.statements += 1
+
+    def snapshot(self) -> tuple:
+        return self.calls, self.statements
+
+
+def failed(response) -> bool:
+    """Error status, or one of the /receive endpoints' {"ok": false} answers."""
+    if response.status_code >= 400:
+        return True
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return False
+    body = response.json()
+    return isinstance(body, dict) and body.get("ok") is False
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_scenario(client, factory: RequestFactory, counter: DBCallCounter, ingest_queue, scenario: str, concurrency: int, requests: int) -> dict:
+    # requests are built up front so their content does not depend on scheduling
+    pending = [factory.build(scenario) for _ in range(requests)]
+    pending.reverse()
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            method, path, body, headers = pending.pop()
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if failed(response):
+                errors += 1
+
+    calls_before, statements_before = counter.snapshot()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    if ingest_queue is not None:
+        # queued writes belong to this phase's database cost, not to the next one
+        await ingest_queue.flush()
+    calls_after, statements_after = counter.snapshot()
+
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1e3, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1e3, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 3),
+        "db_calls_per_request": round((calls_after - calls_before) / requests, 3),
+        "db_statements_per_request": round((statements_after - statements_before) / requests, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that got worse than the baseline by more than `tolerance` (a fraction)."""
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results["results"]:
+        before = previous.get((row["scenario"], row["concurrency"]))
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before[metric], row[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    "scenario": row["scenario"], "concurrency": row["concurrency"], "metric": metric,
+                    "baseline": old, "current": new, "change": round(change, 3),
+                })
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--families", type=int, default=100, help="parents in the synthetic dataset")
+    parser.add_argument("--children", type=int, default=2, help="children per family")
+    parser.add_argument("--conversations", type=int, default=10, help="conversations per child")
+    parser.add_argument("--messages", type=int, default=20, help="messages per conversation")
+    parser.add_argument("--events", type=int, default=2, help="risk events per conversation")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario and concurrency")
+    parser.add_argument("--scenarios", nargs="+", default=list(INGEST_SCENARIOS + READ_SCENARIOS),
+                        choices=INGEST_SCENARIOS + READ_SCENARIOS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--read-cache", action="store_true", help="keep the per-parent read cache on (off: every read hits storage)")
+    parser.add_argument("--no-write-behind", action="store_true", help="write messages and alerts inline instead of queueing them")
+    parser.add_argument("--db", help="SQLite file to create (default: a temporary file)")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression for --compare")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_api-")
+    db_path = args.db or os.path.join(workdir, "bench.sqlite3")
+    if os.path.exists(db_path):
+        parser.error(f"{db_path} already exists; the benchmark needs a fresh database")
+    os.environ.update(
+        STORAGE_BACKEND="sqlite",
+        STORAGE_SQLITE_PATH=db_path,
+        SUPABASE_JWT_SECRET=os.environ.get("SUPABASE_JWT_SECRET") or "bench-jwt-secret",
+        READ_CACHE_ENABLED="true" if args.read_cache else "false",
+        INGEST_WRITE_BEHIND="false" if args.no_write_behind else "true",
+        NOTIFY_ALERT_EMAILS="false",
+        SMTP_HOST="",
+        LOG_LEVEL="WARNING",
+    )
+    os.environ.pop("AUTH_DEV_USER_ID", None)
+
+    dataset = seed_database(db_path, args)
+
+    import httpx
+    from main import app
+    from routers.base import INGEST_QUEUE, RDS_CLIENT
+
+    factory = RequestFactory(dataset, args.seed)
+    counter = DBCallCounter(RDS_CLIENT)
+
+    async def run() -> list:
+        rows = []
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                for scenario in args.scenarios:
+                    for concurrency in args.concurrency:
+                        rows.append(await run_scenario(client, factory, counter, INGEST_QUEUE, scenario, concurrency, args.requests))
+        return rows
+
+    results = {
+        "config": {
+            key: getattr(args, key)
+            for key in ("families", "children", "conversations", "messages", "events", "requests", "seed", "read_cache", "no_write_behind")
+        },
+        "dataset": dataset["counts"],
+        "results": asyncio.run(run()),
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            results["regressions"] = compare(results, json.load(baseline_file), args.tolerance)
+        exit_code = 1 if results["regressions"] else 0
+    print(json.dumps(results, indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
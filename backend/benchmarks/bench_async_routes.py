@@ -0,0 +1,94 @@
+"""
+Load test for per-worker request concurrency.
+
+Drives /parental_control/get_all_convo in-process (one event loop, like one
+gunicorn worker) against a fake PostgREST server with fixed latency, with the
+awaited AsyncRDSClient and, given --baseline, with the blocking RDSClient of
+that git revision called from an async route (see legacy_client.py), and
+reports throughput at each concurrency level.
+
+    cd backend
+    python -m benchmarks.bench_async_routes --latency 0.02 --concurrency 1 4 16 64 \
+        --baseline "$(git rev-list -1 HEAD -- db_utils/supabase_rds.py)~1"
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from benchmarks import fake_postgrest
+
+
+async def drive(app, path: str, concurrency: int, requests: int) -> dict:
+    import httpx
+
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02, help="fake PostgREST latency per call (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--baseline", help="git revision whose blocking RDSClient to compare with")
+    args = parser.parse_args()
+
+    os.environ["SUPABASE_URL"] = fake_postgrest.start(args.latency)
+    os.environ["SUPABASE_SERVICE_KEY"] = "bench.service.key"
+    os.environ["AUTH_DEV_USER_ID"] = "1"  # requests run as parent 1 without a token
+
+    from fastapi import FastAPI
+    from benchmarks.legacy_client import load_rds_client
+    from main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    legacy_app = None
+    if args.baseline:
+        legacy_app = FastAPI()
+        legacy_client = load_rds_client(args.baseline)()
+
+        @legacy_app.get("/api/v1/parental_control/get_all_convo")
+        async def legacy_get_all_convo():
+            return legacy_client.get_all_conversations(1)
+
+    async def main():
+        # one event loop for the whole run: the pooled connections are bound to it
+        path = "/api/v1/parental_control/get_all_convo"
+        results = {"latency_s": args.latency, "async": []}
+        if legacy_app is not None:
+            results["blocking"] = []
+        for concurrency in args.concurrency:
+            results["async"].append(await drive(app, path, concurrency, args.requests))
+            if legacy_app is not None:
+                results["blocking"].append(await drive(legacy_app, path, concurrency, args.requests))
+        return results
+
+    print(json.dumps(asyncio.run(main()), indent=2))
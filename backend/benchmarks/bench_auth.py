@@ -0,0 +1,90 @@
+"""
+Per-request cost of bearer-token authentication.
+
+Measures TokenVerifier.verify with and without the verified-token cache, then
+the end-to-end overhead of the current_parent_user_id dependency on an
+in-process request compared with the same route without authentication.
+
+    cd backend
+    python -m benchmarks.bench_auth --iterations 20000 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import jwt
+
+from benchmarks import fake_postgrest
+
+SECRET = "bench-secret"
+
+
+def make_token(sub: str = "1") -> str:
+    return jwt.encode({"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 3600}, SECRET, algorithm="HS256")
+
+
+def bench_verify(iterations: int) -> dict:
+    from app.services.auth import TokenVerifier
+
+    token = make_token()
+    results = {}
+    for name, cache_size in (("uncached", 0), ("cached", 10000)):
+        verifier = TokenVerifier(SECRET, cache_size=cache_size)
+        verifier.verify(token)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            verifier.verify(token)
+        results[f"verify_{name}_us"] = (time.perf_counter() - start) / iterations * 1e6
+    return results
+
+
+async def bench_requests(requests: int) -> dict:
+    import httpx
+    from fastapi import Depends, FastAPI
+
+    import routers.base as base
+    from app.services.auth import TokenVerifier
+
+    app = FastAPI()
+
+    @app.get("/open")
+    async def open_route():
+        return {"parent_user_id": "1"}
+
+    @app.get("/authed")
+    async def authed_route(parent_user_id: str = Depends(base.current_parent_user_id)):
+        return {"parent_user_id": parent_user_id}
+
+    headers = {"Authorization": f"Bearer {make_token()}"}
+
+    async def per_request(path: str) -> float:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+            (await client.get(path)).raise_for_status()
+            start = time.perf_counter()
+            for _ in range(requests):
+                (await client.get(path)).raise_for_status()
+            return (time.perf_counter() - start) / requests * 1e6
+
+    results = {"open_us": await per_request("/open")}
+    for name, cache_size in (("uncached", 0), ("cached", 10000)):
+        base.TOKEN_VERIFIER = TokenVerifier(SECRET, cache_size=cache_size)
+        results[f"authed_{name}_us"] = await per_request("/authed")
+        results[f"auth_overhead_{name}_us"] = results[f"authed_{name}_us"] - results["open_us"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ["SUPABASE_URL"] = fake_postgrest.start(0.0)
+    os.environ["SUPABASE_SERVICE_KEY"] = "bench.service.key"
+    os.environ["SUPABASE_JWT_SECRET"] = SECRET
+
+    results = bench_verify(args.iterations)
+    results.update(asyncio.run(bench_requests(args.requests)))
+    print(json.dumps(results, indent=2))
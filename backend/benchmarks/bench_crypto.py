@@ -0,0 +1,76 @@
+"""
+Decryption throughput of extension payloads, in MB of plaintext per second.
+
+Compares the original per-call decrypt_data (new Cipher and unpadder for every
+payload) with app.services.crypto: cached cipher per key, batch decryption of
+legacy ECB payloads, and the authenticated AES-GCM format.
+
+    cd backend
+    python -m benchmarks.bench_crypto --sizes 64 1024 16384 --count 5000
+"""
+import argparse
+import base64
+import json
+import os
+import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from app.services import crypto
+
+KEY = "0123456789abcdef0123456789abcdef"
+
+
+def original_decrypt_data(encrypted_data, key):
+    """decrypt_data as it was in routers/base.py"""
+    if not encrypted_data.strip():
+        return encrypted_data.strip()
+    encrypted_data_bytes = base64.b64decode(encrypted_data)
+    key_bytes = key.encode('utf-8')
+    backend = default_backend()
+    cipher = Cipher(algorithms.AES(key_bytes), modes.ECB(), backend=backend)
+    decryptor = cipher.decryptor()
+    decrypted_padded_data = decryptor.update(encrypted_data_bytes) + decryptor.finalize()
+    unpadder = padding.PKCS7(128).unpadder()
+    decrypted_data = unpadder.update(decrypted_padded_data) + unpadder.finalize()
+    return decrypted_data.decode()
+
+
+def throughput(fn, total_bytes: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return total_bytes / best / 1e6
+
+
+def run(size: int, count: int) -> dict:
+    cipher = crypto.get_cipher(KEY)
+    plaintexts = [base64.b64encode(os.urandom(size))[:size].decode() for _ in range(count)]
+    legacy = [cipher.encrypt_legacy(text) for text in plaintexts]
+    authenticated = [cipher.encrypt(text) for text in plaintexts]
+    assert crypto.decrypt_many(legacy, KEY) == plaintexts
+    assert crypto.decrypt_many(authenticated, KEY) == plaintexts
+
+    total = size * count
+    return {
+        "payload_bytes": size,
+        "payloads": count,
+        "original_ecb_mb_s": throughput(lambda: [original_decrypt_data(p, KEY) for p in legacy], total),
+        "cached_ecb_mb_s": throughput(lambda: [crypto.decrypt(p, KEY) for p in legacy], total),
+        "batch_ecb_mb_s": throughput(lambda: crypto.decrypt_many(legacy, KEY), total),
+        "gcm_mb_s": throughput(lambda: [crypto.decrypt(p, KEY) for p in authenticated], total),
+        "batch_gcm_mb_s": throughput(lambda: crypto.decrypt_many(authenticated, KEY), total),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 1024, 16384])
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(json.dumps([run(size, args.count) for size in args.sizes], indent=2))
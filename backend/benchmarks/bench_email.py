@@ -0,0 +1,67 @@
+"""
+Throughput of notification emails against the local stand-in SMTP server.
+
+Compares the legacy path (a new connection and login per email) with the
+pooled EmailDispatcher, for a burst of N emails. The fake server adds a fixed
+delay per reply, so the numbers show round-trips saved, not real relay speed.
+
+    cd backend
+    python -m benchmarks.bench_email --emails 200 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import smtplib
+import time
+
+from benchmarks import fake_smtp
+
+SENDER = "alerts@example.com"
+
+
+def run_per_email(host: str, port: int, emails: int) -> dict:
+    from app.services.email import build_email
+
+    fake_smtp.reset()
+    start = time.perf_counter()
+    for i in range(emails):
+        msg = build_email(f"parent{i}@example.com", "Risk alert", "A risky event was detected.")
+        with smtplib.SMTP(host, port) as server:
+            server.login("bench", "bench")
+            server.sendmail(SENDER, msg["To"], msg.as_string())
+    seconds = time.perf_counter() - start
+    return {"mode": "per_email", "emails": emails, "seconds": seconds, "emails_per_s": emails / seconds,
+            "connections": fake_smtp.STATS["connections"], "logins": fake_smtp.STATS["logins"]}
+
+
+async def run_dispatcher(host: str, port: int, emails: int, pool_size: int, max_batch: int) -> dict:
+    from app.services.email import EmailDispatcher, SMTPConnectionPool
+
+    fake_smtp.reset()
+    pool = SMTPConnectionPool(host, port, "bench", "bench", size=pool_size, starttls=False)
+    dispatcher = EmailDispatcher(pool, SENDER, workers=pool_size, max_batch=max_batch)
+    await dispatcher.start()
+    start = time.perf_counter()
+    for i in range(emails):
+        dispatcher.submit(f"parent{i}@example.com", "Risk alert", "A risky event was detected.")
+    submit_seconds = time.perf_counter() - start
+    while dispatcher.stats()["pending"]:
+        await asyncio.sleep(0.005)
+    seconds = time.perf_counter() - start
+    await dispatcher.stop()
+    return {"mode": "dispatcher", "emails": emails, "seconds": seconds, "emails_per_s": emails / seconds,
+            "submit_ms": submit_seconds * 1e3, "connections": fake_smtp.STATS["connections"],
+            "logins": fake_smtp.STATS["logins"], "batches": dispatcher.batches}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005, help="fake SMTP delay per reply (s)")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=20)
+    args = parser.parse_args()
+
+    host, port = fake_smtp.start(args.latency)
+    print(json.dumps(run_per_email(host, port, args.emails)))
+    print(json.dumps(asyncio.run(run_dispatcher(host, port, args.emails, args.pool_size, args.max_batch))))
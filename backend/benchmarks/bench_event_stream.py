@@ -0,0 +1,163 @@
+"""
+Load test for the /parental_control/stream WebSocket.
+
+Starts the API with uvicorn in a subprocess (against a fake PostgREST server),
+connects N subscribers, posts alerts through /alerts/receive and measures how
+long each event takes to reach every subscriber. With --workers > 1 the
+workers share events through the Unix socket broker, like the gunicorn
+deployment. The subscribers all run in this process, so at high counts the
+latencies include client-side queueing.
+
+    cd backend
+    python -m benchmarks.bench_event_stream --subscribers 100 1000 5000 --workers 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fake_postgrest
+
+
+def server_rss_mb(pid: int) -> float:
+    """Resident memory of the server process and its workers."""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            pids += [int(child) for child in children.read().split()]
+    except OSError:
+        pass
+    for process in pids:
+        try:
+            with open(f"/proc/{process}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+async def wait_until_up(base_url: str, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                (await client.get("/api/v1/")).raise_for_status()
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def run(base_url: str, subscribers: int, events: int, interval: float, token: str) -> dict:
+    import httpx
+    import websockets
+
+    ws_url = base_url.replace("http", "ws", 1) + f"/api/v1/parental_control/stream?token={token}"
+    latencies = []
+    received = 0
+
+    async def listen(connection):
+        nonlocal received
+        async for raw in connection:
+            message = json.loads(raw)
+            if message["type"] == "risky_event":
+                latencies.append(time.time() - float(message["data"]["timestamp"]))
+                received += 1
+
+    start = time.perf_counter()
+    connections = []
+    for _ in range(subscribers):
+        connections.append(await websockets.connect(ws_url, max_queue=None, ping_interval=None))
+    connect_seconds = time.perf_counter() - start
+    listeners = [asyncio.create_task(listen(connection)) for connection in connections]
+    await asyncio.sleep(0.5)
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for event_id in range(events):
+            details = {
+                "risk_event_id": event_id + 1, "conversation_id": 1, "child_user_id": 1,
+                "riskLevel": "high", "riskType": "bench", "timestamp": repr(time.time()),
+            }
+            response = await client.post("/api/v1/alerts/receive", json={
+                "user": "bench", "alert_type": "risk", "alert_details": json.dumps(details),
+            })
+            response.raise_for_status()
+            await asyncio.sleep(interval)
+
+    deadline = time.monotonic() + 10
+    while received < subscribers * events and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    rss = server_rss_mb(SERVER.pid)
+
+    for listener in listeners:
+        listener.cancel()
+    await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+
+    latencies.sort()
+    return {
+        "subscribers": subscribers,
+        "events": events,
+        "delivered": received / (subscribers * events),
+        "connect_s": connect_seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1e3 if latencies else None,
+        "max_ms": latencies[-1] * 1e3 if latencies else None,
+        "server_rss_mb": rss,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="pause between alerts (s)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8399)
+    parser.add_argument("--latency", type=float, default=0.002, help="fake PostgREST latency per call (s)")
+    args = parser.parse_args()
+
+    import jwt
+
+    secret = os.environ.get("SUPABASE_JWT_SECRET", "bench-secret")
+    # the fake PostgREST links every sub to user 1, the parent of its only child
+    token = jwt.encode({"sub": "1", "aud": "authenticated", "exp": int(time.time()) + 3600}, secret, algorithm="HS256")
+    env = dict(
+        os.environ,
+        SUPABASE_URL=fake_postgrest.start(args.latency),
+        SUPABASE_SERVICE_KEY="bench.service.key",
+        SUPABASE_JWT_SECRET=secret,
+        INGEST_WRITE_BEHIND="false",
+        READ_CACHE_ENABLED="false",
+        RISK_SUMMARY_ENABLED="false",
+        ID_ALLOCATOR_BACKEND="sqlite",
+        ID_ALLOCATOR_SQLITE_PATH=os.path.join(tempfile.mkdtemp(), "ids.sqlite3"),
+    )
+    if args.workers > 1:
+        env["EVENT_STREAM_SOCKET_DIR"] = tempfile.mkdtemp()
+    SERVER = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_until_up(base_url))
+        for subscribers in args.subscribers:
+            result = asyncio.run(run(base_url, subscribers, args.events, args.interval, token))
+            result["workers"] = args.workers
+            print(json.dumps(result))
+    finally:
+        SERVER.terminate()
+        SERVER.wait()
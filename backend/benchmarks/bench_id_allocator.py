@@ -0,0 +1,105 @@
+"""
+Benchmark for /ids/generate ID allocation.
+
+Compares the legacy "select every ID, max()+1" strategy against BlockIdAllocator
+on a local SQLite stand-in, for growing table sizes, and checks that concurrent
+worker processes never receive the same ID.
+
+    cd backend
+    python -m benchmarks.bench_id_allocator --sizes 1000 100000 10000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from db_utils.id_allocator import ID_COLUMNS, BlockIdAllocator, SQLiteCounterSource
+
+
+def build_table(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ids (id INTEGER PRIMARY KEY)")
+    conn.execute(
+        "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < ?) INSERT INTO ids SELECT x FROM c",
+        (rows,),
+    )
+    conn.commit()
+    conn.close()
+
+
+def percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_us": pick(0.50) * 1e6, "p95_us": pick(0.95) * 1e6, "mean_us": statistics.mean(samples) * 1e6}
+
+
+def legacy_request(conn: sqlite3.Connection) -> None:
+    # /ids/generate used to scan four tables; all four read the same table here
+    for _ in ID_COLUMNS:
+        existing_ids = [r[0] for r in conn.execute("SELECT id FROM ids")]
+        max(existing_ids, default=0) + 1
+
+
+def bench_size(rows: int, iterations: int, legacy_iterations: int, block_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        table_path = os.path.join(tmp, "table.sqlite3")
+        build_table(table_path, rows)
+        conn = sqlite3.connect(table_path)
+
+        legacy = []
+        for _ in range(legacy_iterations):
+            start = time.perf_counter()
+            legacy_request(conn)
+            legacy.append(time.perf_counter() - start)
+
+        seed = lambda counter: conn.execute("SELECT max(id) FROM ids").fetchone()[0] or 0
+        allocator = BlockIdAllocator(SQLiteCounterSource(os.path.join(tmp, "counters.sqlite3"), seed=seed), block_size)
+        allocated = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            for counter in ID_COLUMNS:
+                allocator.next_id(counter)
+            allocated.append(time.perf_counter() - start)
+        conn.close()
+
+    return {"rows": rows, "legacy": percentiles(legacy) if legacy else None, "allocator": percentiles(allocated)}
+
+
+def _worker(path: str, count: int, block_size: int, queue) -> None:
+    allocator = BlockIdAllocator(SQLiteCounterSource(path), block_size)
+    queue.put([allocator.next_id("messages") for _ in range(count)])
+
+
+def check_uniqueness(workers: int, ids_per_worker: int, block_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "counters.sqlite3")
+        SQLiteCounterSource(path)
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_worker, args=(path, ids_per_worker, block_size, queue)) for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+        ids = [i for _ in procs for i in queue.get()]
+        for proc in procs:
+            proc.join()
+    return {"workers": workers, "allocated": len(ids), "duplicates": len(ids) - len(set(ids))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--legacy-iterations", type=int, default=3)
+    parser.add_argument("--block-size", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=9)
+    parser.add_argument("--ids-per-worker", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {
+        "sizes": [bench_size(rows, args.iterations, args.legacy_iterations, args.block_size) for rows in args.sizes],
+        "uniqueness": check_uniqueness(args.workers, args.ids_per_worker, args.block_size),
+    }
+    print(json.dumps(results, indent=2))
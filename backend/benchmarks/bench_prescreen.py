@@ -0,0 +1,90 @@
+"""
+Precision, recall and per-turn latency of the local risk pre-screen.
+
+Scores the labeled turns in prescreen_turns.jsonl (or --labeled) with the
+lexicon-only screener, with --weights if given, and with weights trained on
+half of the turns and evaluated on the other half (two folds). Precision and
+recall treat "score >= threshold", i.e. "send to the model", as the risky
+prediction; "skipped" is the share of turns that would not reach the model.
+Latency is in microseconds per turn, scored one at a time and in batches.
+
+    cd backend
+    python -m benchmarks.bench_prescreen --thresholds 0.2 0.3 0.5 --batch 1000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from app.services.prescreen import PreScreener, evaluate, load_labeled
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "prescreen_turns.jsonl")
+
+
+def cross_validated(texts: list, labels: list, thresholds: list, seed: int) -> list:
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    folds = [order[0::2], order[1::2]]
+    results = []
+    for threshold in thresholds:
+        flagged_risky = flagged = risky = 0
+        for train, test in ((folds[0], folds[1]), (folds[1], folds[0])):
+            screener = PreScreener()
+            screener.fit([texts[i] for i in train], [labels[i] for i in train])
+            scores = screener.score_batch([texts[i] for i in test])
+            test_labels = np.asarray([labels[i] for i in test])
+            flagged_risky += int(np.sum((scores >= threshold) & test_labels))
+            flagged += int(np.sum(scores >= threshold))
+            risky += int(test_labels.sum())
+        results.append({
+            "threshold": threshold,
+            "turns": len(texts),
+            "risky": risky,
+            "precision": flagged_risky / max(flagged, 1),
+            "recall": flagged_risky / max(risky, 1),
+            "skipped": 1.0 - flagged / len(texts),
+        })
+    return results
+
+
+def latency(screener: PreScreener, texts: list, batch: int, repeat: int = 3) -> dict:
+    turns = (texts * (batch // len(texts) + 1))[:batch]
+    single = batched = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in turns:
+            screener.score(text)
+        single = min(single, time.perf_counter() - start)
+        start = time.perf_counter()
+        screener.score_batch(turns)
+        batched = min(batched, time.perf_counter() - start)
+    return {"single_us_per_turn": single / batch * 1e6, "batch_us_per_turn": batched / batch * 1e6, "batch": batch}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labeled", default=FIXTURE)
+    parser.add_argument("--weights", help="trained weights (.npz) to evaluate as well")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.2, 0.3, 0.5])
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, labels = load_labeled(args.labeled)
+    lexicon_only = PreScreener()
+    results = {
+        "lexicon_only": [evaluate(lexicon_only, texts, labels, threshold) for threshold in args.thresholds],
+        "trained_two_fold": cross_validated(texts, labels, args.thresholds, args.seed),
+        "latency": latency(lexicon_only, texts, args.batch),
+    }
+    if args.weights:
+        trained = PreScreener.load(args.weights)
+        results["weights"] = [evaluate(trained, texts, labels, threshold) for threshold in args.thresholds]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
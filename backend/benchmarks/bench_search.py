@@ -0,0 +1,124 @@
+"""
+Query latency of GET /parental_control/search on the SQLite backend.
+
+Seeds a temporary database with --parents parents of two children each,
+--conversations conversations and --messages synthetic chat turns (shaped like
+bench_text_codec's), indexes them through the backend's own index writer, and
+times SQLiteRDSClient.search for one parent: a common word, a rare word, a
+prefix and a two-word query, over all kinds and over messages of one child.
+Latency is in milliseconds.
+
+    cd backend
+    python -m benchmarks.bench_search --messages 1000000 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_text_codec import ENDINGS, OPENERS, REPLIES, SUBJECTS, VERBS
+from db_utils.sqlite_rds import SQLiteRDSClient
+
+RARE = ["skateboard", "volcano", "origami", "telescope", "saxophone", "glacier"]
+QUERIES = {
+    "common": "homework",
+    "rare": "saxophone",
+    "prefix": "stress*",
+    "two_words": "best friend",
+}
+
+
+def turn(rng: random.Random, index: int) -> str:
+    if index % 2:
+        return f"{rng.choice(REPLIES)} {rng.choice(REPLIES)}"
+    text = f"{rng.choice(OPENERS)} {rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(ENDINGS)}"
+    return text + (f" {rng.choice(RARE)}" if rng.random() < 0.001 else "")
+
+
+def seeder(client: SQLiteRDSClient, parents: int, conversations: int, messages: int, batch: int, rng: random.Random):
+    """Work for client._transaction that writes the relations and conversations and indexes every document."""
+    def run(conn):
+        conn.executemany(
+            "INSERT INTO parent_child_relations (parent_user_id, child_user_id) VALUES (?, ?)",
+            [(parent, child) for parent in range(1, parents + 1) for child in (parent * 2, parent * 2 + 1)],
+        )
+        rows = []
+        for conversation_id in range(1, conversations + 1):
+            rows.append({
+                "conversation_id": conversation_id, "child_user_id": rng.randint(2, parents * 2 + 1), "start_time": "2026-01-01T00:00:00",
+                "conversationTopic": rng.choice(SUBJECTS), "conversationSummary": f"Talked about {rng.choice(SUBJECTS)}.",
+            })
+        conn.executemany(
+            'INSERT INTO conversations (conversation_id, child_user_id, start_time, "conversationTopic", "conversationSummary") '
+            "VALUES (:conversation_id, :child_user_id, :start_time, :conversationTopic, :conversationSummary)",
+            rows,
+        )
+        client._index_search_documents(conn, client._conversation_documents(rows))
+
+        for start in range(0, messages, batch):
+            details = [{"message_text": turn(rng, index)} for index in range(start, min(start + batch, messages))]
+            message_rows = [
+                {"message_id": start + offset + 1, "conversation_id": rng.randint(1, conversations), "timestamp": "2026-01-01T00:00:00"}
+                for offset in range(len(details))
+            ]
+            client._index_search_documents(conn, client._message_documents(details, message_rows))
+
+    return run
+
+
+def percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": samples[-1] * 1000}
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "search.db")
+        client = SQLiteRDSClient(path)
+        try:
+            start = time.perf_counter()
+            await client._transaction(seeder(client, args.parents, args.conversations, args.messages, args.batch, rng))
+            seconds = time.perf_counter() - start
+            report = {
+                "messages": args.messages,
+                "conversations": args.conversations,
+                "parents": args.parents,
+                "index_seconds": seconds,
+                "messages_per_second": args.messages / seconds if seconds else 0.0,
+                "database_mb": os.path.getsize(path) / 1e6,
+                "queries": {},
+            }
+            for scope, kwargs in (("all_kinds", {}), ("child_messages", {"kinds": ["message"], "child_user_id": 2})):
+                for name, query in QUERIES.items():
+                    samples, hits = [], 0
+                    for _ in range(args.queries):
+                        start = time.perf_counter()
+                        results = await client.search("1", query, limit=args.limit, **kwargs)
+                        samples.append(time.perf_counter() - start)
+                        hits = len(results)
+                    report["queries"][f"{scope}:{name}"] = {"results": hits, **percentiles(samples)}
+            return report
+        finally:
+            await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--parents", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Stored size and encode/decode throughput of the transcript column codec.
+
+Builds synthetic transcripts shaped like the extension's (overlapping windows
+of "user: ..." / "char: ..." lines, stored as JSON strings like alert
+messages), trains a dictionary on half of them and measures plain zlib and
+zlib with the dictionary on the other half. Throughput is MB of original text
+per second.
+
+    cd backend
+    python -m benchmarks.bench_text_codec --transcripts 2000 --turns 6 20 50
+"""
+import argparse
+import json
+import random
+
+from db_utils.text_codec import TextCodec, dictionary_id, measure, train_dictionary
+
+OPENERS = ["hey", "hi", "so", "okay", "wait", "lol", "honestly", "um", "yeah", "no way"]
+SUBJECTS = ["my math homework", "the new game", "school tomorrow", "my best friend", "this character", "the weekend",
+            "my parents", "the test", "practice", "that movie", "my sister", "the party"]
+VERBS = ["is so", "was kind of", "seems", "feels", "got", "might be", "is getting"]
+ENDINGS = ["annoying", "really fun", "weird", "boring", "stressful", "awesome", "confusing", "a lot", "too hard"]
+REPLIES = ["That sounds like a lot to deal with. Want to talk about it?", "I'm here for you! Tell me more.",
+           "*smiles warmly* I understand how you feel.", "Haha, that's so relatable!",
+           "What happened next?", "Have you told anyone else about this?", "*tilts head* Really? Why do you think so?"]
+
+
+def synthetic_transcripts(count: int, turns: int, seed: int) -> list:
+    rng = random.Random(seed)
+    transcripts = []
+    for _ in range(count):
+        lines = []
+        for turn in range(turns):
+            if turn % 2 == 0:
+                lines.append(f"user: {rng.choice(OPENERS)} {rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(ENDINGS)}")
+            else:
+                lines.append(f"char: {rng.choice(REPLIES)} {rng.choice(REPLIES)}")
+        transcripts.append(json.dumps("\n".join(lines)))
+    return transcripts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcripts", type=int, default=2000)
+    parser.add_argument("--turns", type=int, nargs="+", default=[6, 20, 50])
+    parser.add_argument("--min-size", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    for turns in args.turns:
+        transcripts = synthetic_transcripts(args.transcripts, turns, args.seed)
+        training, evaluation = transcripts[::2], transcripts[1::2]
+        dictionary = train_dictionary(training)
+        results.append({
+            "turns": turns,
+            "mean_bytes": sum(len(text) for text in evaluation) / len(evaluation),
+            "dictionary": {"id": dictionary_id(dictionary), "bytes": len(dictionary)},
+            "zlib": measure(TextCodec(args.min_size), evaluation),
+            "zlib_dictionary": measure(TextCodec(args.min_size, dictionaries=[dictionary]), evaluation),
+            # every value compressed, to show what the dictionary does for short ones
+            "zlib_dictionary_all": measure(TextCodec(0, dictionaries=[dictionary]), evaluation),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Microbenchmark for chatbot writes.
+
+Replays the extension's pattern (the same chatbot re-sent with every turn,
+occasionally changed) through the upserting, hash-caching AsyncRDSClient and,
+given --baseline, the select-then-update RDSClient of that git revision (see
+legacy_client.py) against a fake PostgREST server, and reports PostgREST
+round-trips and latency per call.
+
+    cd backend
+    python -m benchmarks.bench_write_chatbot --calls 200 --change-every 50 \
+        --baseline "$(git rev-list -1 HEAD -- db_utils/supabase_rds.py)~1"
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from benchmarks import fake_postgrest
+
+
+def payloads(calls: int, change_every: int):
+    for i in range(calls):
+        yield {
+            "chatbot_id": 1,
+            "name": f"testBot v{i // change_every}",
+            "metadata": json.dumps({"version": "1.0", "language": "en"}),
+            "chatbotPlatform": "CharacterAI",
+        }
+
+
+def summarize(elapsed: list, calls: int) -> dict:
+    round_trips = sum(fake_postgrest.REQUESTS.values())
+    fake_postgrest.REQUESTS.clear()
+    elapsed.sort()
+    return {
+        "calls": calls,
+        "round_trips": round_trips,
+        "round_trips_per_call": round_trips / calls,
+        "p50_ms": elapsed[len(elapsed) // 2] * 1e3,
+        "mean_ms": sum(elapsed) / len(elapsed) * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--change-every", type=int, default=50)
+    parser.add_argument("--baseline", help="git revision whose select-then-update RDSClient to compare with")
+    args = parser.parse_args()
+
+    os.environ["SUPABASE_URL"] = fake_postgrest.start(args.latency)
+    os.environ["SUPABASE_SERVICE_KEY"] = "bench.service.key"
+
+    from benchmarks.legacy_client import load_rds_client
+    from db_utils.supabase_rds_async import AsyncRDSClient
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {}
+
+    if args.baseline:
+        legacy = load_rds_client(args.baseline)()
+        elapsed = []
+        for payload in payloads(args.calls, args.change_every):
+            start = time.perf_counter()
+            legacy.write_chatbot(payload)
+            elapsed.append(time.perf_counter() - start)
+        results["select_then_write"] = summarize(elapsed, args.calls)
+
+    async def upserts():
+        client = AsyncRDSClient()
+        elapsed = []
+        for payload in payloads(args.calls, args.change_every):
+            start = time.perf_counter()
+            await client.write_chatbot(payload)
+            elapsed.append(time.perf_counter() - start)
+        return elapsed
+
+    results["upsert_with_hash_cache"] = summarize(asyncio.run(upserts()), args.calls)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,95 @@
+"""
+Minimal stand-in for the Supabase PostgREST API, for load tests.
+
+Serves canned rows for every table with a configurable per-request latency, so
+benchmarks measure how the API behaves while waiting on the database rather
+than the database itself.
+"""
+import asyncio
+import itertools
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+ROWS = {
+    "users": [{"user_id": 1, "username": "bench-child", "role": "child"}],
+    "parent_child_relations": [{"parent_user_id": 1, "child_user_id": 1}],
+    "user_settings_with_email": [{"user_id": 1, "email": "parent@example.com", "is_newsletter_subscribed": True}],
+    "conversations": [{
+        "conversation_id": 1, "chatbot_id": 1, "child_user_id": 1,
+        "start_time": "2024-01-01T00:00:00", "end_time": "2024-01-01T00:10:00",
+        "conversationTopic": "games", "conversationSummary": "bench conversation",
+    }],
+    "risky_events_log": [{
+        "risky_event_id": 1, "timestamp": "2024-01-01T00:05:00", "riskType": "bullying",
+        "riskLevel": "high", "riskyReason": "bench", "conversation_id": 1, "child_user_id": 1,
+    }],
+    "chatbots": [{"chatbot_id": 1, "name": "bench-bot", "chatbotPlatform": "CharacterAI"}],
+    "risk_summary_daily": [{
+        "child_user_id": 1, "day": "2024-01-01", "riskType": "bullying", "riskLevel": "high",
+        "platform": "CharacterAI", "count": 3,
+    }],
+}
+
+
+# requests served, per (method, path); reset between benchmark phases
+REQUESTS = {}
+
+
+def with_embeds(row: dict, select: str) -> dict:
+    """Attach the many-to-one resources an embedded select asks for."""
+    row = dict(row)
+    select = select.replace("!inner", "")
+    if "conversations(" in select and "conversation_id" in row:
+        row["conversations"] = with_embeds(ROWS["conversations"][0], select.split("conversations(", 1)[1])
+    elif "chatbots(" in select and "chatbot_id" in row:
+        row["chatbots"] = dict(ROWS["chatbots"][0])
+    return row
+
+
+def build_app(latency: float) -> Starlette:
+    counter = itertools.count(1)
+
+    async def table(request: Request):
+        await asyncio.sleep(latency)
+        key = (request.method, request.url.path)
+        REQUESTS[key] = REQUESTS.get(key, 0) + 1
+        name = request.path_params["table"]
+        if request.method in ("POST", "PATCH"):
+            body = json.loads(await request.body() or b"[]")
+            return JSONResponse(body if isinstance(body, list) else [body], status_code=201)
+        select = request.query_params.get("select", "")
+        return JSONResponse([with_embeds(row, select) for row in ROWS.get(name, [])])
+
+    async def rpc(request: Request):
+        await asyncio.sleep(latency)
+        key = (request.method, request.url.path)
+        REQUESTS[key] = REQUESTS.get(key, 0) + 1
+        body = json.loads(await request.body() or b"{}")
+        block_size = body.get("block_size", 1)
+        return JSONResponse((next(counter) - 1) * block_size + 1)
+
+    return Starlette(routes=[
+        Route("/rest/v1/rpc/{name}", rpc, methods=["POST"]),
+        Route("/rest/v1/{table}", table, methods=["GET", "POST", "PATCH", "DELETE"]),
+    ])
+
+
+def start(latency: float = 0.02) -> str:
+    """Start the fake server in a daemon thread and return its base URL."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(build_app(latency), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
@@ -0,0 +1,107 @@
+"""
+Minimal stand-in SMTP server for tests and throughput measurement.
+
+Accepts EHLO/HELO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT, keeps
+delivered messages in memory and waits `latency` seconds before every reply
+to emulate the round-trip to a real mail server. No STARTTLS, so clients must
+connect with starttls disabled.
+
+Recipients containing "reject" get a permanent 550, recipients containing
+"tempfail" a temporary 451.
+"""
+import asyncio
+import threading
+import time
+
+# counters since start; reset between benchmark phases
+STATS = {"connections": 0, "logins": 0, "messages": 0}
+MESSAGES = []
+
+
+class SMTPSession:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, latency: float) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.latency = latency
+        self.recipients = []
+
+    async def reply(self, line: str) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.writer.write(line.encode() + b"\r\n")
+        await self.writer.drain()
+
+    async def run(self) -> None:
+        STATS["connections"] += 1
+        await self.reply("220 fake-smtp ready")
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                await self.reply("250-fake-smtp\r\n250-AUTH PLAIN\r\n250 8BITMIME")
+            elif verb == "HELO":
+                await self.reply("250 fake-smtp")
+            elif verb == "AUTH":
+                STATS["logins"] += 1
+                await self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                self.recipients = []
+                await self.reply("250 OK")
+            elif verb == "RCPT":
+                if "reject" in command:
+                    await self.reply("550 5.1.1 No such user")
+                elif "tempfail" in command:
+                    await self.reply("451 4.3.0 Try again later")
+                else:
+                    self.recipients.append(command)
+                    await self.reply("250 OK")
+            elif verb == "DATA":
+                await self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = await self.reader.readuntil(b"\r\n.\r\n")
+                MESSAGES.append(data)
+                STATS["messages"] += 1
+                await self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.recipients = []
+                await self.reply("250 OK")
+            elif verb == "QUIT":
+                await self.reply("221 Bye")
+                break
+            else:
+                await self.reply("502 Command not implemented")
+        self.writer.close()
+
+
+def start(latency: float = 0.005) -> tuple:
+    """Start the fake server in a daemon thread and return its (host, port)."""
+    address = {}
+    started = threading.Event()
+
+    async def serve():
+        server = await asyncio.start_server(
+            lambda reader, writer: SMTPSession(reader, writer, latency).run(), "127.0.0.1", 0
+        )
+        address["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+    return "127.0.0.1", address["port"]
+
+
+def reset() -> None:
+    for key in STATS:
+        STATS[key] = 0
+    MESSAGES.clear()
+
+
+def wait_for_messages(count: int, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while STATS["messages"] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return STATS["messages"] >= count
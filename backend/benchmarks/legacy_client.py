@@ -0,0 +1,22 @@
+"""
+The blocking Supabase RDSClient, loaded from git for benchmarks that compare
+against it. AsyncRDSClient replaced it and it is no longer in the tree; the
+last revision that still has it is
+
+    $(git rev-list -1 HEAD -- db_utils/supabase_rds.py)~1
+"""
+import os
+import subprocess
+import types
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_rds_client(revision: str) -> type:
+    """The RDSClient class of db_utils/supabase_rds.py at `revision`."""
+    source = subprocess.run(
+        ["git", "show", f"{revision}:./db_utils/supabase_rds.py"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    module = types.ModuleType("legacy_supabase_rds")
+    exec(compile(source, f"{revision}:db_utils/supabase_rds.py", "exec"), module.__dict__)
+    return module.RDSClient
@@ -0,0 +1,206 @@
+import abc
+import asyncio
+import inspect
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from supabase import AsyncClient
+
+from settings import app_settings
+
+# counter name (table) -> id column handed out by that counter
+ID_COLUMNS: Dict[str, str] = {
+    "chatbots": "chatbot_id",
+    "conversations": "conversation_id",
+    "risky_events_log": "risky_event_id",
+    "messages": "message_id",
+}
+
+
+class CounterSource(abc.ABC):
+    """
+    A single shared counter that hands out contiguous blocks of IDs.
+    Implementations must be atomic across processes.
+    """
+
+    @abc.abstractmethod
+    def reserve(self, counter: str, block_size: int) -> int:
+        """Advance `counter` by `block_size` and return the first ID of the reserved block."""
+
+    async def areserve(self, counter: str, block_size: int) -> int:
+        """Async variant of `reserve`; runs it in a thread unless overridden."""
+        return await asyncio.to_thread(self.reserve, counter, block_size)
+
+
+class SupabaseSequenceSource(CounterSource):
+    """
+    Counter source backed by the `reserve_id_block` Postgres function
+    (see db_utils/sql/reserve_id_block.sql). One RPC round-trip per block.
+    Use `reserve` with a sync Supabase client and `areserve` with an AsyncClient.
+    """
+
+    def __init__(self, client) -> None:
+        self.client = client
+
+    def _rpc(self, counter: str, block_size: int):
+        return self.client.rpc("reserve_id_block", {
+            "table_name": counter,
+            "id_column": ID_COLUMNS[counter],
+            "block_size": block_size,
+        })
+
+    def reserve(self, counter: str, block_size: int) -> int:
+        return int(self._rpc(counter, block_size).execute().data)
+
+    async def areserve(self, counter: str, block_size: int) -> int:
+        return int((await self._rpc(counter, block_size).execute()).data)
+
+
+class SQLiteCounterSource(CounterSource):
+    """
+    Local file-backed stand-in for the Postgres sequence, used for tests and
+    benchmarks. `BEGIN IMMEDIATE` takes the database write lock, so concurrent
+    processes sharing the same file never receive overlapping blocks.
+
+    `seed` is called once per counter, the first time it is used, and should
+    return the highest ID already present in the table. It may be a coroutine
+    function when the allocator is driven through `areserve`.
+    """
+
+    def __init__(self, path: str, seed: Optional[Callable[[str], int]] = None) -> None:
+        self.path = path
+        self.seed = seed
+        self._seeded = set()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS id_counters (counter_name TEXT PRIMARY KEY, last_value INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _ensure_counter(self, counter: str, seed_value: int) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR IGNORE INTO id_counters (counter_name, last_value) VALUES (?, ?)", (counter, seed_value))
+        finally:
+            conn.close()
+        self._seeded.add(counter)
+
+    def _reserve(self, counter: str, block_size: int) -> int:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT last_value FROM id_counters WHERE counter_name = ?", (counter,)).fetchone()
+            last_value = row[0] if row else 0
+            conn.execute(
+                "INSERT OR REPLACE INTO id_counters (counter_name, last_value) VALUES (?, ?)", (counter, last_value + block_size)
+            )
+            conn.execute("COMMIT")
+            return last_value + 1
+        except Exception:
+            # BEGIN IMMEDIATE itself fails when the database stays locked; there is nothing to roll back then
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def reserve(self, counter: str, block_size: int) -> int:
+        if self.seed and counter not in self._seeded:
+            self._ensure_counter(counter, self.seed(counter))
+        return self._reserve(counter, block_size)
+
+    async def areserve(self, counter: str, block_size: int) -> int:
+        if self.seed and counter not in self._seeded:
+            seed_value = self.seed(counter)
+            if inspect.isawaitable(seed_value):
+                seed_value = await seed_value
+            await asyncio.to_thread(self._ensure_counter, counter, seed_value)
+        return await asyncio.to_thread(self._reserve, counter, block_size)
+
+
+class BlockIdAllocator:
+    """
+    Hands out IDs from blocks reserved on a CounterSource.
+
+    Each process reserves `block_size` IDs at a time and serves them from memory,
+    so only one call in `block_size` touches the counter source. IDs are unique
+    across workers but not contiguous; unused IDs of a block are lost on restart.
+    """
+
+    def __init__(self, source: CounterSource, block_size: int = 50) -> None:
+        self.source = source
+        self.block_size = block_size
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._async_lock = asyncio.Lock()
+        self._pid = os.getpid()
+
+    def _take(self, counter: str) -> Optional[int]:
+        """Pop the next ID of the current block, or None if it is exhausted. Caller holds the lock."""
+        if self._pid != os.getpid():
+            # forked after reserving: the parent still owns those blocks
+            self._blocks.clear()
+            self._pid = os.getpid()
+        next_value, block_end = self._blocks.get(counter, (0, 0))
+        if next_value >= block_end:
+            return None
+        self._blocks[counter] = (next_value + 1, block_end)
+        return next_value
+
+    def _store_block(self, counter: str, start: int) -> None:
+        self._blocks[counter] = (start, start + self.block_size)
+
+    def next_id(self, counter: str) -> int:
+        with self._lock:
+            value = self._take(counter)
+            if value is None:
+                self._store_block(counter, self.source.reserve(counter, self.block_size))
+                value = self._take(counter)
+            return value
+
+    async def anext_id(self, counter: str) -> int:
+        """Like `next_id`, but awaits the counter source instead of blocking the event loop."""
+        with self._lock:
+            value = self._take(counter)
+        if value is not None:
+            return value
+        async with self._async_lock:
+            with self._lock:
+                value = self._take(counter)
+            if value is None:
+                start = await self.source.areserve(counter, self.block_size)
+                with self._lock:
+                    self._store_block(counter, start)
+                    value = self._take(counter)
+            return value
+
+
+def max_id_seed(client) -> Callable[[str], int]:
+    """Seed callback reading the current maximum ID with a single indexed lookup."""
+
+    def query(counter: str):
+        column = ID_COLUMNS[counter]
+        return client.from_(counter).select(column).order(column, desc=True).limit(1)
+
+    def seed(counter: str) -> int:
+        response = query(counter).execute()
+        return response.data[0][ID_COLUMNS[counter]] if response.data else 0
+
+    async def aseed(counter: str) -> int:
+        response = await query(counter).execute()
+        return response.data[0][ID_COLUMNS[counter]] if response.data else 0
+
+    return aseed if isinstance(client, AsyncClient) else seed
+
+
+def build_id_allocator(client) -> BlockIdAllocator:
+    """Create the allocator configured in settings for the given (sync or async) Supabase client."""
+    if app_settings.id_allocator_backend == "sqlite":
+        source = SQLiteCounterSource(app_settings.id_allocator_sqlite_path, seed=max_id_seed(client))
+    else:
+        source = SupabaseSequenceSource(client)
+    return BlockIdAllocator(source, block_size=app_settings.id_allocator_block_size)
@@ -0,0 +1,65 @@
+import hashlib
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+def content_hash(message_text: str) -> str:
+    """Digest of a message's text, ignoring surrounding whitespace."""
+    return hashlib.blake2b(message_text.strip().encode("utf-8"), digest_size=16).hexdigest()
+
+
+class MessageDedupIndex:
+    """
+    Bounded index of conversation -> content hash -> message_id of the
+    messages this worker has written.
+
+    The extension re-sends overlapping chat windows and retries, so the same
+    text arrives for a conversation many times; write paths look it up and
+    map a repeat onto the message already stored instead of inserting it
+    again. Keeps the last `per_conversation` hashes of the
+    `max_conversations` most recently active conversations.
+    """
+
+    def __init__(self, per_conversation: int = 256, max_conversations: int = 10000) -> None:
+        self.per_conversation = per_conversation
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[Hashable, OrderedDict[str, int]]" = OrderedDict()
+        self.checked = 0
+        self.duplicates = 0
+
+    def lookup(self, conversation_id: Hashable, digest: str) -> Optional[int]:
+        """message_id already stored with this content, or None."""
+        self.checked += 1
+        hashes = self._conversations.get(conversation_id)
+        if hashes is None or digest not in hashes:
+            return None
+        self._conversations.move_to_end(conversation_id)
+        hashes.move_to_end(digest)
+        self.duplicates += 1
+        return hashes[digest]
+
+    def add(self, conversation_id: Hashable, digest: str, message_id: int) -> None:
+        hashes = self._conversations.get(conversation_id)
+        if hashes is None:
+            hashes = self._conversations[conversation_id] = OrderedDict()
+            if len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        self._conversations.move_to_end(conversation_id)
+        hashes[digest] = message_id
+        hashes.move_to_end(digest)
+        if len(hashes) > self.per_conversation:
+            hashes.popitem(last=False)
+
+    def discard(self, conversation_id: Hashable, digest: str) -> None:
+        """Forget a hash whose write failed, so the message is not dropped as a repeat."""
+        hashes = self._conversations.get(conversation_id)
+        if hashes is not None:
+            hashes.pop(digest, None)
+
+    def stats(self) -> dict:
+        return {
+            "conversations": len(self._conversations),
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "dedup_ratio": self.duplicates / self.checked if self.checked else 0.0,
+        }
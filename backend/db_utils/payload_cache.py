@@ -0,0 +1,41 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Hashable
+
+
+class PayloadHashCache:
+    """
+    Bounded LRU of row key -> digest of the payload last written for it.
+
+    Lets write paths skip the database when a client re-sends a row that is
+    identical to the one this worker already stored.
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        self._digests: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(payload: dict) -> str:
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+    def seen(self, key: Hashable, digest: str) -> bool:
+        if self._digests.get(key) == digest:
+            self._digests.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, key: Hashable, digest: str) -> None:
+        self._digests[key] = digest
+        self._digests.move_to_end(key)
+        if len(self._digests) > self.max_entries:
+            self._digests.popitem(last=False)
+
+    def forget(self, key: Hashable) -> None:
+        self._digests.pop(key, None)
@@ -0,0 +1,44 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+# (step name, seconds) for every plan step run during the current request.
+# The timing middleware in main.py sets a fresh list per request and reports it
+# in the Server-Timing response header.
+query_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "query_timings", default=None
+)
+
+
+class QueryPlan:
+    """
+    Runs the round-trips of a multi-query read and times each step.
+
+    Dependent lookups are awaited one after another with `step`; lookups that
+    only depend on earlier results are issued together with `gather`.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.timings: Dict[str, float] = {}
+
+    async def step(self, label: str, query: Awaitable) -> Any:
+        start = time.perf_counter()
+        try:
+            return await query
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[label] = elapsed
+            timings = query_timings.get()
+            if timings is not None:
+                timings.append((f"{self.name}.{label}", elapsed))
+
+    async def gather(self, **queries: Awaitable) -> Dict[str, Any]:
+        results = await asyncio.gather(*(self.step(label, query) for label, query in queries.items()))
+        return dict(zip(queries, results))
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format recorded timings as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings)
@@ -0,0 +1,38 @@
+-- Links app users to Supabase auth users (the `sub` of a dashboard token).
+--
+-- parent_child_relations and the other tables key users by the integer
+-- users.user_id, while an access token names the auth user by UUID. The API
+-- resolves one to the other through users.auth_user_id
+-- (AsyncRDSClient.get_user_by_auth_id). Existing parents are linked by the
+-- email in user_settings_with_email; a new sign-up gets a parent user of its
+-- own from the trigger on auth.users.
+
+alter table users add column if not exists auth_user_id uuid;
+create unique index if not exists users_auth_user_id_idx on users (auth_user_id);
+
+update users u
+   set auth_user_id = a.id
+  from user_settings_with_email s
+  join auth.users a on lower(a.email) = lower(s.email)
+ where s.user_id = u.user_id
+   and u.auth_user_id is null
+   and not exists (select 1 from users linked where linked.auth_user_id = a.id);
+
+create or replace function link_app_user()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    insert into users (username, role, auth_user_id)
+    select new.email, 'parent', new.id
+     where not exists (select 1 from users where auth_user_id = new.id);
+    return new;
+end;
+$$;
+
+drop trigger if exists link_app_user on auth.users;
+create trigger link_app_user
+    after insert on auth.users
+    for each row execute function link_app_user();
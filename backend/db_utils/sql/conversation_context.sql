@@ -0,0 +1,15 @@
+-- Rolling transcript per conversation behind POST /conversations/{id}/turns
+-- (app/services/context_store.py). Each worker keeps recent conversations in
+-- memory; this table holds the last CONTEXT_STORE_MAX_TURNS turns so another
+-- worker, or the same one after a restart, can continue a conversation.
+--
+-- next_seq is the sequence number the next turn will get. Writes are a
+-- compare-and-set on it (update ... where next_seq = <value read>), so two
+-- workers appending to the same conversation cannot overwrite each other.
+
+create table if not exists conversation_context (
+    conversation_id bigint primary key,
+    next_seq integer not null,
+    turns jsonb not null default '[]'::jsonb,
+    updated_at timestamptz
+);
@@ -0,0 +1,16 @@
+-- Indexes backing the keyset-paginated dashboard reads
+-- (AsyncRDSClient.read_risky_events_page / get_conversations_page).
+-- Each page is one index range scan, whatever page of the history is requested.
+-- Pages put rows without a timestamp last, so the indexes do too (an index
+-- created by an earlier version of this file, nulls first, is replaced).
+
+drop index if exists risky_events_log_child_timestamp_idx;
+create index risky_events_log_child_timestamp_idx
+    on risky_events_log (child_user_id, "timestamp" desc nulls last, risky_event_id desc);
+
+drop index if exists conversations_child_start_time_idx;
+create index conversations_child_start_time_idx
+    on conversations (child_user_id, start_time desc nulls last, conversation_id desc);
+
+create index if not exists chatbots_platform_idx
+    on chatbots ("chatbotPlatform");
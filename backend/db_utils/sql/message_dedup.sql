@@ -0,0 +1,11 @@
+-- Optional database-side deduplication of re-sent messages (MESSAGE_DEDUP_PERSISTENT=true).
+-- Each worker already drops repeats it has seen; this unique index also catches
+-- repeats written by other workers or before a restart. Message writes then
+-- upsert on (conversation_id, content_hash) and skip conflicting rows.
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_hash text;
+
+-- blake2b-128 of the trimmed message_text, as computed by db_utils/message_dedup.py.
+-- Existing rows keep NULL, which the unique index does not compare.
+CREATE UNIQUE INDEX IF NOT EXISTS messages_conversation_content_hash_key
+    ON messages (conversation_id, content_hash);
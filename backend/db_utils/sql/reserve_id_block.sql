@@ -0,0 +1,37 @@
+-- Block ID allocation for RDSClient.generate_*_id (db_utils/id_allocator.py).
+-- Each call atomically advances the counter for `table_name` by `block_size`
+-- and returns the first ID of the reserved block. The counter is seeded from
+-- the table's current max(id) the first time it is used.
+
+create table if not exists id_counters (
+    counter_name text primary key,
+    last_value bigint not null
+);
+
+create or replace function reserve_id_block(table_name text, id_column text, block_size integer)
+returns bigint
+language plpgsql
+as $$
+declare
+    block_end bigint;
+    seed bigint;
+begin
+    update id_counters
+       set last_value = last_value + block_size
+     where counter_name = table_name
+    returning last_value into block_end;
+
+    if not found then
+        execute format('select coalesce(max(%I), 0) from %I', id_column, table_name) into seed;
+        insert into id_counters (counter_name, last_value)
+        values (table_name, seed + block_size)
+        on conflict (counter_name) do update
+            set last_value = id_counters.last_value + block_size
+        returning last_value into block_end;
+    end if;
+
+    return block_end - block_size + 1;
+end;
+$$;
+
+revoke execute on function reserve_id_block(text, text, integer) from public, anon, authenticated;
@@ -0,0 +1,100 @@
+-- Per-child, per-day risk counts for the dashboard charts
+-- (AsyncRDSClient.get_risk_summary, /parental_control/risk_summary).
+--
+-- increment_risk_summary is called after every alert write with the IDs just
+-- written. risk_summary_counted records which events are already counted, so
+-- retried or replayed alert batches are not counted twice. An event is
+-- bucketed by its riskType/riskLevel/timestamp at the time of its first write;
+-- rebuild_risk_summary recomputes everything from risky_events_log
+-- (`python -m app.services.risk_summary rebuild`). Alerts may arrive without a
+-- child or timestamp: both then come from the event's conversation, and an
+-- event still missing either is left out of the counts.
+
+create table if not exists risk_summary_daily (
+    child_user_id bigint not null,
+    day date not null,
+    "riskType" text not null,
+    "riskLevel" text not null,
+    platform text not null,
+    count bigint not null default 0,
+    primary key (child_user_id, day, "riskType", "riskLevel", platform)
+);
+
+create table if not exists risk_summary_counted (
+    risky_event_id bigint primary key
+);
+
+create or replace function increment_risk_summary(event_ids bigint[])
+returns integer
+language plpgsql
+as $$
+declare
+    counted integer;
+begin
+    with new_events as (
+        insert into risk_summary_counted (risky_event_id)
+        select e.risky_event_id
+          from risky_events_log e
+         where e.risky_event_id = any(event_ids)
+        on conflict do nothing
+        returning risky_event_id
+    )
+    insert into risk_summary_daily (child_user_id, day, "riskType", "riskLevel", platform, count)
+    select coalesce(e.child_user_id, c.child_user_id),
+           coalesce(e."timestamp"::date, c.start_time::date),
+           coalesce(e."riskType", 'Unknown Risk'),
+           lower(coalesce(e."riskLevel", 'unknown')),
+           coalesce(b."chatbotPlatform", 'Unknown Platform'),
+           count(*)
+      from new_events n
+      join risky_events_log e on e.risky_event_id = n.risky_event_id
+      left join conversations c on c.conversation_id = e.conversation_id
+      left join chatbots b on b.chatbot_id = c.chatbot_id
+     where lower(coalesce(e."riskType", '')) <> 'no risk'
+       and coalesce(e.child_user_id, c.child_user_id) is not null
+       and coalesce(e."timestamp"::date, c.start_time::date) is not null
+     group by 1, 2, 3, 4, 5
+    on conflict (child_user_id, day, "riskType", "riskLevel", platform) do update
+        set count = risk_summary_daily.count + excluded.count;
+
+    get diagnostics counted = row_count;
+    return counted;
+end;
+$$;
+
+create or replace function rebuild_risk_summary()
+returns integer
+language plpgsql
+as $$
+declare
+    buckets integer;
+begin
+    -- increments wait for the rebuild instead of being lost by the truncate
+    lock table risk_summary_counted, risk_summary_daily in exclusive mode;
+    truncate risk_summary_counted, risk_summary_daily;
+
+    insert into risk_summary_counted (risky_event_id)
+    select risky_event_id from risky_events_log;
+
+    insert into risk_summary_daily (child_user_id, day, "riskType", "riskLevel", platform, count)
+    select coalesce(e.child_user_id, c.child_user_id),
+           coalesce(e."timestamp"::date, c.start_time::date),
+           coalesce(e."riskType", 'Unknown Risk'),
+           lower(coalesce(e."riskLevel", 'unknown')),
+           coalesce(b."chatbotPlatform", 'Unknown Platform'),
+           count(*)
+      from risky_events_log e
+      left join conversations c on c.conversation_id = e.conversation_id
+      left join chatbots b on b.chatbot_id = c.chatbot_id
+     where lower(coalesce(e."riskType", '')) <> 'no risk'
+       and coalesce(e.child_user_id, c.child_user_id) is not null
+       and coalesce(e."timestamp"::date, c.start_time::date) is not null
+     group by 1, 2, 3, 4, 5;
+
+    get diagnostics buckets = row_count;
+    return buckets;
+end;
+$$;
+
+revoke execute on function increment_risk_summary(bigint[]) from public, anon, authenticated;
+revoke execute on function rebuild_risk_summary() from public, anon, authenticated;
@@ -0,0 +1,109 @@
+-- Full-text search over a parent's history (GET /parental_control/search).
+--
+-- search_documents holds one row per message text, conversation (topic and
+-- summary) and risky event (type and reason). The storage backend upserts the
+-- documents of every write (AsyncRDSClient.index_search_documents): message
+-- texts may be stored compressed, so the index is fed the plain text by the
+-- application rather than by triggers on the source tables. Rebuild it from
+-- the source tables with `python -m app.services.search rebuild`: documents are
+-- upserted in place, so search keeps answering meanwhile, and the rows not
+-- rewritten since the rebuild started (indexed_at) are deleted at the end.
+--
+-- The before-write trigger computes tsv from the full text, keeps only an
+-- excerpt of it for snippets, and fills in the child of message documents from
+-- their conversation. search_parent_history ranks matches among the documents
+-- of one parent's children with the GIN index on tsv, and highlights only the
+-- page it returns.
+
+create table if not exists search_documents (
+    kind text not null,
+    doc_id bigint not null,
+    conversation_id bigint,
+    child_user_id bigint,
+    "timestamp" timestamptz,
+    content text,
+    tsv tsvector not null,
+    indexed_at timestamptz not null default now(),
+    primary key (kind, doc_id)
+);
+
+alter table search_documents add column if not exists indexed_at timestamptz not null default now();
+
+create index if not exists search_documents_tsv_idx on search_documents using gin (tsv);
+create index if not exists search_documents_child_user_id_idx on search_documents (child_user_id);
+create index if not exists search_documents_conversation_id_idx on search_documents (conversation_id);
+
+create or replace function search_documents_prepare()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.tsv := to_tsvector('english', coalesce(new.content, ''));
+    new.indexed_at := now();
+    new.content := left(new.content, 1000);
+    if new.child_user_id is null and new.conversation_id is not null then
+        select c.child_user_id into new.child_user_id
+          from conversations c
+         where c.conversation_id = new.conversation_id;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists search_documents_prepare on search_documents;
+create trigger search_documents_prepare
+    before insert or update on search_documents
+    for each row execute function search_documents_prepare();
+
+create or replace function search_parent_history(
+    p_parent_user_id text,
+    p_query text,
+    p_kinds text[],
+    p_child_user_id bigint default null,
+    p_limit integer default 20,
+    p_offset integer default 0
+)
+returns table (
+    kind text,
+    doc_id bigint,
+    conversation_id bigint,
+    child_user_id bigint,
+    "timestamp" timestamptz,
+    snippet text,
+    score real
+)
+language sql
+stable
+as $$
+    with children as (
+        select r.child_user_id
+          from parent_child_relations r
+         where r.parent_user_id::text = p_parent_user_id
+           and (p_child_user_id is null or r.child_user_id = p_child_user_id)
+    ),
+    query as (
+        select websearch_to_tsquery('english', p_query) as q
+    ),
+    ranked as (
+        select d.kind, d.doc_id, d.conversation_id, d.child_user_id, d."timestamp", d.content,
+               ts_rank(d.tsv, query.q) as score
+          from search_documents d, query
+         where d.tsv @@ query.q
+           and d.kind = any(p_kinds)
+           and (d.child_user_id in (select child_user_id from children)
+                or (d.child_user_id is null
+                    and d.conversation_id in (
+                        select c.conversation_id from conversations c
+                         where c.child_user_id in (select child_user_id from children))))
+         order by score desc, d.doc_id desc
+         limit p_limit offset p_offset
+    )
+    select ranked.kind, ranked.doc_id, ranked.conversation_id, ranked.child_user_id, ranked."timestamp",
+           ts_headline('english', coalesce(ranked.content, ''), query.q,
+                       'StartSel=[, StopSel=], MaxFragments=1, MaxWords=24, MinWords=8') as snippet,
+           ranked.score
+      from ranked, query
+     order by ranked.score desc, ranked.doc_id desc
+$$;
+
+revoke execute on function search_parent_history(text, text, text[], bigint, integer, integer) from public, anon, authenticated;
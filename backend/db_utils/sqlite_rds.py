@@ -0,0 +1,951 @@
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Optional, Sequence
+
+from settings import app_settings
+from db_utils.id_allocator import ID_COLUMNS, BlockIdAllocator, SQLiteCounterSource
+from db_utils.storage_backend import (
+    CONVERSATION_FIELDS, CONVERSATION_PATCH_COLUMNS, RISKY_EVENT_FIELDS, SEARCH_KINDS, StorageBackend, decode_cursor,
+    encode_cursor,
+)
+
+# Same tables and column names as the Supabase schema. User IDs use INT
+# affinity (not INTEGER PRIMARY KEY) where the API may also pass string IDs.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    role TEXT,
+    user_age INTEGER,
+    auth_user_id TEXT
+);
+CREATE TABLE IF NOT EXISTS parent_child_relations (
+    parent_user_id INT NOT NULL,
+    child_user_id INT NOT NULL,
+    PRIMARY KEY (parent_user_id, child_user_id)
+);
+CREATE INDEX IF NOT EXISTS parent_child_relations_child_user_id_idx ON parent_child_relations (child_user_id);
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INT PRIMARY KEY,
+    quota_limit INTEGER,
+    last_updated TEXT,
+    email TEXT,
+    is_newsletter_subscribed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS chatbots (
+    chatbot_id INTEGER PRIMARY KEY,
+    name TEXT,
+    metadata TEXT,
+    "chatbotPlatform" TEXT
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id INTEGER PRIMARY KEY,
+    child_user_id INT,
+    chatbot_id INTEGER,
+    start_time TEXT,
+    end_time TEXT,
+    "conversationTopic" TEXT,
+    "conversationSummary" TEXT,
+    platform TEXT
+);
+CREATE INDEX IF NOT EXISTS conversations_child_user_id_idx ON conversations (child_user_id, start_time, conversation_id);
+CREATE TABLE IF NOT EXISTS risky_events_log (
+    risky_event_id INTEGER PRIMARY KEY,
+    conversation_id INTEGER,
+    child_user_id INT,
+    "riskLevel" TEXT,
+    "riskType" TEXT,
+    "riskyReason" TEXT,
+    timestamp TEXT,
+    messages TEXT
+);
+CREATE INDEX IF NOT EXISTS risky_events_log_child_user_id_idx ON risky_events_log (child_user_id, timestamp, risky_event_id);
+CREATE INDEX IF NOT EXISTS risky_events_log_conversation_id_idx ON risky_events_log (conversation_id);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    conversation_id INTEGER,
+    sender TEXT,
+    message_text TEXT,
+    timestamp TEXT,
+    sender_type TEXT,
+    content_hash TEXT
+);
+-- also the conversation_id index; rows without content_hash are never equal
+CREATE UNIQUE INDEX IF NOT EXISTS messages_conversation_content_hash_key ON messages (conversation_id, content_hash);
+CREATE TABLE IF NOT EXISTS risk_summary_daily (
+    child_user_id INT NOT NULL,
+    day TEXT NOT NULL,
+    "riskType" TEXT NOT NULL,
+    "riskLevel" TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (child_user_id, day, "riskType", "riskLevel", platform)
+);
+CREATE TABLE IF NOT EXISTS risk_summary_counted (
+    risky_event_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS conversation_context (
+    conversation_id INTEGER PRIMARY KEY,
+    next_seq INTEGER NOT NULL,
+    turns TEXT NOT NULL,
+    updated_at TEXT
+);
+-- full-text index of message texts, conversation topics and summaries and risk reasons;
+-- rowid = doc_id * 4 + position of kind in SEARCH_KINDS, so a rewritten document replaces its row.
+-- owner is the token "c<child_user_id>" ("unowned" until the child is known), so a search
+-- only walks the posting lists of the parent's children
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    content,
+    owner,
+    kind UNINDEXED,
+    doc_id UNINDEXED,
+    conversation_id UNINDEXED,
+    child_user_id UNINDEXED,
+    timestamp UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+
+# one risky event with its conversation (c_), chatbot (b_) and child (u_) joined
+RISKY_EVENT_SELECT = """
+SELECT e.risky_event_id, e.timestamp, e."riskType", e."riskLevel", e."riskyReason", e.conversation_id, e.child_user_id,
+       c.conversation_id AS c_conversation_id, c.chatbot_id AS c_chatbot_id, c.child_user_id AS c_child_user_id,
+       c.start_time AS c_start_time, c.end_time AS c_end_time,
+       c."conversationTopic" AS "c_conversationTopic", c."conversationSummary" AS "c_conversationSummary",
+       b.chatbot_id AS b_chatbot_id, b.name AS b_name, b."chatbotPlatform" AS "b_chatbotPlatform",
+       u.user_id AS u_user_id, u.username AS u_username
+  FROM risky_events_log e
+  LEFT JOIN conversations c ON c.conversation_id = e.conversation_id
+  LEFT JOIN chatbots b ON b.chatbot_id = c.chatbot_id
+  LEFT JOIN users u ON u.user_id = e.child_user_id
+"""
+
+CONVERSATION_SELECT = """
+SELECT c.conversation_id, c.chatbot_id, c.child_user_id, c.start_time, c.end_time, c."conversationTopic", c."conversationSummary",
+       b.chatbot_id AS b_chatbot_id, b.name AS b_name, b."chatbotPlatform" AS "b_chatbotPlatform"
+  FROM conversations c
+  LEFT JOIN chatbots b ON b.chatbot_id = c.chatbot_id
+"""
+
+# counts the events of `event_ids` (a JSON array) not counted yet; see db_utils/sql/risk_summary.sql
+INCREMENT_RISK_SUMMARY = """
+INSERT INTO risk_summary_daily (child_user_id, day, "riskType", "riskLevel", platform, count)
+SELECT coalesce(e.child_user_id, c.child_user_id),
+       substr(coalesce(e.timestamp, c.start_time), 1, 10),
+       coalesce(e."riskType", 'Unknown Risk'),
+       lower(coalesce(e."riskLevel", 'unknown')),
+       coalesce(b."chatbotPlatform", 'Unknown Platform'),
+       count(*)
+  FROM risky_events_log e
+  LEFT JOIN conversations c ON c.conversation_id = e.conversation_id
+  LEFT JOIN chatbots b ON b.chatbot_id = c.chatbot_id
+ WHERE e.risky_event_id IN (SELECT value FROM json_each(?))
+   AND e.risky_event_id NOT IN (SELECT risky_event_id FROM risk_summary_counted)
+   AND lower(coalesce(e."riskType", '')) <> 'no risk'
+   AND coalesce(e.child_user_id, c.child_user_id) IS NOT NULL
+   AND coalesce(e.timestamp, c.start_time) IS NOT NULL
+ GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT (child_user_id, day, "riskType", "riskLevel", platform) DO UPDATE
+    SET count = risk_summary_daily.count + excluded.count
+"""
+
+# children of the parent bound to the first placeholder
+CHILDREN_OF = "SELECT child_user_id FROM parent_child_relations WHERE parent_user_id = ?"
+
+# message documents are indexed before their conversation may be, so their child comes from it when missing
+INDEX_SEARCH_DOCUMENT = """
+INSERT INTO search_index (rowid, content, kind, doc_id, conversation_id, timestamp, owner, child_user_id)
+SELECT ?, ?, ?, ?, ?, ?, coalesce('c' || child, 'unowned'), child
+  FROM (SELECT coalesce(?, (SELECT child_user_id FROM conversations WHERE conversation_id = ?)) AS child)
+"""
+
+# ranked matches among the owner tokens of the children; documents still unowned are checked against
+# the children's conversations. bm25 weighs only the content column, and is lower for better matches
+SEARCH_SQL = """
+SELECT kind, doc_id, conversation_id, child_user_id, timestamp,
+       snippet(search_index, 0, '[', ']', '…', 16) AS snippet, -bm25(search_index, 1.0, 0.0) AS score
+  FROM search_index
+ WHERE search_index MATCH ?
+   AND kind IN ({kinds})
+   AND (child_user_id IN ({children})
+        OR (child_user_id IS NULL
+            AND conversation_id IN (SELECT conversation_id FROM conversations WHERE child_user_id IN ({children}))))
+ ORDER BY bm25(search_index, 1.0, 0.0)
+ LIMIT ? OFFSET ?
+"""
+
+_SEARCH_WORD = re.compile(r"[\w']+\*?")
+
+
+def _split(row: dict, prefix: str, key: str) -> dict:
+    """The columns of a joined table (aliased `prefix` + column), or {} if the join found no row."""
+    if row.get(prefix + key) is None:
+        return {}
+    return {column[len(prefix):]: value for column, value in row.items() if column.startswith(prefix)}
+
+
+def _fts_query(query: str) -> str:
+    """User text as an FTS5 query on content: every word must match, a trailing * matches any word it starts."""
+    terms = []
+    for word in _SEARCH_WORD.findall(query):
+        term = word.rstrip("*").strip("'")
+        if term:
+            terms.append('"' + term + '"' + ("*" if word.endswith("*") else ""))
+    return "content : (" + " ".join(terms) + ")" if terms else ""
+
+
+def _encode(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+@lru_cache(maxsize=64)
+def _upsert_sql(table: str, columns: tuple, on_conflict: str) -> str:
+    names = ", ".join(f'"{column}"' for column in columns)
+    updates = ", ".join(f'"{column}" = excluded."{column}"' for column in columns if column != on_conflict)
+    return (
+        f'INSERT INTO {table} ({names}) VALUES ({", ".join("?" * len(columns))}) '
+        f'ON CONFLICT ({on_conflict}) DO ' + (f"UPDATE SET {updates}" if updates else "NOTHING")
+    )
+
+
+@lru_cache(maxsize=64)
+def _insert_sql(table: str, columns: tuple, or_ignore: bool = False) -> str:
+    names = ", ".join(f'"{column}"' for column in columns)
+    return f'INSERT {"OR IGNORE " if or_ignore else ""}INTO {table} ({names}) VALUES ({", ".join("?" * len(columns))})'
+
+
+class SQLiteRDSClient(StorageBackend):
+    """
+    StorageBackend on a local SQLite file, for development, small
+    deployments and load tests that should not depend on a Supabase project.
+
+    The database runs in WAL mode, so readers in other processes (or a second
+    worker) do not block the writer. All statements of this client run on one
+    dedicated thread over one connection: the event loop never blocks on a
+    query, and each method is a single local transaction. Dashboard reads are
+    answered with one joined query instead of PostgREST's chain of lookups.
+    IDs come from the same BlockIdAllocator as the Supabase client, with its
+    counters kept in the same file.
+    """
+
+    def __init__(self, path: str) -> None:
+        print(f"Initializing SQLite storage at {path}...")
+        start = time.time()
+
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-rds")
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # files created before users were linked to Supabase auth users
+        if "auth_user_id" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(users)")}:
+            self._conn.execute("ALTER TABLE users ADD COLUMN auth_user_id TEXT")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS users_auth_user_id_idx ON users (auth_user_id)")
+        super().__init__(BlockIdAllocator(
+            SQLiteCounterSource(path, seed=self._max_id), block_size=app_settings.id_allocator_block_size,
+        ))
+
+        end = time.time()
+        print(f"SQLite storage initialized in {end - start} seconds.")
+
+    def _max_id(self, counter: str) -> int:
+        column = ID_COLUMNS[counter]
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            return conn.execute(f"SELECT coalesce(max({column}), 0) FROM {counter}").fetchone()[0]
+        finally:
+            conn.close()
+
+    async def _run(self, work: Callable, *args):
+        """Run `work(conn, *args)` on the database thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, work, self._conn, *args)
+
+    async def _transaction(self, work: Callable, *args):
+        """Like _run, inside BEGIN IMMEDIATE ... COMMIT."""
+        def run(conn: sqlite3.Connection, *args):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn, *args)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        return await self._run(run, *args)
+
+    @staticmethod
+    def _all(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> list[dict]:
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    async def _query(self, sql: str, params: Sequence = ()) -> list[dict]:
+        return await self._run(self._all, sql, params)
+
+    async def aclose(self):
+        """Close the connection and its thread."""
+        await self._run(lambda conn: conn.close())
+        self._executor.shutdown(wait=True)
+
+    async def verify_child_user(self, child_user_id: int) -> bool:
+        """Verify that a child user exists"""
+        try:
+            rows = await self._query("SELECT user_id FROM users WHERE user_id = ? AND role = 'child'", (child_user_id,))
+            return len(rows) > 0
+        except Exception as e:
+            print(f"Error verifying child user: {str(e)}")
+            raise Exception(f"Error verifying child user: {str(e)}")
+
+    async def create_user_settings(self, user_id: str, quota_limit: int = 50):
+        try:
+            await self._transaction(lambda conn: conn.execute(
+                "INSERT INTO user_settings (user_id, quota_limit, last_updated) VALUES (?, ?, ?)",
+                (user_id, quota_limit, datetime.now().isoformat()),
+            ))
+            return True
+        except Exception as e:
+            raise Exception("Error when creating new user settings: " + str(e))
+
+    async def get_user_quota(self, user_id: str):
+        try:
+            rows = await self._query("SELECT quota_limit FROM user_settings WHERE user_id = ?", (user_id,))
+            if rows:
+                return rows[0]["quota_limit"]
+            await self.create_user_settings(user_id, 50)
+            return 50
+        except Exception as e:
+            raise Exception("Error when getting user quota: " + str(e))
+
+    async def update_user_quota(self, user_id: str, quota_limit: int):
+        try:
+            await self._transaction(lambda conn: conn.execute(
+                "UPDATE user_settings SET quota_limit = ?, last_updated = ? WHERE user_id = ?",
+                (quota_limit, datetime.now().isoformat(), user_id),
+            ))
+            return True
+        except Exception as e:
+            raise Exception("Error when updating user quota: " + str(e))
+
+    async def get_all_user_email_newsletter_subscribed(self) -> list[dict]:
+        try:
+            return await self._query("SELECT user_id, email FROM user_settings WHERE is_newsletter_subscribed = 1")
+        except Exception as e:
+            raise Exception("Error when getting user email newsletter subscription: " + str(e))
+
+    async def get_user_by_auth_id(self, auth_user_id: str) -> Optional[dict]:
+        try:
+            rows = await self._query("SELECT user_id, role FROM users WHERE auth_user_id = ?", (auth_user_id,))
+            return rows[0] if rows else None
+        except Exception as e:
+            raise Exception("Error when getting user by auth ID: " + str(e))
+
+    async def get_parent_user_ids(self, child_user_ids: list) -> list:
+        try:
+            rows = await self._query(
+                "SELECT parent_user_id FROM parent_child_relations WHERE child_user_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(child_user_ids),),
+            )
+            return [row["parent_user_id"] for row in rows]
+        except Exception as e:
+            raise Exception("Error when getting parent user IDs: " + str(e))
+
+    async def get_parent_child_relations(self, child_user_ids: list) -> list:
+        try:
+            return await self._query(
+                "SELECT parent_user_id, child_user_id FROM parent_child_relations WHERE child_user_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(child_user_ids),),
+            )
+        except Exception as e:
+            raise Exception("Error when getting parent child relations: " + str(e))
+
+    async def get_user_emails(self, user_ids: list) -> dict:
+        try:
+            rows = await self._query(
+                "SELECT user_id, email FROM user_settings WHERE user_id IN (SELECT value FROM json_each(?)) AND email IS NOT NULL",
+                (json.dumps(user_ids),),
+            )
+            return {row["user_id"]: row["email"] for row in rows}
+        except Exception as e:
+            raise Exception("Error when getting user emails: " + str(e))
+
+    async def get_usernames(self, user_ids: list) -> dict:
+        try:
+            rows = await self._query(
+                "SELECT user_id, username FROM users WHERE user_id IN (SELECT value FROM json_each(?))", (json.dumps(user_ids),),
+            )
+            return {row["user_id"]: row["username"] for row in rows}
+        except Exception as e:
+            raise Exception("Error when getting usernames: " + str(e))
+
+    async def get_all_children(self, user_id: str):
+        try:
+            rows = await self._query(
+                """
+                SELECT r.*, p.user_id AS p_user_id, p.username AS p_username, p.role AS p_role, p.user_age AS p_user_age,
+                       ch.user_id AS ch_user_id, ch.username AS ch_username, ch.role AS ch_role, ch.user_age AS ch_user_age
+                  FROM parent_child_relations r
+                  LEFT JOIN users p ON p.user_id = r.parent_user_id
+                  LEFT JOIN users ch ON ch.user_id = r.child_user_id
+                 WHERE r.parent_user_id = ?
+                """,
+                (user_id,),
+            )
+            relations = []
+            for row in rows:
+                parent, child = _split(row, "p_", "user_id"), _split(row, "ch_", "user_id")
+                relation = {column: value for column, value in row.items() if not column.startswith(("p_", "ch_"))}
+                # same shape as the embedded select `users:parent_user_id (...), children:child_user_id (...)`
+                relation["users"] = {key: parent[key] for key in ("username", "role", "user_age")} if parent else None
+                relation["children"] = {key: child[key] for key in ("username", "role", "user_age")} if child else None
+                relations.append(relation)
+            return relations
+        except Exception as e:
+            raise Exception("Error when getting all children: " + str(e))
+
+    async def add_child(self, parent_user_id: str, child_name: str, child_age: int):
+        def add(conn: sqlite3.Connection):
+            child_user_id = conn.execute(
+                "INSERT INTO users (username, role, user_age) VALUES (?, 'child', ?)", (child_name, child_age),
+            ).lastrowid
+            conn.execute("INSERT INTO parent_child_relations (parent_user_id, child_user_id) VALUES (?, ?)", (parent_user_id, child_user_id))
+
+        try:
+            await self._transaction(add)
+            return True
+        except Exception as e:
+            raise Exception("Error when adding child: " + str(e))
+
+    async def remove_child(self, parent_user_id: str, child_user_id: str):
+        try:
+            await self._transaction(lambda conn: conn.execute(
+                "DELETE FROM parent_child_relations WHERE parent_user_id = ? AND child_user_id = ?", (parent_user_id, child_user_id),
+            ))
+            return True
+        except Exception as e:
+            raise Exception("Error when removing child: " + str(e))
+
+    async def rename_child(self, child_user_id: str, new_name: str):
+        try:
+            await self._transaction(lambda conn: conn.execute(
+                "UPDATE users SET username = ? WHERE user_id = ?", (new_name, child_user_id),
+            ))
+            return True
+        except Exception as e:
+            raise Exception("Error when renaming child: " + str(e))
+
+    async def get_conversation_times(self, user_id: str):
+        try:
+            return await self._query(
+                f"SELECT conversation_id, start_time, end_time FROM conversations WHERE child_user_id IN ({CHILDREN_OF})",
+                (user_id,),
+            )
+        except Exception as e:
+            raise Exception("Error when fetching conversation times: " + str(e))
+
+    def _risky_event_item(self, row: dict) -> dict:
+        username = row["u_username"] if row["u_user_id"] is not None else "Unknown User"
+        return self._enrich_risky_event(row, _split(row, "c_", "conversation_id"), _split(row, "b_", "chatbot_id"), username)
+
+    async def read_all_conversations(self, user_id: str):
+        """Every risky event of the parent's children, enriched, in one joined query."""
+        try:
+            rows = await self._query(
+                RISKY_EVENT_SELECT + f"""
+                 WHERE e.child_user_id IN ({CHILDREN_OF}) AND lower(coalesce(e."riskType", '')) <> 'no risk'
+                """,
+                (user_id,),
+            )
+            # as the Supabase client: no events when none of them has a conversation
+            if not any(row["c_conversation_id"] is not None for row in rows):
+                return []
+            return [self._risky_event_item(row) for row in rows]
+        except Exception as e:
+            raise Exception("Error when reading all conversations: " + str(e))
+
+    async def get_all_conversations(self, user_id: str):
+        try:
+            rows = await self._query(CONVERSATION_SELECT + f" WHERE c.child_user_id IN ({CHILDREN_OF})", (user_id,))
+            return [self._enrich_conversation(row, _split(row, "b_", "chatbot_id")) for row in rows]
+        except Exception as e:
+            raise Exception("Error when reading all conversations: " + str(e))
+
+    async def read_risky_events_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+        risk_level: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        platform: Optional[str] = None,
+        fields: Sequence[str] = RISKY_EVENT_FIELDS,
+    ) -> dict:
+        try:
+            where = [f"e.child_user_id IN ({CHILDREN_OF})", """e."riskType" IS NOT NULL AND lower(e."riskType") <> 'no risk'"""]
+            params: list = [user_id]
+            if child_user_id is not None:
+                where.append("e.child_user_id = ?")
+                params.append(child_user_id)
+            if risk_level is not None:
+                where.append('lower(e."riskLevel") = lower(?)')
+                params.append(risk_level)
+            if start_time is not None:
+                where.append("e.timestamp >= ?")
+                params.append(start_time)
+            if end_time is not None:
+                where.append("e.timestamp < ?")
+                params.append(end_time)
+            if platform is not None:
+                where.append('b."chatbotPlatform" = ?')
+                params.append(platform)
+            if cursor:
+                timestamp, risky_event_id = decode_cursor(cursor)
+                if timestamp is None:
+                    where.append("(e.timestamp IS NULL AND e.risky_event_id < ?)")
+                    params.append(int(risky_event_id))
+                else:
+                    where.append("(e.timestamp < ? OR (e.timestamp = ? AND e.risky_event_id < ?) OR e.timestamp IS NULL)")
+                    params += [timestamp, timestamp, int(risky_event_id)]
+            # events without a timestamp come last
+            rows = await self._query(
+                RISKY_EVENT_SELECT + " WHERE " + " AND ".join(where) + " ORDER BY e.timestamp DESC NULLS LAST, e.risky_event_id DESC LIMIT ?",
+                params + [limit],
+            )
+
+            items = []
+            for row in rows:
+                enriched = self._risky_event_item(row)
+                items.append({field: enriched[field] for field in fields})
+
+            next_cursor = None
+            if len(rows) == limit:
+                last = rows[-1]
+                next_cursor = encode_cursor(last["timestamp"], last["risky_event_id"])
+            return {"items": items, "next_cursor": next_cursor}
+
+        except Exception as e:
+            raise Exception("Error when reading risky events page: " + str(e))
+
+    async def get_conversations_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        platform: Optional[str] = None,
+        fields: Sequence[str] = CONVERSATION_FIELDS,
+    ) -> dict:
+        try:
+            where = [f"c.child_user_id IN ({CHILDREN_OF})"]
+            params: list = [user_id]
+            if child_user_id is not None:
+                where.append("c.child_user_id = ?")
+                params.append(child_user_id)
+            if start_time is not None:
+                where.append("c.start_time >= ?")
+                params.append(start_time)
+            if end_time is not None:
+                where.append("c.start_time < ?")
+                params.append(end_time)
+            if platform is not None:
+                where.append('b."chatbotPlatform" = ?')
+                params.append(platform)
+            if cursor:
+                start, conversation_id = decode_cursor(cursor)
+                if start is None:
+                    where.append("(c.start_time IS NULL AND c.conversation_id < ?)")
+                    params.append(int(conversation_id))
+                else:
+                    where.append("(c.start_time < ? OR (c.start_time = ? AND c.conversation_id < ?) OR c.start_time IS NULL)")
+                    params += [start, start, int(conversation_id)]
+            # conversations without a start time come last
+            rows = await self._query(
+                CONVERSATION_SELECT + " WHERE " + " AND ".join(where) + " ORDER BY c.start_time DESC NULLS LAST, c.conversation_id DESC LIMIT ?",
+                params + [limit],
+            )
+
+            items = []
+            for row in rows:
+                enriched = self._enrich_conversation(row, _split(row, "b_", "chatbot_id"))
+                items.append({field: enriched[field] for field in fields})
+
+            next_cursor = None
+            if len(rows) == limit:
+                last = rows[-1]
+                next_cursor = encode_cursor(last["start_time"], last["conversation_id"])
+            return {"items": items, "next_cursor": next_cursor}
+
+        except Exception as e:
+            raise Exception("Error when reading conversations page: " + str(e))
+
+    async def get_risky_event_by_id(self, riskyEvent_id: int, include_messages: bool = False, user_id: Optional[str] = None):
+        try:
+            sql, params = RISKY_EVENT_SELECT + " WHERE e.risky_event_id = ?", [riskyEvent_id]
+            if user_id is not None:
+                sql += f" AND coalesce(e.child_user_id, c.child_user_id) IN ({CHILDREN_OF})"
+                params.append(user_id)
+            rows = await self._query(sql, params)
+            if not rows:
+                return None  # No risky event found with the given ID
+            conversation, chatbot = _split(rows[0], "c_", "conversation_id"), _split(rows[0], "b_", "chatbot_id")
+            if not conversation or not chatbot:
+                return None  # No conversation or chatbot found for the event
+            if include_messages:
+                stored = await self._query("SELECT messages FROM risky_events_log WHERE risky_event_id = ?", (riskyEvent_id,))
+                rows[0]["messages"] = stored[0]["messages"]
+            return self._enrich_risky_event(rows[0], conversation, chatbot, detail=True)
+        except Exception as e:
+            raise Exception("Error when reading the risky event: " + str(e))
+
+    async def get_risk_summary(
+        self,
+        user_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+    ) -> list:
+        try:
+            where = [f"child_user_id IN ({CHILDREN_OF})"]
+            params: list = [user_id]
+            if child_user_id is not None:
+                where.append("child_user_id = ?")
+                params.append(child_user_id)
+            if start_date is not None:
+                where.append("day >= ?")
+                params.append(start_date)
+            if end_date is not None:
+                where.append("day <= ?")
+                params.append(end_date)
+            return await self._query(
+                'SELECT child_user_id, day, "riskType", "riskLevel", platform, count FROM risk_summary_daily WHERE '
+                + " AND ".join(where) + " ORDER BY day",
+                params,
+            )
+        except Exception as e:
+            raise Exception("Error when reading risk summary: " + str(e))
+
+    @staticmethod
+    def _increment_risk_summary(conn: sqlite3.Connection, risky_event_ids: list) -> None:
+        event_ids = json.dumps(risky_event_ids)
+        conn.execute(INCREMENT_RISK_SUMMARY, (event_ids,))
+        conn.execute(
+            "INSERT OR IGNORE INTO risk_summary_counted (risky_event_id) "
+            "SELECT risky_event_id FROM risky_events_log WHERE risky_event_id IN (SELECT value FROM json_each(?))",
+            (event_ids,),
+        )
+
+    async def increment_risk_summary(self, risky_event_ids: list) -> None:
+        risky_event_ids = [event_id for event_id in risky_event_ids if event_id is not None]
+        if not self.risk_summary_enabled or not risky_event_ids:
+            return
+        try:
+            await self._transaction(self._increment_risk_summary, risky_event_ids)
+        except Exception as e:
+            print(f"Error updating risk summary: {str(e)}")
+
+    async def rebuild_risk_summary(self) -> int:
+        def rebuild(conn: sqlite3.Connection) -> int:
+            conn.execute("DELETE FROM risk_summary_counted")
+            conn.execute("DELETE FROM risk_summary_daily")
+            event_ids = [row[0] for row in conn.execute("SELECT risky_event_id FROM risky_events_log")]
+            self._increment_risk_summary(conn, event_ids)
+            return conn.execute("SELECT count(*) FROM risk_summary_daily").fetchone()[0]
+
+        try:
+            return await self._transaction(rebuild)
+        except Exception as e:
+            raise Exception("Error when rebuilding risk summary: " + str(e))
+
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        kinds: Sequence[str] = SEARCH_KINDS,
+        child_user_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[dict]:
+        match = _fts_query(query)
+        kinds = [kind for kind in kinds if kind in SEARCH_KINDS]
+        if not match or not kinds:
+            return []
+
+        def search(conn: sqlite3.Connection) -> list[dict]:
+            children, scope = CHILDREN_OF, [user_id]
+            if child_user_id is not None:
+                children += " AND child_user_id = ?"
+                scope.append(child_user_id)
+            owners = [f"c{int(row[0])}" for row in conn.execute(children, scope)]
+            if not owners:
+                return []
+            sql = SEARCH_SQL.format(kinds=", ".join("?" * len(kinds)), children=children)
+            owned = f"owner : ({' OR '.join(owners + ['unowned'])}) AND {match}"
+            return self._all(conn, sql, [owned, *kinds, *scope, *scope, limit, offset])
+
+        try:
+            return [self._search_result(row) for row in await self._run(search)]
+        except Exception as e:
+            raise Exception("Error when searching: " + str(e))
+
+    @staticmethod
+    def _index_search_documents(conn: sqlite3.Connection, documents: list[dict]) -> None:
+        # one row per document (the last one wins)
+        rows = {int(document["doc_id"]) * 4 + SEARCH_KINDS.index(document["kind"]): document for document in documents}.items()
+        conn.executemany("DELETE FROM search_index WHERE rowid = ?", [(rowid,) for rowid, _ in rows])
+        conn.executemany(INDEX_SEARCH_DOCUMENT, [
+            (
+                rowid, document["content"], document["kind"], document["doc_id"], document["conversation_id"],
+                document["timestamp"], document["child_user_id"], document["conversation_id"],
+            )
+            for rowid, document in rows
+        ])
+
+    async def index_search_documents(self, documents: list[dict]) -> None:
+        if not self.search_index_enabled or not documents:
+            return
+        try:
+            await self._transaction(self._index_search_documents, documents)
+        except Exception as e:
+            print(f"Error updating search index: {str(e)}")
+
+    async def rebuild_search_index(self, batch_size: int = 10000) -> int:
+        def rebuild(conn: sqlite3.Connection) -> int:
+            conn.execute("DELETE FROM search_index")
+            documents = self._conversation_documents(self._all(conn, "SELECT * FROM conversations"))
+            documents += self._risky_event_documents(self._all(
+                conn, 'SELECT risky_event_id, conversation_id, child_user_id, timestamp, "riskType", "riskyReason" FROM risky_events_log',
+            ))
+            self._index_search_documents(conn, documents)
+            total, after = len(documents), 0
+            while True:
+                rows = self._all(
+                    conn, "SELECT message_id, conversation_id, timestamp, message_text FROM messages WHERE message_id > ? ORDER BY message_id LIMIT ?",
+                    (after, batch_size),
+                )
+                if not rows:
+                    return total
+                after = rows[-1]["message_id"]
+                documents = self._message_documents([{"message_text": self.text_codec.decode(row["message_text"])} for row in rows], rows)
+                self._index_search_documents(conn, documents)
+                total += len(documents)
+
+        try:
+            return await self._transaction(rebuild)
+        except Exception as e:
+            raise Exception("Error when rebuilding search index: " + str(e))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, table: str, row: dict, or_ignore: bool = False) -> bool:
+        cursor = conn.execute(_insert_sql(table, tuple(row), or_ignore), [_encode(value) for value in row.values()])
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, table: str, rows: list[dict], on_conflict: str) -> list[dict]:
+        for row in rows:
+            conn.execute(_upsert_sql(table, tuple(row), on_conflict), [_encode(value) for value in row.values()])
+        return rows
+
+    async def write_conversation(self, conversation_details: dict):
+        try:
+            conversation_data = self._conversation_row(conversation_details)
+            await self._transaction(self._insert, "conversations", conversation_data)
+            await self.index_search_documents(self._conversation_documents([conversation_data]))
+            return conversation_data
+        except Exception as e:
+            print(f"Error writing conversation to database: {str(e)}")
+            raise Exception(f"Error writing conversation to database: {str(e)}")
+
+    async def update_conversation(self, conversation_id: int, conversation_details: dict) -> Optional[dict]:
+        def update(conn: sqlite3.Connection, patch: dict) -> Optional[dict]:
+            if patch:
+                assignments = ", ".join(f'"{column}" = ?' for column in patch)
+                conn.execute(f"UPDATE conversations SET {assignments} WHERE conversation_id = ?", [*patch.values(), conversation_id])
+                rows = self._all(conn, "SELECT * FROM conversations WHERE conversation_id = ?", (conversation_id,))
+            else:
+                rows = self._all(conn, "SELECT conversation_id, child_user_id FROM conversations WHERE conversation_id = ?", (conversation_id,))
+            return rows[0] if rows else None
+
+        try:
+            patch = {
+                column: conversation_details[key]
+                for key, column in CONVERSATION_PATCH_COLUMNS.items()
+                if conversation_details.get(key) is not None
+            }
+            # a retried or repeated update this worker already applied skips the database
+            digest = self.conversation_cache.digest(patch)
+            if patch and self.conversation_cache.seen(conversation_id, digest):
+                return {"conversation_id": conversation_id, **patch}
+
+            row = await self._transaction(update, patch)
+            if row is None:
+                self.conversation_cache.forget(conversation_id)
+                return None
+            if patch:
+                self.conversation_cache.remember(conversation_id, digest)
+                await self.index_search_documents(self._conversation_documents([row]))
+            return row
+
+        except Exception as e:
+            print(f"Error updating conversation in database: {str(e)}")
+            raise Exception(f"Error updating conversation in database: {str(e)}")
+
+    async def write_alert(self, alert_details: dict):
+        try:
+            alert_data = self._alert_row(alert_details)
+            await self._transaction(self._insert, "risky_events_log", alert_data)
+            await self.increment_risk_summary([alert_data.get("risky_event_id")])
+            await self.index_search_documents(self._risky_event_documents([alert_data]))
+            return alert_data
+        except Exception as e:
+            print(f"Error writing alert to database: {str(e)}")
+            raise Exception(f"Error writing alert to database: {str(e)}")
+
+    def _write_message_rows(self, conn: sqlite3.Connection, rows: list[dict]) -> list[dict]:
+        if not self.message_dedup_persistent:
+            return self._upsert(conn, "messages", rows, "message_id")
+        # rows whose text the conversation already has are skipped by the unique index (and not returned)
+        return [row for row in rows if self._insert(conn, "messages", row, or_ignore=True)]
+
+    async def write_message(self, message_details: dict):
+        try:
+            duplicate_of = await self.claim_message(message_details)
+            if duplicate_of is not None:
+                return self._duplicate_message(message_details, duplicate_of)
+
+            rows = self._message_rows([message_details])
+            if rows[0]["message_id"] is None:
+                rows[0]["message_id"] = await self.id_allocator.anext_id("messages")
+            if not self.message_dedup_persistent:
+                await self._transaction(self._insert, "messages", rows[0])
+                written = rows
+            else:
+                written = await self._transaction(self._write_message_rows, rows)
+            await self.index_search_documents(self._message_documents([message_details], written))
+            return written[0] if written else self._duplicate_message(message_details, None)
+
+        except Exception as e:
+            self.release_message_claims([message_details])
+            print(f"Error writing message to database: {str(e)}")
+            raise Exception(f"Error writing message to database: {str(e)}")
+
+    async def write_chatbot(self, chatbot_data: dict):
+        try:
+            # Identical re-sends of a chatbot this worker already stored skip the database
+            digest = self.chatbot_cache.digest(chatbot_data)
+            if self.chatbot_cache.seen(chatbot_data['chatbot_id'], digest):
+                return chatbot_data
+            await self._transaction(self._upsert, "chatbots", [chatbot_data], "chatbot_id")
+            self.chatbot_cache.remember(chatbot_data['chatbot_id'], digest)
+            return chatbot_data
+        except Exception as e:
+            print(f"Error writing chatbot to database: {str(e)}")
+            raise Exception(f"Error writing chatbot to database: {str(e)}")
+
+    async def write_conversations(self, conversation_details_list: list[dict]) -> list[dict]:
+        try:
+            rows = [self._conversation_row(details) for details in conversation_details_list]
+            written = await self._transaction(self._upsert, "conversations", rows, "conversation_id")
+            await self.index_search_documents(self._conversation_documents(written))
+            return written
+        except Exception as e:
+            print(f"Error writing conversations to database: {str(e)}")
+            raise Exception(f"Error writing conversations to database: {str(e)}")
+
+    async def write_alerts(self, alert_details_list: list[dict]) -> list[dict]:
+        try:
+            rows = [self._alert_row(details) for details in alert_details_list]
+            written = await self._transaction(self._upsert, "risky_events_log", rows, "risky_event_id")
+            await self.increment_risk_summary([row.get("risky_event_id") for row in written])
+            await self.index_search_documents(self._risky_event_documents(written))
+            return written
+        except Exception as e:
+            print(f"Error writing alerts to database: {str(e)}")
+            raise Exception(f"Error writing alerts to database: {str(e)}")
+
+    async def write_messages(self, message_details_list: list[dict]) -> list[dict]:
+        try:
+            results: list = [None] * len(message_details_list)
+            pending = []
+            for index, details in enumerate(message_details_list):
+                duplicate_of = await self.claim_message(details)
+                if duplicate_of is not None:
+                    results[index] = self._duplicate_message(details, duplicate_of)
+                else:
+                    pending.append((index, details))
+            rows = self._message_rows([details for _, details in pending])
+            for row in rows:
+                if row["message_id"] is None:
+                    row["message_id"] = await self.id_allocator.anext_id("messages")
+            written = {row["message_id"]: row for row in await self._transaction(self._write_message_rows, rows)} if rows else {}
+            for (index, details), row in zip(pending, rows):
+                results[index] = written.get(row["message_id"]) or self._duplicate_message(details, None)
+            await self.index_search_documents(self._message_documents(message_details_list, results))
+            return results
+        except Exception as e:
+            self.release_message_claims(message_details_list)
+            print(f"Error writing messages to database: {str(e)}")
+            raise Exception(f"Error writing messages to database: {str(e)}")
+
+    async def load_conversation_context(self, conversation_id: int) -> Optional[dict]:
+        try:
+            rows = await self._query("SELECT next_seq, turns FROM conversation_context WHERE conversation_id = ?", (conversation_id,))
+            return {"next_seq": rows[0]["next_seq"], "turns": json.loads(rows[0]["turns"])} if rows else None
+        except Exception as e:
+            print(f"Error reading conversation context: {str(e)}")
+            raise Exception(f"Error reading conversation context: {str(e)}")
+
+    async def save_conversation_context(self, conversation_id: int, next_seq: int, turns: list, expected_seq: Optional[int]) -> bool:
+        try:
+            params = (next_seq, json.dumps(turns), datetime.now().isoformat(), conversation_id)
+            if expected_seq is None:
+                sql = "INSERT OR IGNORE INTO conversation_context (next_seq, turns, updated_at, conversation_id) VALUES (?, ?, ?, ?)"
+            else:
+                sql = "UPDATE conversation_context SET next_seq = ?, turns = ?, updated_at = ? WHERE conversation_id = ? AND next_seq = ?"
+                params += (expected_seq,)
+            return await self._transaction(lambda conn: conn.execute(sql, params).rowcount) > 0
+        except Exception as e:
+            print(f"Error writing conversation context: {str(e)}")
+            raise Exception(f"Error writing conversation context: {str(e)}")
+
+    async def read_transcripts(self, table: str, key: str, column: str, after: Optional[int], limit: int) -> list[dict]:
+        self._check_transcript_column(table, key, column)
+        try:
+            sql = f'SELECT {key}, {column} FROM {table}' + (f' WHERE {key} > ?' if after is not None else '') + f' ORDER BY {key} LIMIT ?'
+            return await self._query(sql, ((after,) if after is not None else ()) + (limit,))
+        except Exception as e:
+            raise Exception(f"Error when reading {table} transcripts: " + str(e))
+
+    async def update_transcripts(self, table: str, key: str, column: str, rows: list[dict]) -> None:
+        self._check_transcript_column(table, key, column)
+        try:
+            await self._transaction(lambda conn: conn.executemany(
+                f"UPDATE {table} SET {column} = ? WHERE {key} = ?", [(row[column], row[key]) for row in rows],
+            ))
+        except Exception as e:
+            print(f"Error updating {table} transcripts: {str(e)}")
+            raise Exception(f"Error updating {table} transcripts: {str(e)}")
+
+    async def write_chatbots(self, chatbot_data_list: list[dict]) -> list[dict]:
+        try:
+            changed = {}
+            for chatbot_data in chatbot_data_list:
+                digest = self.chatbot_cache.digest(chatbot_data)
+                if not self.chatbot_cache.seen(chatbot_data['chatbot_id'], digest):
+                    changed[chatbot_data['chatbot_id']] = (chatbot_data, digest)
+            if changed:
+                await self._transaction(self._upsert, "chatbots", [chatbot_data for chatbot_data, _ in changed.values()], "chatbot_id")
+                for chatbot_id, (_, digest) in changed.items():
+                    self.chatbot_cache.remember(chatbot_id, digest)
+            return [changed.get(chatbot_data['chatbot_id'], (chatbot_data,))[0] for chatbot_data in chatbot_data_list]
+        except Exception as e:
+            print(f"Error writing chatbots to database: {str(e)}")
+            raise Exception(f"Error writing chatbots to database: {str(e)}")
@@ -0,0 +1,604 @@
+import abc
+import base64
+import json
+import re
+from datetime import datetime
+from typing import AsyncIterator, Optional, Sequence
+
+from settings import app_settings
+from db_utils.id_allocator import BlockIdAllocator
+from db_utils.message_dedup import MessageDedupIndex, content_hash
+from db_utils.payload_cache import PayloadHashCache
+from db_utils.text_codec import TRANSCRIPT_COLUMNS, build_text_codec
+
+# fields of the enriched dashboard objects; `fields=` projections pick from these
+RISKY_EVENT_FIELDS = (
+    "username", "riskyEvent_id", "conversation_id", "conversationTopics", "conversationSummarization",
+    "riskType", "riskLevel", "riskyReason", "timestamp", "chatbotPlatform", "chatbotDescription",
+)
+CONVERSATION_FIELDS = (
+    "conversation_id", "start_time", "end_time", "conversationTopics", "conversationSummarization",
+    "chatbotPlatform", "chatbotDescription",
+)
+CHATBOT_DERIVED_FIELDS = ("chatbotPlatform", "chatbotDescription")
+CONVERSATION_DERIVED_FIELDS = ("conversationTopics", "conversationSummarization") + CHATBOT_DERIVED_FIELDS
+
+# document kinds of the full-text search index
+SEARCH_KINDS = ("message", "conversation", "risky_event")
+SEARCH_PLACEHOLDERS = ("unknown", "No summary available")
+
+# conversation_details keys -> conversations columns that PUT /conversations/update may change
+CONVERSATION_PATCH_COLUMNS = {
+    "end_time": "end_time",
+    "conversation_topic": "conversationTopic",
+    "conversation_summary": "conversationSummary",
+}
+
+
+def encode_cursor(*values) -> str:
+    """Opaque pagination cursor holding the sort key of the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+# an ISO 8601 date or date-time; cursor timestamps are formatted into PostgREST filters
+_CURSOR_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?(Z|[+-]\d{2}:?\d{2})?")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    [timestamp, id] of a cursor; ValueError unless they are an ISO timestamp
+    (or None: rows without one sort after all others) and an integer.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+    if (
+        not isinstance(values, list) or len(values) != 2
+        or not (values[0] is None or isinstance(values[0], str) and _CURSOR_TIMESTAMP.fullmatch(values[0]))
+        or not isinstance(values[1], int) or isinstance(values[1], bool)
+    ):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    try:
+        if values[0] is not None:
+            datetime.fromisoformat(values[0].replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+
+class Singleton(abc.ABCMeta, type):
+    """
+    Singleton metaclass for ensuring only one instance of a class.
+    """
+
+    _instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        """Call method for the singleton metaclass."""
+        if cls not in cls._instances:
+            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+class StorageBackend(abc.ABC):
+    """
+    Storage used by the API: users and families, chatbots, conversations,
+    messages, risky events and their daily summary.
+
+    Implementations differ only in where rows live (AsyncRDSClient: Supabase,
+    SQLiteRDSClient: a local SQLite file); every method is a coroutine and
+    returns the same shapes, so routers and services do not care which one
+    `build_storage_backend` picked. ID allocation, message deduplication and
+    the shaping of dashboard objects are shared here.
+    """
+
+    def __init__(self, id_allocator: BlockIdAllocator) -> None:
+        self.id_allocator = id_allocator
+        # the extension re-sends the same chatbot with every analyzed turn
+        self.chatbot_cache = PayloadHashCache(app_settings.chatbot_cache_size)
+        # ... and the same conversation update when it retries
+        self.conversation_cache = PayloadHashCache(app_settings.chatbot_cache_size)
+        # overlapping chat windows re-send the same message text (None when disabled)
+        self.message_dedup = MessageDedupIndex(
+            app_settings.message_dedup_per_conversation, app_settings.message_dedup_max_conversations,
+        ) if app_settings.message_dedup_enabled else None
+        # also let a unique (conversation_id, content_hash) index drop repeats other workers already wrote
+        self.message_dedup_persistent: bool = app_settings.message_dedup_persistent
+        # keep risk_summary_daily current on every alert write
+        self.risk_summary_enabled: bool = app_settings.risk_summary_enabled
+        # compresses the transcript columns (risky_events_log.messages, messages.message_text)
+        self.text_codec = build_text_codec()
+        # keep the full-text search index current on every write
+        self.search_index_enabled: bool = app_settings.search_index_enabled
+
+    @abc.abstractmethod
+    async def aclose(self):
+        """Release connections."""
+
+    # users and families
+
+    @abc.abstractmethod
+    async def verify_child_user(self, child_user_id: int) -> bool:
+        """Verify that a child user exists"""
+
+    @abc.abstractmethod
+    async def create_user_settings(self, user_id: str, quota_limit: int = 50):
+        """Create the user's row in user_settings"""
+
+    @abc.abstractmethod
+    async def get_user_quota(self, user_id: str):
+        """The user's quota, creating their settings with the default quota if missing"""
+
+    @abc.abstractmethod
+    async def update_user_quota(self, user_id: str, quota_limit: int):
+        """Change the user's quota"""
+
+    @abc.abstractmethod
+    async def get_all_user_email_newsletter_subscribed(self) -> list[dict]:
+        """user_id and email of every newsletter subscriber"""
+
+    @abc.abstractmethod
+    async def get_user_by_auth_id(self, auth_user_id: str) -> Optional[dict]:
+        """user_id and role of the app user linked to a Supabase auth user (a token's `sub`), or None"""
+
+    @abc.abstractmethod
+    async def get_parent_user_ids(self, child_user_ids: list) -> list:
+        """Parents of any of the given children"""
+
+    @abc.abstractmethod
+    async def get_parent_child_relations(self, child_user_ids: list) -> list:
+        """(parent_user_id, child_user_id) rows for the given children"""
+
+    @abc.abstractmethod
+    async def get_user_emails(self, user_ids: list) -> dict:
+        """user_id -> email for the given users"""
+
+    @abc.abstractmethod
+    async def get_usernames(self, user_ids: list) -> dict:
+        """user_id -> username for the given users"""
+
+    @abc.abstractmethod
+    async def get_all_children(self, user_id: str):
+        """Relation rows of the parent with `users` (parent) and `children` profiles embedded"""
+
+    @abc.abstractmethod
+    async def add_child(self, parent_user_id: str, child_name: str, child_age: int):
+        """Create a child user and link it to the parent"""
+
+    @abc.abstractmethod
+    async def remove_child(self, parent_user_id: str, child_user_id: str):
+        """Unlink a child from the parent"""
+
+    @abc.abstractmethod
+    async def rename_child(self, child_user_id: str, new_name: str):
+        """Change a child's username"""
+
+    # dashboard reads
+
+    @abc.abstractmethod
+    async def get_conversation_times(self, user_id: str):
+        """conversation_id, start_time and end_time of the parent's children's conversations"""
+
+    @abc.abstractmethod
+    async def read_all_conversations(self, user_id: str):
+        """Enriched risky events (see RISKY_EVENT_FIELDS) of the parent's children"""
+
+    @abc.abstractmethod
+    async def get_all_conversations(self, user_id: str):
+        """Enriched conversations (see CONVERSATION_FIELDS) of the parent's children"""
+
+    @abc.abstractmethod
+    async def read_risky_events_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+        risk_level: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        platform: Optional[str] = None,
+        fields: Sequence[str] = RISKY_EVENT_FIELDS,
+    ) -> dict:
+        """
+        One page of read_all_conversations, newest first, with keyset
+        pagination on (timestamp, risky_event_id).
+        Returns {"items": [...], "next_cursor": str or None}.
+        """
+
+    @abc.abstractmethod
+    async def get_conversations_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        platform: Optional[str] = None,
+        fields: Sequence[str] = CONVERSATION_FIELDS,
+    ) -> dict:
+        """
+        One page of get_all_conversations, newest first, with keyset
+        pagination on (start_time, conversation_id).
+        Returns {"items": [...], "next_cursor": str or None}.
+        """
+
+    @abc.abstractmethod
+    async def get_risky_event_by_id(self, riskyEvent_id: int, include_messages: bool = False, user_id: Optional[str] = None):
+        """
+        One enriched risky event, or None; with include_messages also its
+        stored transcript. With user_id, None as well unless the event belongs
+        to one of that parent's children.
+        """
+
+    @abc.abstractmethod
+    async def get_risk_summary(
+        self,
+        user_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+    ) -> list:
+        """
+        Daily risk buckets (child_user_id, day, riskType, riskLevel, platform,
+        count) of the parent's children between start_date and end_date inclusive.
+        """
+
+    @abc.abstractmethod
+    async def increment_risk_summary(self, risky_event_ids: list) -> None:
+        """Add freshly written risky events to the daily counts; logs rather than raises"""
+
+    @abc.abstractmethod
+    async def rebuild_risk_summary(self) -> int:
+        """Recompute the daily counts from risky_events_log; returns the number of buckets"""
+
+    # ingest writes
+
+    @abc.abstractmethod
+    async def write_conversation(self, conversation_details: dict):
+        """Insert one conversation; returns the stored row"""
+
+    @abc.abstractmethod
+    async def update_conversation(self, conversation_id: int, conversation_details: dict) -> Optional[dict]:
+        """Patch end_time, topic and summary; returns the updated row, or None if it does not exist"""
+
+    @abc.abstractmethod
+    async def write_alert(self, alert_details: dict):
+        """Insert one risky event; returns the stored row"""
+
+    @abc.abstractmethod
+    async def write_message(self, message_details: dict):
+        """Insert one message; a repeated text comes back as the stored message with "duplicate": True"""
+
+    @abc.abstractmethod
+    async def write_chatbot(self, chatbot_data: dict):
+        """Insert or update one chatbot; returns the stored row"""
+
+    @abc.abstractmethod
+    async def write_conversations(self, conversation_details_list: list[dict]) -> list[dict]:
+        """Bulk version of write_conversation"""
+
+    @abc.abstractmethod
+    async def write_alerts(self, alert_details_list: list[dict]) -> list[dict]:
+        """Bulk version of write_alert"""
+
+    @abc.abstractmethod
+    async def write_messages(self, message_details_list: list[dict]) -> list[dict]:
+        """Bulk version of write_message; returns one row per input, in order"""
+
+    @abc.abstractmethod
+    async def write_chatbots(self, chatbot_data_list: list[dict]) -> list[dict]:
+        """Bulk version of write_chatbot; returns one row per input, in order"""
+
+    # conversation context (app/services/context_store.py)
+
+    @abc.abstractmethod
+    async def load_conversation_context(self, conversation_id: int) -> Optional[dict]:
+        """The stored {"next_seq", "turns"} of a conversation, or None"""
+
+    @abc.abstractmethod
+    async def save_conversation_context(self, conversation_id: int, next_seq: int, turns: list, expected_seq: Optional[int]) -> bool:
+        """
+        Store the turns if the stored next_seq is still `expected_seq` (None: no
+        row yet); False when another worker got there first.
+        """
+
+    # full-text search
+
+    @abc.abstractmethod
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        kinds: Sequence[str] = SEARCH_KINDS,
+        child_user_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[dict]:
+        """
+        Messages, conversations and risky events of the parent's children
+        matching `query`, best match first, as {kind, id, conversation_id,
+        child_user_id, timestamp, snippet, score}.
+        """
+
+    @abc.abstractmethod
+    async def index_search_documents(self, documents: list[dict]) -> None:
+        """Add or replace documents of the search index; logs rather than raises"""
+
+    @abc.abstractmethod
+    async def rebuild_search_index(self) -> int:
+        """Reindex every conversation, risky event and message; returns the number of documents"""
+
+    # transcript maintenance (db_utils/text_codec.py)
+
+    @abc.abstractmethod
+    async def read_transcripts(self, table: str, key: str, column: str, after: Optional[int], limit: int) -> list[dict]:
+        """Up to `limit` rows of {key, column} with key > after, by key, as stored"""
+
+    @abc.abstractmethod
+    async def update_transcripts(self, table: str, key: str, column: str, rows: list[dict]) -> None:
+        """Set `column` of each row, found by `key`, to the given stored value"""
+
+    @staticmethod
+    def _check_transcript_column(table: str, key: str, column: str) -> None:
+        if (table, key, column) not in TRANSCRIPT_COLUMNS:
+            raise ValueError(f"Not a transcript column: {table}.{column}")
+
+    # ID allocation
+
+    async def generate_chatbot_id(self, platform: str) -> int:
+        """Generate new chatbot ID"""
+        try:
+            return await self.id_allocator.anext_id("chatbots")
+        except Exception as e:
+            print(f"Error generating chatbot ID: {str(e)}")
+            raise Exception(f"Error generating chatbot ID: {str(e)}")
+
+    async def generate_conversation_id(self, child_user_id: int) -> int:
+        """Allocate the next conversation ID from this worker's reserved block"""
+        try:
+            return await self.id_allocator.anext_id("conversations")
+        except Exception as e:
+            print(f"Error generating conversation ID: {str(e)}")
+            raise Exception(f"Error generating conversation ID: {str(e)}")
+
+    async def generate_risk_event_id(self, child_user_id: int) -> int:
+        """Allocate the next risk event ID from this worker's reserved block"""
+        try:
+            return await self.id_allocator.anext_id("risky_events_log")
+        except Exception as e:
+            print(f"Error generating risk event ID: {str(e)}")
+            raise Exception(f"Error generating risk event ID: {str(e)}")
+
+    async def generate_message_id(self, child_user_id: int) -> int:
+        """Allocate the next message ID from this worker's reserved block"""
+        try:
+            return await self.id_allocator.anext_id("messages")
+        except Exception as e:
+            print(f"Error generating message ID: {str(e)}")
+            raise Exception(f"Error generating message ID: {str(e)}")
+
+    # paging
+
+    async def iter_risky_events(self, user_id: str, page_size: int = 200, **filters) -> AsyncIterator[list]:
+        """Stream every matching enriched risky event page by page, without materializing the table."""
+        cursor = None
+        while True:
+            page = await self.read_risky_events_page(user_id, limit=page_size, cursor=cursor, **filters)
+            if page["items"]:
+                yield page["items"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    async def iter_conversations(self, user_id: str, page_size: int = 200, **filters) -> AsyncIterator[list]:
+        """Stream every matching enriched conversation page by page."""
+        cursor = None
+        while True:
+            page = await self.get_conversations_page(user_id, limit=page_size, cursor=cursor, **filters)
+            if page["items"]:
+                yield page["items"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _child_filter(child_user_ids: list, child_user_id) -> list:
+        if child_user_id is None:
+            return child_user_ids
+        return [child for child in child_user_ids if str(child) == str(child_user_id)]
+
+    # message deduplication
+
+    async def claim_message(self, message_details: dict) -> Optional[int]:
+        """
+        Check a message against the dedup index before it is written. Returns
+        the message_id already stored with the same text in the conversation,
+        or None after recording this message (allocating its message_id if
+        needed) so later repeats map onto it. Marks claimed details with their
+        content_hash, so a queued message is not checked again when written.
+        """
+        text = message_details.get('message_text')
+        if self.message_dedup is None or not text or message_details.get('content_hash'):
+            return None
+        digest = content_hash(text)
+        existing = self.message_dedup.lookup(message_details.get('conversation_id'), digest)
+        if existing is not None:
+            return existing
+        if message_details.get('message_id') is None:
+            message_details['message_id'] = await self.id_allocator.anext_id("messages")
+        self.message_dedup.add(message_details.get('conversation_id'), digest, message_details['message_id'])
+        message_details['content_hash'] = digest
+        return None
+
+    def release_message_claims(self, message_details_list: list[dict]) -> None:
+        """Undo claim_message for messages that were not stored after all"""
+        if self.message_dedup is not None:
+            for details in message_details_list:
+                if details.get('content_hash'):
+                    self.message_dedup.discard(details.get('conversation_id'), details['content_hash'])
+
+    @staticmethod
+    def _duplicate_message(message_details: dict, message_id: int) -> dict:
+        return {"message_id": message_id, "conversation_id": message_details.get('conversation_id'), "duplicate": True}
+
+    def _message_rows(self, message_details_list: list[dict]) -> list[dict]:
+        rows = [self._message_row(details) for details in message_details_list]
+        if self.message_dedup_persistent:
+            for row, details in zip(rows, message_details_list):
+                row["content_hash"] = details.get('content_hash') or (
+                    content_hash(details['message_text']) if details.get('message_text') else None
+                )
+        return rows
+
+    # search documents, built from what was just written (message texts before compression)
+
+    @staticmethod
+    def _search_document(kind: str, doc_id, conversation_id, child_user_id, timestamp, *texts) -> Optional[dict]:
+        content = "\n".join(text if isinstance(text, str) else json.dumps(text) for text in texts if text)
+        if doc_id is None or not content:
+            return None
+        return {
+            "kind": kind, "doc_id": doc_id, "conversation_id": conversation_id,
+            "child_user_id": child_user_id, "timestamp": timestamp, "content": content,
+        }
+
+    def _message_documents(self, message_details_list: list[dict], rows: list[Optional[dict]]) -> list[dict]:
+        """Documents of the messages stored as `rows` (None or duplicates for those that were not)."""
+        documents = [
+            self._search_document(
+                "message", row.get("message_id"), row.get("conversation_id"), None, row.get("timestamp"), details.get('message_text'),
+            )
+            for details, row in zip(message_details_list, rows)
+            if row and not row.get("duplicate")
+        ]
+        return [document for document in documents if document]
+
+    def _conversation_documents(self, rows: list[dict]) -> list[dict]:
+        # the placeholders _conversation_row stores before the model has named the conversation are not indexed
+        documents = [
+            self._search_document(
+                "conversation", row.get("conversation_id"), row.get("conversation_id"), row.get("child_user_id"),
+                row.get("end_time") or row.get("start_time"),
+                *(row.get(column) for column in ("conversationTopic", "conversationSummary") if row.get(column) not in SEARCH_PLACEHOLDERS),
+            )
+            for row in rows
+        ]
+        return [document for document in documents if document]
+
+    def _risky_event_documents(self, rows: list[dict]) -> list[dict]:
+        documents = [
+            self._search_document(
+                "risky_event", row.get("risky_event_id"), row.get("conversation_id"), row.get("child_user_id"),
+                row.get("timestamp"), row.get("riskType"), row.get("riskyReason"),
+            )
+            for row in rows
+        ]
+        return [document for document in documents if document]
+
+    @staticmethod
+    def _search_result(row: dict) -> dict:
+        return {
+            "kind": row["kind"], "id": row["doc_id"], "conversation_id": row.get("conversation_id"),
+            "child_user_id": row.get("child_user_id"), "timestamp": row.get("timestamp"),
+            "snippet": row.get("snippet"), "score": row.get("score"),
+        }
+
+    # row and response shapes
+
+    def _enrich_risky_event(self, event: dict, conversation: dict, chatbot: dict, username: Optional[str] = None, detail: bool = False) -> dict:
+        """
+        A risky event as the dashboard shows it. Listings carry the child's
+        `username` and a capitalized riskLevel; the single event of
+        get_risky_event_by_id (`detail`) keeps riskLevel as stored and adds
+        the alert's `messages` when they were selected.
+        """
+        enriched = {} if detail else {"username": username}
+        enriched.update({
+            "riskyEvent_id": event.get("risky_event_id"),
+            "conversation_id": event["conversation_id"],
+            "conversationTopics": conversation.get("conversationTopic", []),
+            "conversationSummarization": conversation.get("conversationSummary", "No summarization available"),
+            "riskType": event.get("riskType", "Unknown Risk"),
+            "riskLevel": event.get("riskLevel", "Unknown") if detail else event.get("riskLevel", "Unknown").capitalize(),
+            "riskyReason": event.get("riskyReason", "No reason provided"),
+            "timestamp": event.get("timestamp", "Unknown timestamp"),
+            "chatbotPlatform": chatbot.get("chatbotPlatform", "Unknown Platform"),
+            "chatbotDescription": chatbot.get("name", "Unknown Chatbot"),
+        })
+        if detail and "messages" in event:
+            # selected only on request; decompressed here
+            enriched["messages"] = self._decode_alert_messages(event["messages"])
+        return enriched
+
+    @staticmethod
+    def _enrich_conversation(conversation: dict, chatbot: dict) -> dict:
+        return {
+            "conversation_id": conversation.get("conversation_id"),
+            "start_time": conversation.get("start_time"),
+            "end_time": conversation.get("end_time"),
+            "conversationTopics": conversation.get("conversationTopic", []),
+            "conversationSummarization": conversation.get("conversationSummary", "No summarization available"),
+            "chatbotPlatform": chatbot.get("chatbotPlatform", "Unknown Platform"),
+            "chatbotDescription": chatbot.get("name", "Unknown Chatbot"),
+        }
+
+    def _decode_alert_messages(self, stored: Optional[str]):
+        """The `messages` an alert was written with (stored as JSON, possibly compressed)"""
+        text = self.text_codec.decode(stored)
+        if text is None:
+            return None
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    @staticmethod
+    def _conversation_row(conversation_details: dict) -> dict:
+        return {
+            "conversation_id": conversation_details.get('conversation_id'),
+            "child_user_id": conversation_details.get('child_user_id'),
+            "chatbot_id": conversation_details.get('chatbot_id'),
+            "start_time": conversation_details.get('start_time'),
+            "end_time": conversation_details.get('end_time'),
+            "conversationTopic": conversation_details.get('conversation_topic', 'unknown'),
+            "conversationSummary": conversation_details.get('conversation_summary', 'No summary available'),
+            # Store messages as JSON string if needed
+            # "messages": json.dumps(conversation_details.get('messages', [])) if conversation_details.get('messages') else None,
+            "platform": conversation_details.get('platform', 'unknown')
+        }
+
+    def _alert_row(self, alert_details: dict) -> dict:
+        return {
+            "risky_event_id": alert_details.get('risk_event_id'),
+            "conversation_id": alert_details.get('conversation_id'),
+            "child_user_id": alert_details.get('child_user_id'),
+            "riskLevel": alert_details.get('riskLevel'),
+            "riskType": alert_details.get('riskType'),
+            "riskyReason": alert_details.get('riskyReason'),
+            "timestamp": alert_details.get('timestamp', datetime.now().isoformat()),
+            "messages": self.text_codec.encode(json.dumps(alert_details['messages'])) if alert_details.get('messages') else None
+        }
+
+    def _message_row(self, message_details: dict) -> dict:
+        return {
+            "message_id": message_details.get('message_id'),
+            "conversation_id": message_details.get('conversation_id'),
+            "sender": message_details.get('sender'),
+            "message_text": self.text_codec.encode(message_details.get('message_text')),
+            "timestamp": message_details.get('timestamp', datetime.now().isoformat()),
+            "sender_type": message_details.get('sender_type', 'unknown')
+        }
+
+
+def build_storage_backend() -> StorageBackend:
+    """The storage backend configured in settings ("supabase" or "sqlite")."""
+    if app_settings.storage_backend == "sqlite":
+        from db_utils.sqlite_rds import SQLiteRDSClient
+        return SQLiteRDSClient(app_settings.storage_sqlite_path)
+    if app_settings.storage_backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {app_settings.storage_backend}")
+    from db_utils.supabase_rds_async import AsyncRDSClient
+    return AsyncRDSClient()
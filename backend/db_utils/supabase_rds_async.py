@@ -0,0 +1,1103 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional, Sequence
+
+import json
+
+from postgrest import APIError
+from supabase import AsyncClient
+
+from settings import app_settings
+from app.services.metrics import instrument_postgrest
+from db_utils.id_allocator import build_id_allocator
+from db_utils.query_plan import QueryPlan
+from db_utils.storage_backend import (
+    CHATBOT_DERIVED_FIELDS, CONVERSATION_DERIVED_FIELDS, CONVERSATION_FIELDS, CONVERSATION_PATCH_COLUMNS,
+    RISKY_EVENT_FIELDS, SEARCH_KINDS, Singleton, StorageBackend, decode_cursor, encode_cursor,
+)
+
+supabase_url: str = app_settings.supabase_url
+supabase_service_key: str = app_settings.supabase_service_key
+
+RISKY_EVENT_COLUMNS = "risky_event_id, timestamp, riskType, riskLevel, riskyReason, conversation_id"
+CONVERSATION_COLUMNS = "conversation_id, chatbot_id, child_user_id, start_time, end_time, conversationTopic, conversationSummary"
+CHATBOT_COLUMNS = "chatbot_id, name, chatbotPlatform"
+
+# PostgREST errors for embedded selects whose relationship is not in the schema cache
+EMBEDDING_ERROR_CODES = ("PGRST200", "PGRST201")
+
+
+class AsyncRDSClient(StorageBackend, metaclass=Singleton):
+    """
+    Async Supabase Client.
+
+    Every method is a coroutine backed by the async PostgREST client, so a
+    slow query only suspends the calling request. All requests of a worker
+    share the PostgREST client's httpx connection pool.
+    """
+
+    def __init__(self) -> None:
+        print("Initializing async Supabase Client...")
+        start = time.time()
+
+        self.client: AsyncClient = AsyncClient(supabase_url, supabase_service_key)
+        # per-table PostgREST timings, row counts and bytes for /metrics
+        instrument_postgrest(self.client.postgrest.session)
+        super().__init__(build_id_allocator(self.client))
+        # collapse join chains into embedded-resource selects while the schema allows it
+        self.embedded_joins: bool = app_settings.supabase_embedded_joins
+
+        end = time.time()
+        print(f"Async Supabase Client initialized in {end - start} seconds.")
+
+    async def aclose(self):
+        """Close the pooled HTTP connections."""
+        await self.client.postgrest.aclose()
+
+    async def verify_child_user(self, child_user_id: int) -> bool:
+        """Verify that a child user exists"""
+        try:
+            response = await self.client.from_("users").select("user_id").eq("user_id", child_user_id).eq("role", "child").execute()
+            return len(response.data) > 0
+        except Exception as e:
+            print(f"Error verifying child user: {str(e)}")
+            raise Exception(f"Error verifying child user: {str(e)}")
+
+    async def create_user_settings(self, user_id: str, quota_limit: int = 50):
+        """
+        Create a new user settings in the database, table user_settings.
+        """
+        try:
+            await self.client.table("user_settings").insert({"user_id": user_id, "quota_limit": quota_limit, "last_updated": datetime.now().isoformat()}).execute()
+            return True
+        except Exception as e:
+            raise Exception("Error when creating new user settings: " + str(e))
+
+    async def get_user_quota(self, user_id: str):
+        """
+        Get the user's quota from the database, table user_settings.
+        If the user does not exist in the database, create a new user with default quota. 
+        """
+        try:
+            # first check if the user exists in the database
+            response = await self.client.table("user_settings").select("*").eq("user_id", user_id).execute()
+            if len(response.data) > 0:
+                return response.data[0]["quota_limit"]
+            else:
+                # Create a new user with default quota
+                await self.create_user_settings(user_id, 50)
+                return 50
+        except Exception as e:
+            raise Exception("Error when getting user quota: " + str(e))
+        
+    async def get_conversation_times(self, user_id: str):
+        """
+        Get the start_time and end_time for each conversation associated with the user's child accounts.
+        """
+        try:
+            # Step 1: Get child user IDs associated with the parent
+            response = await self.client.from_("parent_child_relations").select("child_user_id").eq("parent_user_id", user_id).execute()
+            child_user_ids = [child["child_user_id"] for child in response.data]
+
+            if not child_user_ids:
+                return []  # No child users found, return empty list
+
+            # Step 2: Fetch conversations for the child user IDs
+            response = await self.client.from_("conversations").select(
+                "conversation_id, start_time, end_time"
+            ).in_("child_user_id", child_user_ids).execute()
+            conversations = response.data
+
+            # Transform the result to a simple list of conversation times
+            conversation_times = [
+                {
+                    "conversation_id": conversation["conversation_id"],
+                    "start_time": conversation.get("start_time", "Unknown start time"),
+                    "end_time": conversation.get("end_time", "Unknown end time"),
+                }
+                for conversation in conversations
+            ]
+
+            return conversation_times
+
+        except Exception as e:
+            raise Exception("Error when fetching conversation times: " + str(e))
+
+
+    async def update_user_quota(self, user_id: str, quota_limit: int):
+        """
+        Update the user's quota in the database, table user_settings.
+        """
+        try:    
+            await self.client.table("user_settings").update({"quota_limit": quota_limit, "last_updated": datetime.now().isoformat()}).eq("user_id", user_id).execute()
+            return True
+        except Exception as e:
+            raise Exception("Error when updating user quota: " + str(e))
+    
+    async def get_all_user_email_newsletter_subscribed(self) -> list[dict]:
+        try:
+            response = await self.client.from_("user_settings_with_email").select("user_id, email").eq("is_newsletter_subscribed", True).execute()
+            return response.data
+        except Exception as e:
+            raise Exception("Error when getting user email newsletter subscription: " + str(e))
+        
+    async def _child_user_ids(self, plan: QueryPlan, user_id: str) -> list:
+        response = await plan.step("children", self.client.from_("parent_child_relations").select("child_user_id").eq("parent_user_id", user_id).execute())
+        return [child["child_user_id"] for child in response.data]
+
+    def _embedding_unavailable(self, e: Exception) -> bool:
+        """
+        True if PostgREST rejected an embedded select because the foreign key it
+        needs is missing; embedding is then disabled and callers fall back to
+        separate lookups.
+        """
+        if isinstance(e, APIError) and e.code in EMBEDDING_ERROR_CODES:
+            print(f"Embedded selects unavailable, falling back to separate queries: {e.message}")
+            self.embedded_joins = False
+            return True
+        return False
+
+    async def read_all_conversations(self, user_id: str):
+        """
+        Read all conversations with their associated risky events and transform them into the desired structure.
+
+        Round-trips: child IDs, then risky events (with their conversation and
+        chatbot embedded) together with the children's usernames.
+        """
+        try:
+            plan = QueryPlan("read_all_conversations")
+
+            # Step 1: Get child user IDs associated with the parent
+            child_user_ids = await self._child_user_ids(plan, user_id)
+
+            if not child_user_ids:
+                return []  # No child users found, return empty list
+
+            def users_query():
+                return self.client.from_("users").select("user_id, username").in_("user_id", child_user_ids).execute()
+
+            if self.embedded_joins:
+                try:
+                    # Step 2: risky events joined to conversations and chatbots, alongside the usernames
+                    results = await plan.gather(
+                        risky_events=self.client.from_("risky_events_log").select(
+                            f"{RISKY_EVENT_COLUMNS}, child_user_id, conversations({CONVERSATION_COLUMNS}, chatbots({CHATBOT_COLUMNS}))"
+                        ).in_("child_user_id", child_user_ids).execute(),
+                        users=users_query(),
+                    )
+                    risky_events = results["risky_events"].data
+                    conversations = {}
+                    chatbot_info = {}
+                    for event in risky_events:
+                        conversation = event.pop("conversations", None)
+                        if conversation and conversation["child_user_id"] in child_user_ids:
+                            chatbot = conversation.pop("chatbots", None)
+                            conversations[conversation["conversation_id"]] = conversation
+                            if chatbot:
+                                chatbot_info[chatbot["chatbot_id"]] = chatbot
+                    user_info = {user["user_id"]: user["username"] for user in results["users"].data}
+                    return self._build_enriched_conversations(risky_events, conversations, chatbot_info, user_info)
+                except APIError as e:
+                    if not self._embedding_unavailable(e):
+                        raise
+
+            # Step 2: risky events and usernames only depend on the child IDs
+            results = await plan.gather(
+                risky_events=self.client.from_("risky_events_log").select(
+                    f"{RISKY_EVENT_COLUMNS}, child_user_id"
+                ).in_("child_user_id", child_user_ids).execute(),
+                users=users_query(),
+            )
+            risky_events = results["risky_events"].data
+            user_info = {user["user_id"]: user["username"] for user in results["users"].data}
+
+            # Filter risky events for conversations associated with the child user IDs
+            risky_event_conversation_ids = [event["conversation_id"] for event in risky_events]
+
+            # Step 3: Fetch conversations matching the risky event conversation IDs
+            response = await plan.step("conversations", self.client.from_("conversations").select(
+                CONVERSATION_COLUMNS
+            ).in_("conversation_id", risky_event_conversation_ids).in_("child_user_id", child_user_ids).execute())
+            conversations = {conv["conversation_id"]: conv for conv in response.data}
+
+            if not conversations:
+                return []  # No matching conversations found, return empty list
+
+            # Step 4: Get chatbot details for the chatbot IDs
+            chatbot_ids = {conv["chatbot_id"] for conv in conversations.values()}
+            response = await plan.step("chatbots", self.client.from_("chatbots").select(CHATBOT_COLUMNS).in_("chatbot_id", list(chatbot_ids)).execute())
+            chatbot_info = {chatbot["chatbot_id"]: chatbot for chatbot in response.data}
+
+            return self._build_enriched_conversations(risky_events, conversations, chatbot_info, user_info)
+
+        except Exception as e:
+            raise Exception("Error when reading all conversations: " + str(e))
+
+    def _build_enriched_conversations(self, risky_events: list, conversations: dict, chatbot_info: dict, user_info: dict) -> list:
+        if not conversations:
+            return []  # No matching conversations found, return empty list
+
+        # Transform risky events into the required format
+        enriched_conversations = []
+        for event in risky_events:
+            conversation = conversations.get(event["conversation_id"], {})
+            chatbot = chatbot_info.get(conversation.get("chatbot_id"), {})
+            if (event.get("riskType").lower() != "no risk"):
+                enriched_conversations.append(self._enrich_risky_event(
+                    event, conversation, chatbot, user_info.get(event.get("child_user_id"), "Unknown User")
+                ))
+        return enriched_conversations
+
+
+    async def get_all_conversations(self, user_id: str):
+        """
+        Read all conversations and transform them into the desired structure.
+        """
+        try:
+            plan = QueryPlan("get_all_conversations")
+
+            # Step 1: Get child user IDs associated with the parent
+            child_user_ids = await self._child_user_ids(plan, user_id)
+
+            if not child_user_ids:
+                return []  # No child users found, return empty list
+
+            conversations = None
+            if self.embedded_joins:
+                try:
+                    # Step 2: conversations with their chatbot embedded
+                    response = await plan.step("conversations", self.client.from_("conversations").select(
+                        f"{CONVERSATION_COLUMNS}, chatbots({CHATBOT_COLUMNS})"
+                    ).in_("child_user_id", child_user_ids).execute())
+                    conversations = response.data
+                    chatbot_info = {}
+                    for conversation in conversations:
+                        chatbot = conversation.pop("chatbots", None)
+                        if chatbot:
+                            chatbot_info[chatbot["chatbot_id"]] = chatbot
+                except APIError as e:
+                    if not self._embedding_unavailable(e):
+                        raise
+
+            if conversations is None:
+                # Step 2: Get conversations linked to the child user IDs
+                response = await plan.step("conversations", self.client.from_("conversations").select(
+                    CONVERSATION_COLUMNS
+                ).in_("child_user_id", child_user_ids).execute())
+                conversations = response.data
+
+                if not conversations:
+                    return []  # No matching conversations found, return empty list
+
+                # Step 3: Get chatbot details for the chatbot IDs
+                chatbot_ids = {conv["chatbot_id"] for conv in conversations}
+                response = await plan.step("chatbots", self.client.from_("chatbots").select(CHATBOT_COLUMNS).in_("chatbot_id", list(chatbot_ids)).execute())
+                chatbot_info = {chatbot["chatbot_id"]: chatbot for chatbot in response.data}
+
+            # Step 4: Transform conversations into the required format
+            return [
+                self._enrich_conversation(conversation, chatbot_info.get(conversation.get("chatbot_id"), {}))
+                for conversation in conversations
+            ]
+
+        except Exception as e:
+            raise Exception("Error when reading all conversations: " + str(e))
+
+
+    async def _platform_chatbot_ids(self, plan: QueryPlan, platform: str) -> list:
+        response = await plan.step("platform_chatbots", self.client.from_("chatbots").select("chatbot_id").eq("chatbotPlatform", platform).execute())
+        return [chatbot["chatbot_id"] for chatbot in response.data]
+
+    async def read_risky_events_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+        risk_level: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        platform: Optional[str] = None,
+        fields: Sequence[str] = RISKY_EVENT_FIELDS,
+    ) -> dict:
+        """
+        One page of read_all_conversations, newest first.
+
+        Keyset pagination on (timestamp, risky_event_id): `cursor` is the
+        `next_cursor` of the previous page. Filters are applied by PostgREST,
+        and only the lookups needed for the requested `fields` are made.
+        Returns {"items": [...], "next_cursor": str or None}.
+        """
+        try:
+            plan = QueryPlan("read_risky_events_page")
+            child_user_ids = self._child_filter(await self._child_user_ids(plan, user_id), child_user_id)
+            if not child_user_ids:
+                return {"items": [], "next_cursor": None}
+
+            need_conversation = platform is not None or any(field in CONVERSATION_DERIVED_FIELDS for field in fields)
+            embed = need_conversation and self.embedded_joins
+
+            select = f"{RISKY_EVENT_COLUMNS}, child_user_id"
+            if embed:
+                # !inner drops events whose chatbot does not match the platform filter
+                inner = "!inner" if platform is not None else ""
+                select += f", conversations{inner}({CONVERSATION_COLUMNS}, chatbots{inner}({CHATBOT_COLUMNS}))"
+            query = self.client.from_("risky_events_log").select(select).in_("child_user_id", child_user_ids).not_.ilike("riskType", "no risk")
+            if risk_level is not None:
+                query = query.ilike("riskLevel", risk_level)
+            if start_time is not None:
+                query = query.gte("timestamp", start_time)
+            if end_time is not None:
+                query = query.lt("timestamp", end_time)
+            if platform is not None:
+                if embed:
+                    query = query.eq("conversations.chatbots.chatbotPlatform", platform)
+                else:
+                    chatbot_ids = await self._platform_chatbot_ids(plan, platform)
+                    response = await plan.step("platform_conversations", self.client.from_("conversations").select(
+                        "conversation_id"
+                    ).in_("child_user_id", child_user_ids).in_("chatbot_id", chatbot_ids).execute()) if chatbot_ids else None
+                    conversation_ids = [conv["conversation_id"] for conv in response.data] if response else []
+                    if not conversation_ids:
+                        return {"items": [], "next_cursor": None}
+                    query = query.in_("conversation_id", conversation_ids)
+            if cursor:
+                timestamp, risky_event_id = decode_cursor(cursor)  # only an ISO timestamp (or None) and an int get through
+                if timestamp is None:
+                    query = query.is_("timestamp", "null").lt("risky_event_id", int(risky_event_id))
+                else:
+                    query = query.or_(f'timestamp.lt."{timestamp}",and(timestamp.eq."{timestamp}",risky_event_id.lt.{int(risky_event_id)}),timestamp.is.null')
+            # events without a timestamp come last (order() has no nullslast flag, PostgREST reads it from the column)
+            query = query.order("timestamp.desc.nullslast").order("risky_event_id", desc=True).limit(limit)
+
+            queries = {"risky_events": query.execute()}
+            if "username" in fields:
+                queries["users"] = self.client.from_("users").select("user_id, username").in_("user_id", child_user_ids).execute()
+            try:
+                results = await plan.gather(**queries)
+            except APIError as e:
+                if embed and self._embedding_unavailable(e):
+                    return await self.read_risky_events_page(
+                        user_id, limit, cursor, child_user_id, risk_level, start_time, end_time, platform, fields
+                    )
+                raise
+            risky_events = results["risky_events"].data
+            user_info = {user["user_id"]: user["username"] for user in results["users"].data} if "users" in results else {}
+
+            conversations, chatbot_info = {}, {}
+            if embed:
+                for event in risky_events:
+                    conversation = event.pop("conversations", None)
+                    if conversation:
+                        chatbot = conversation.pop("chatbots", None)
+                        conversations[conversation["conversation_id"]] = conversation
+                        if chatbot:
+                            chatbot_info[chatbot["chatbot_id"]] = chatbot
+            elif need_conversation and risky_events:
+                response = await plan.step("conversations", self.client.from_("conversations").select(
+                    CONVERSATION_COLUMNS
+                ).in_("conversation_id", list({event["conversation_id"] for event in risky_events})).execute())
+                conversations = {conv["conversation_id"]: conv for conv in response.data}
+                chatbot_ids = list({conv["chatbot_id"] for conv in conversations.values()})
+                if chatbot_ids and any(field in CHATBOT_DERIVED_FIELDS for field in fields):
+                    response = await plan.step("chatbots", self.client.from_("chatbots").select(CHATBOT_COLUMNS).in_("chatbot_id", chatbot_ids).execute())
+                    chatbot_info = {chatbot["chatbot_id"]: chatbot for chatbot in response.data}
+
+            items = []
+            for event in risky_events:
+                conversation = conversations.get(event["conversation_id"], {})
+                chatbot = chatbot_info.get(conversation.get("chatbot_id"), {})
+                enriched = self._enrich_risky_event(event, conversation, chatbot, user_info.get(event.get("child_user_id"), "Unknown User"))
+                items.append({field: enriched[field] for field in fields})
+
+            next_cursor = None
+            if len(risky_events) == limit:
+                last = risky_events[-1]
+                next_cursor = encode_cursor(last["timestamp"], last["risky_event_id"])
+            return {"items": items, "next_cursor": next_cursor}
+
+        except Exception as e:
+            raise Exception("Error when reading risky events page: " + str(e))
+
+    async def get_conversations_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        platform: Optional[str] = None,
+        fields: Sequence[str] = CONVERSATION_FIELDS,
+    ) -> dict:
+        """
+        One page of get_all_conversations, newest first, with keyset
+        pagination on (start_time, conversation_id).
+        Returns {"items": [...], "next_cursor": str or None}.
+        """
+        try:
+            plan = QueryPlan("get_conversations_page")
+            child_user_ids = self._child_filter(await self._child_user_ids(plan, user_id), child_user_id)
+            if not child_user_ids:
+                return {"items": [], "next_cursor": None}
+
+            need_chatbot = platform is not None or any(field in CHATBOT_DERIVED_FIELDS for field in fields)
+            embed = need_chatbot and self.embedded_joins
+
+            select = CONVERSATION_COLUMNS
+            if embed:
+                select += f", chatbots{'!inner' if platform is not None else ''}({CHATBOT_COLUMNS})"
+            query = self.client.from_("conversations").select(select).in_("child_user_id", child_user_ids)
+            if start_time is not None:
+                query = query.gte("start_time", start_time)
+            if end_time is not None:
+                query = query.lt("start_time", end_time)
+            if platform is not None:
+                if embed:
+                    query = query.eq("chatbots.chatbotPlatform", platform)
+                else:
+                    chatbot_ids = await self._platform_chatbot_ids(plan, platform)
+                    if not chatbot_ids:
+                        return {"items": [], "next_cursor": None}
+                    query = query.in_("chatbot_id", chatbot_ids)
+            if cursor:
+                start, conversation_id = decode_cursor(cursor)  # only an ISO timestamp (or None) and an int get through
+                if start is None:
+                    query = query.is_("start_time", "null").lt("conversation_id", int(conversation_id))
+                else:
+                    query = query.or_(f'start_time.lt."{start}",and(start_time.eq."{start}",conversation_id.lt.{int(conversation_id)}),start_time.is.null')
+            # conversations without a start time come last, as in read_risky_events_page
+            query = query.order("start_time.desc.nullslast").order("conversation_id", desc=True).limit(limit)
+
+            try:
+                response = await plan.step("conversations", query.execute())
+            except APIError as e:
+                if embed and self._embedding_unavailable(e):
+                    return await self.get_conversations_page(user_id, limit, cursor, child_user_id, start_time, end_time, platform, fields)
+                raise
+            conversations = response.data
+
+            chatbot_info = {}
+            if embed:
+                for conversation in conversations:
+                    chatbot = conversation.pop("chatbots", None)
+                    if chatbot:
+                        chatbot_info[chatbot["chatbot_id"]] = chatbot
+            elif need_chatbot and conversations:
+                chatbot_ids = list({conv["chatbot_id"] for conv in conversations})
+                response = await plan.step("chatbots", self.client.from_("chatbots").select(CHATBOT_COLUMNS).in_("chatbot_id", chatbot_ids).execute())
+                chatbot_info = {chatbot["chatbot_id"]: chatbot for chatbot in response.data}
+
+            items = []
+            for conversation in conversations:
+                chatbot = chatbot_info.get(conversation.get("chatbot_id"), {})
+                enriched = self._enrich_conversation(conversation, chatbot)
+                items.append({field: enriched[field] for field in fields})
+
+            next_cursor = None
+            if len(conversations) == limit:
+                last = conversations[-1]
+                next_cursor = encode_cursor(last["start_time"], last["conversation_id"])
+            return {"items": items, "next_cursor": next_cursor}
+
+        except Exception as e:
+            raise Exception("Error when reading conversations page: " + str(e))
+
+    async def _owns_event(self, plan: QueryPlan, user_id: Optional[str], risky_event: dict, conversation: dict) -> bool:
+        if user_id is None:
+            return True
+        child_user_id = risky_event.get("child_user_id") or conversation.get("child_user_id")
+        return child_user_id is not None and str(child_user_id) in {str(child) for child in await self._child_user_ids(plan, user_id)}
+
+    async def get_risky_event_by_id(self, riskyEvent_id: int, include_messages: bool = False, user_id: Optional[str] = None):
+        try:
+            plan = QueryPlan("get_risky_event_by_id")
+            # the transcript is the bulk of the row; only fetched when asked for
+            event_columns = f"{RISKY_EVENT_COLUMNS}, child_user_id" + (", messages" if include_messages else "")
+
+            if self.embedded_joins:
+                try:
+                    # Single round-trip: the event with its conversation and chatbot embedded
+                    response = await plan.step("risky_event", self.client.from_("risky_events_log").select(
+                        f"{event_columns}, conversations({CONVERSATION_COLUMNS}, chatbots({CHATBOT_COLUMNS}))"
+                    ).eq("risky_event_id", riskyEvent_id).execute())
+
+                    if not response.data:
+                        return None  # No risky event found with the given ID
+
+                    risky_event = response.data[0]
+                    conversation = risky_event.pop("conversations", None)
+                    if not conversation:
+                        return None  # No conversation found with the given ID
+                    chatbot = conversation.pop("chatbots", None)
+                    if not chatbot:
+                        return None  # No chatbot found with the given ID
+                    if not await self._owns_event(plan, user_id, risky_event, conversation):
+                        return None  # Another parent's child
+                    return self._enrich_risky_event(risky_event, conversation, chatbot, detail=True)
+                except APIError as e:
+                    if not self._embedding_unavailable(e):
+                        raise
+
+            # Step 1: Get the specific risky event by riskyEvent_id
+            response = await plan.step("risky_event", self.client.from_("risky_events_log").select(
+                event_columns
+            ).eq("risky_event_id", riskyEvent_id).execute())
+            
+            if not response.data:
+                return None  # No risky event found with the given ID
+
+            risky_event = response.data[0]
+
+            # Step 2: Fetch the conversation associated with the risky event
+            conversation_id = risky_event["conversation_id"]
+            response = await plan.step("conversation", self.client.from_("conversations").select(
+                CONVERSATION_COLUMNS
+            ).eq("conversation_id", conversation_id).execute())
+
+            if not response.data:
+                return None  # No conversation found with the given ID
+
+            conversation = response.data[0]
+            if not await self._owns_event(plan, user_id, risky_event, conversation):
+                return None  # Another parent's child
+
+            # Step 3: Get the chatbot details associated with the conversation
+            chatbot_id = conversation["chatbot_id"]
+            response = await plan.step("chatbot", self.client.from_("chatbots").select(
+                CHATBOT_COLUMNS
+            ).eq("chatbot_id", chatbot_id).execute())
+
+            if not response.data:
+                return None  # No chatbot found with the given ID
+
+            chatbot = response.data[0]
+
+            return self._enrich_risky_event(risky_event, conversation, chatbot, detail=True)
+
+        except Exception as e:
+            raise Exception("Error when reading the risky event: " + str(e))
+
+    async def write_conversation(self, conversation_details: dict):
+        """
+        Write conversation data to the conversations table
+        Expected conversation_details structure:
+        {
+            'conversation_id': int,
+            'child_user_id': int,
+            'chatbot_id': int,
+            'start_time': str,
+            'end_time': str,
+            'conversation_topic': str,
+            'conversation_summary': str,
+            # 'messages': List[dict],
+            'platform': str
+        }
+        """
+        try:
+            conversation_data = self._conversation_row(conversation_details)
+
+            response = await self.client.table("conversations").insert(conversation_data).execute()
+            
+            if not response.data:
+                raise Exception("No data returned from conversation insert")
+
+            await self.index_search_documents(self._conversation_documents(response.data))
+            return response.data[0]
+            
+        except Exception as e:
+            print(f"Error writing conversation to database: {str(e)}")
+            raise Exception(f"Error writing conversation to database: {str(e)}")
+    
+    async def update_conversation(self, conversation_id: int, conversation_details: dict) -> Optional[dict]:
+        """
+        Patch the fields of a conversation that change as it grows (end_time,
+        topic, summary) in one round-trip. Returns the updated row, or None if
+        the conversation does not exist yet.
+        """
+        try:
+            patch = {
+                column: conversation_details[key]
+                for key, column in CONVERSATION_PATCH_COLUMNS.items()
+                if conversation_details.get(key) is not None
+            }
+            # a retried or repeated update this worker already applied skips the database
+            digest = self.conversation_cache.digest(patch)
+            if patch and self.conversation_cache.seen(conversation_id, digest):
+                return {"conversation_id": conversation_id, **patch}
+
+            if patch:
+                response = await self.client.table("conversations").update(patch).eq("conversation_id", conversation_id).execute()
+            else:
+                response = await self.client.table("conversations").select("conversation_id, child_user_id").eq("conversation_id", conversation_id).execute()
+            if not response.data:
+                self.conversation_cache.forget(conversation_id)
+                return None
+
+            if patch:
+                self.conversation_cache.remember(conversation_id, digest)
+                await self.index_search_documents(self._conversation_documents(response.data))
+            return response.data[0]
+
+        except Exception as e:
+            print(f"Error updating conversation in database: {str(e)}")
+            raise Exception(f"Error updating conversation in database: {str(e)}")
+
+    async def write_alert(self, alert_details: dict):
+        """
+        Write alert data to the risky_events_log table
+        Expected alert_details structure:
+        {
+            'risk_event_id': int,
+            'conversation_id': int,
+            'child_user_id': int,
+            'riskLevel': str,
+            'riskType': str,
+            'riskyReason': str,
+            'timestamp': str,
+            'messages': List[dict]  # Recent chat messages
+        }
+        """
+        try:
+            alert_data = self._alert_row(alert_details)
+
+            response = await self.client.table("risky_events_log").insert(alert_data).execute()
+            
+            if not response.data:
+                raise Exception("No data returned from alert insert")
+
+            await self.increment_risk_summary([response.data[0].get("risky_event_id")])
+            await self.index_search_documents(self._risky_event_documents(response.data))
+            return response.data[0]
+            
+        except Exception as e:
+            print(f"Error writing alert to database: {str(e)}")
+            raise Exception(f"Error writing alert to database: {str(e)}")
+        
+    async def _write_message_rows(self, rows: list[dict]) -> list[dict]:
+        if not self.message_dedup_persistent:
+            return await self._bulk_upsert("messages", rows, "message_id")
+        # rows whose text the conversation already has are skipped by the unique index (and not returned)
+        response = await self.client.table("messages").upsert(
+            rows, on_conflict="conversation_id,content_hash", ignore_duplicates=True, default_to_null=False,
+        ).execute()
+        return response.data
+
+    async def write_message(self, message_details: dict):
+        """
+        Write message data to the messages table
+        Expected message_details structure:
+        {
+            'message_id': int,
+            'conversation_id': int,
+            'sender': str,
+            'message_text': str,
+            'timestamp': str,
+            'sender_type': str
+        }
+        A message whose text the conversation already has is not written;
+        the stored message is returned with "duplicate": True.
+        """
+        try:
+            duplicate_of = await self.claim_message(message_details)
+            if duplicate_of is not None:
+                return self._duplicate_message(message_details, duplicate_of)
+
+            if self.message_dedup_persistent:
+                rows = await self._write_message_rows(self._message_rows([message_details]))
+                await self.index_search_documents(self._message_documents([message_details], rows))
+                return rows[0] if rows else self._duplicate_message(message_details, None)
+
+            message_data = self._message_row(message_details)
+
+            response = await self.client.table("messages").insert(message_data).execute()
+            
+            if not response.data:
+                raise Exception("No data returned from message insert")
+
+            await self.index_search_documents(self._message_documents([message_details], response.data))
+            return response.data[0]
+            
+        except Exception as e:
+            self.release_message_claims([message_details])
+            print(f"Error writing message to database: {str(e)}")
+            raise Exception(f"Error writing message to database: {str(e)}")
+
+    async def get_user_by_auth_id(self, auth_user_id: str) -> Optional[dict]:
+        """user_id and role of the app user linked to a Supabase auth user (see auth_users.sql), or None"""
+        try:
+            response = await self.client.from_("users").select("user_id, role").eq("auth_user_id", auth_user_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            raise Exception("Error when getting user by auth ID: " + str(e))
+
+    async def get_parent_user_ids(self, child_user_ids: list) -> list:
+        """Parents of any of the given children"""
+        try:
+            response = await self.client.from_("parent_child_relations").select("parent_user_id").in_("child_user_id", child_user_ids).execute()
+            return [relation["parent_user_id"] for relation in response.data]
+        except Exception as e:
+            raise Exception("Error when getting parent user IDs: " + str(e))
+
+    async def get_parent_child_relations(self, child_user_ids: list) -> list:
+        """(parent_user_id, child_user_id) rows for the given children"""
+        try:
+            response = await self.client.from_("parent_child_relations").select("parent_user_id, child_user_id").in_("child_user_id", child_user_ids).execute()
+            return response.data
+        except Exception as e:
+            raise Exception("Error when getting parent child relations: " + str(e))
+
+    async def get_user_emails(self, user_ids: list) -> dict:
+        """user_id -> email for the given users"""
+        try:
+            response = await self.client.from_("user_settings_with_email").select("user_id, email").in_("user_id", user_ids).execute()
+            return {row["user_id"]: row["email"] for row in response.data if row.get("email")}
+        except Exception as e:
+            raise Exception("Error when getting user emails: " + str(e))
+
+    async def get_usernames(self, user_ids: list) -> dict:
+        """user_id -> username for the given users"""
+        try:
+            response = await self.client.from_("users").select("user_id, username").in_("user_id", user_ids).execute()
+            return {row["user_id"]: row["username"] for row in response.data}
+        except Exception as e:
+            raise Exception("Error when getting usernames: " + str(e))
+
+    async def get_all_children(self, user_id: str):
+        try:
+            # response = self.client.from_("parent_child_relations").select("child_user_id").eq("parent_user_id", user_id).execute()
+            response = await self.client.from_("parent_child_relations").select("""*, users:parent_user_id (username, role, user_age), children:child_user_id (username, role, user_age)""").eq("parent_user_id", user_id).execute()
+            return response.data
+        except Exception as e:
+            raise Exception("Error when getting all children: " + str(e))
+        
+    async def add_child(self, parent_user_id: str, child_name: str, child_age: int):
+        try:
+            response = await self.client.from_("users").insert({"username": child_name, "role": "child", "user_age": child_age}).execute()
+            child_user_id = response.data[0]["user_id"]
+            await self.client.from_("parent_child_relations").insert({"parent_user_id": parent_user_id, "child_user_id": child_user_id}).execute()
+            return True
+        except Exception as e:
+            raise Exception("Error when adding child: " + str(e))
+        
+    async def remove_child(self, parent_user_id: str, child_user_id: str):
+        try:
+            await self.client.from_("parent_child_relations").delete().eq("parent_user_id", parent_user_id).eq("child_user_id", child_user_id).execute()
+            return True
+        except Exception as e:
+            raise Exception("Error when removing child: " + str(e))
+
+    async def rename_child(self, child_user_id: str, new_name: str):
+        try:
+            await self.client.from_("users").update({"username": new_name}).eq("user_id", child_user_id).execute()
+            return True
+        except Exception as e:
+            raise Exception("Error when renaming child: " + str(e))
+
+    async def write_chatbot(self, chatbot_data: dict):
+        """
+        Write chatbot data to the chatbots table
+        Expected chatbot_data structure:
+        {
+            'chatbot_id': int,
+            'name': str,
+            'metadata': str,  # JSON string
+            'chatbotPlatform': str
+        }
+        """
+        try:
+            # Identical re-sends of a chatbot this worker already stored skip the database
+            digest = self.chatbot_cache.digest(chatbot_data)
+            if self.chatbot_cache.seen(chatbot_data['chatbot_id'], digest):
+                return chatbot_data
+
+            # Insert or update in one round-trip
+            response = await self.client.table("chatbots").upsert(chatbot_data, on_conflict="chatbot_id").execute()
+            
+            if not response.data:
+                raise Exception("No data returned from chatbot upsert")
+            
+            self.chatbot_cache.remember(chatbot_data['chatbot_id'], digest)
+            return response.data[0]
+            
+        except Exception as e:
+            print(f"Error writing chatbot to database: {str(e)}")
+            raise Exception(f"Error writing chatbot to database: {str(e)}")
+
+    async def load_conversation_context(self, conversation_id: int) -> Optional[dict]:
+        """The stored {"next_seq", "turns"} of a conversation, or None"""
+        try:
+            response = await self.client.table("conversation_context").select("next_seq, turns").eq("conversation_id", conversation_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error reading conversation context: {str(e)}")
+            raise Exception(f"Error reading conversation context: {str(e)}")
+
+    async def save_conversation_context(self, conversation_id: int, next_seq: int, turns: list, expected_seq: Optional[int]) -> bool:
+        """
+        Compare-and-set on next_seq (db_utils/sql/conversation_context.sql), so
+        concurrent appends from two workers cannot overwrite each other.
+        """
+        try:
+            row = {"next_seq": next_seq, "turns": turns, "updated_at": datetime.now().isoformat()}
+            if expected_seq is None:
+                response = await self.client.table("conversation_context").upsert(
+                    {"conversation_id": conversation_id, **row}, on_conflict="conversation_id", ignore_duplicates=True,
+                ).execute()
+            else:
+                response = await self.client.table("conversation_context").update(row).eq(
+                    "conversation_id", conversation_id).eq("next_seq", expected_seq).execute()
+            return bool(response.data)
+        except Exception as e:
+            print(f"Error writing conversation context: {str(e)}")
+            raise Exception(f"Error writing conversation context: {str(e)}")
+
+    async def read_transcripts(self, table: str, key: str, column: str, after: Optional[int], limit: int) -> list[dict]:
+        self._check_transcript_column(table, key, column)
+        try:
+            query = self.client.table(table).select(f"{key}, {column}").order(key).limit(limit)
+            if after is not None:
+                query = query.gt(key, after)
+            response = await query.execute()
+            return response.data
+        except Exception as e:
+            raise Exception(f"Error when reading {table} transcripts: " + str(e))
+
+    async def update_transcripts(self, table: str, key: str, column: str, rows: list[dict]) -> None:
+        self._check_transcript_column(table, key, column)
+        try:
+            # PostgREST has no bulk update by key; a batch of single-row PATCHes shares the connection pool
+            await asyncio.gather(*[
+                self.client.table(table).update({column: row[column]}).eq(key, row[key]).execute() for row in rows
+            ])
+        except Exception as e:
+            print(f"Error updating {table} transcripts: {str(e)}")
+            raise Exception(f"Error updating {table} transcripts: {str(e)}")
+
+    async def _bulk_upsert(self, table: str, rows: list[dict], on_conflict: str) -> list[dict]:
+        """
+        Write many rows to one table in a single round-trip. Upserting on the
+        primary key keeps retried batches idempotent; columns left out of a
+        row fall back to their database defaults.
+        """
+        if not rows:
+            return []
+        response = await self.client.table(table).upsert(rows, on_conflict=on_conflict, default_to_null=False).execute()
+        if not response.data:
+            raise Exception(f"No data returned from {table} bulk upsert")
+        return response.data
+
+    async def write_conversations(self, conversation_details_list: list[dict]) -> list[dict]:
+        """Bulk version of write_conversation"""
+        try:
+            rows = [self._conversation_row(details) for details in conversation_details_list]
+            written = await self._bulk_upsert("conversations", rows, "conversation_id")
+            await self.index_search_documents(self._conversation_documents(written))
+            return written
+        except Exception as e:
+            print(f"Error writing conversations to database: {str(e)}")
+            raise Exception(f"Error writing conversations to database: {str(e)}")
+
+    async def write_alerts(self, alert_details_list: list[dict]) -> list[dict]:
+        """Bulk version of write_alert"""
+        try:
+            rows = [self._alert_row(details) for details in alert_details_list]
+            written = await self._bulk_upsert("risky_events_log", rows, "risky_event_id")
+            await self.increment_risk_summary([row.get("risky_event_id") for row in written])
+            await self.index_search_documents(self._risky_event_documents(written))
+            return written
+        except Exception as e:
+            print(f"Error writing alerts to database: {str(e)}")
+            raise Exception(f"Error writing alerts to database: {str(e)}")
+
+    async def increment_risk_summary(self, risky_event_ids: list) -> None:
+        """
+        Add freshly written risky events to the risk_summary_daily counts.
+        Events already counted are skipped by the database function, so
+        retried alert batches are safe. A failure here only leaves the summary
+        behind until the next rebuild, so it is logged rather than raised.
+        """
+        risky_event_ids = [event_id for event_id in risky_event_ids if event_id is not None]
+        if not self.risk_summary_enabled or not risky_event_ids:
+            return
+        try:
+            await self.client.rpc("increment_risk_summary", {"event_ids": risky_event_ids}).execute()
+        except Exception as e:
+            print(f"Error updating risk summary: {str(e)}")
+
+    async def rebuild_risk_summary(self) -> int:
+        """Recompute risk_summary_daily from risky_events_log; returns the number of buckets"""
+        try:
+            response = await self.client.rpc("rebuild_risk_summary", {}).execute()
+            return response.data
+        except Exception as e:
+            raise Exception("Error when rebuilding risk summary: " + str(e))
+
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        kinds: Sequence[str] = SEARCH_KINDS,
+        child_user_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[dict]:
+        """
+        Ranked matches from the search_documents index, scoped to the parent's
+        children by the search_parent_history function
+        (db_utils/sql/search_index.sql). The query takes web search syntax:
+        quoted phrases, "or" and -excluded words.
+        """
+        kinds = [kind for kind in kinds if kind in SEARCH_KINDS]
+        if not query.strip() or not kinds:
+            return []
+        try:
+            response = await self.client.rpc("search_parent_history", {
+                "p_parent_user_id": str(user_id), "p_query": query, "p_kinds": kinds,
+                "p_child_user_id": child_user_id, "p_limit": limit, "p_offset": offset,
+            }).execute()
+            return [self._search_result(row) for row in response.data]
+        except Exception as e:
+            raise Exception("Error when searching: " + str(e))
+
+    async def index_search_documents(self, documents: list[dict]) -> None:
+        """
+        Upsert documents into search_documents; the table's trigger computes
+        the tsvector and trims the stored content to a snippet excerpt. A
+        failure only leaves those documents out of search until the next
+        rebuild, so it is logged rather than raised.
+        """
+        if not self.search_index_enabled or not documents:
+            return
+        try:
+            # one row per document (the last one wins): Postgres rejects an upsert touching a row twice
+            rows = list({(document["kind"], document["doc_id"]): document for document in documents}.values())
+            await self.client.table("search_documents").upsert(rows, on_conflict="kind,doc_id").execute()
+        except Exception as e:
+            print(f"Error updating search index: {str(e)}")
+
+    async def rebuild_search_index(self, batch_size: int = 500) -> int:
+        """
+        Reindex every conversation, risky event and message by primary key, in
+        batches. Message texts may be compressed (db_utils/text_codec.py), so
+        the documents are built here rather than by the database. Documents are
+        upserted in place, so search keeps answering meanwhile; the ones not
+        rewritten since the first batch (their source rows are gone) are
+        deleted at the end.
+        """
+        sources = (
+            ("conversations", "conversation_id", "conversation_id, child_user_id, start_time, end_time, conversationTopic, conversationSummary",
+             self._conversation_documents),
+            ("risky_events_log", "risky_event_id", "risky_event_id, conversation_id, child_user_id, timestamp, riskType, riskyReason",
+             self._risky_event_documents),
+            ("messages", "message_id", "message_id, conversation_id, timestamp, message_text",
+             lambda rows: self._message_documents([{"message_text": self.text_codec.decode(row["message_text"])} for row in rows], rows)),
+        )
+        try:
+            # database time of the first upsert: every live document is rewritten at or after it
+            started = None
+            total = 0
+            for table, key, columns, documents_of in sources:
+                after = None
+                while True:
+                    query = self.client.table(table).select(columns).order(key).limit(batch_size)
+                    if after is not None:
+                        query = query.gt(key, after)
+                    rows = (await query.execute()).data
+                    if not rows:
+                        break
+                    after = rows[-1][key]
+                    documents = documents_of(rows)
+                    if documents:
+                        response = await self.client.table("search_documents").upsert(documents, on_conflict="kind,doc_id").execute()
+                        if started is None and response.data:
+                            started = min(row["indexed_at"] for row in response.data)
+                    total += len(documents)
+            stale = self.client.table("search_documents").delete().in_("kind", list(SEARCH_KINDS))
+            if started is not None:
+                stale = stale.lt("indexed_at", started)
+            await stale.execute()
+            return total
+        except Exception as e:
+            raise Exception("Error when rebuilding search index: " + str(e))
+
+    async def get_risk_summary(
+        self,
+        user_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        child_user_id: Optional[int] = None,
+    ) -> list:
+        """
+        Daily risk buckets (child_user_id, day, riskType, riskLevel, platform,
+        count) of the parent's children between start_date and end_date
+        inclusive. Reads risk_summary_daily, so the cost grows with the number
+        of buckets rather than the number of events.
+        """
+        try:
+            plan = QueryPlan("get_risk_summary")
+            child_user_ids = self._child_filter(await self._child_user_ids(plan, user_id), child_user_id)
+            if not child_user_ids:
+                return []
+
+            query = self.client.from_("risk_summary_daily").select(
+                "child_user_id, day, riskType, riskLevel, platform, count"
+            ).in_("child_user_id", child_user_ids)
+            if start_date is not None:
+                query = query.gte("day", start_date)
+            if end_date is not None:
+                query = query.lte("day", end_date)
+            response = await plan.step("buckets", query.order("day").execute())
+            return response.data
+        except Exception as e:
+            raise Exception("Error when reading risk summary: " + str(e))
+
+    async def write_messages(self, message_details_list: list[dict]) -> list[dict]:
+        """
+        Bulk version of write_message; rows without a message_id get one from
+        the ID allocator. Returns one row per input, in order; repeated texts
+        come back as the stored message with "duplicate": True.
+        """
+        try:
+            results: list = [None] * len(message_details_list)
+            pending = []
+            for index, details in enumerate(message_details_list):
+                duplicate_of = await self.claim_message(details)
+                if duplicate_of is not None:
+                    results[index] = self._duplicate_message(details, duplicate_of)
+                else:
+                    pending.append((index, details))
+            rows = self._message_rows([details for _, details in pending])
+            for row in rows:
+                if row["message_id"] is None:
+                    row["message_id"] = await self.id_allocator.anext_id("messages")
+            written = {row["message_id"]: row for row in await self._write_message_rows(rows)} if rows else {}
+            for (index, details), row in zip(pending, rows):
+                results[index] = written.get(row["message_id"]) or self._duplicate_message(details, None)
+            await self.index_search_documents(self._message_documents(message_details_list, results))
+            return results
+        except Exception as e:
+            self.release_message_claims(message_details_list)
+            print(f"Error writing messages to database: {str(e)}")
+            raise Exception(f"Error writing messages to database: {str(e)}")
+
+    async def write_chatbots(self, chatbot_data_list: list[dict]) -> list[dict]:
+        """Bulk version of write_chatbot; returns one row per input, in order"""
+        try:
+            # one row per chatbot_id (the last one wins): Postgres rejects an upsert touching a row twice
+            changed = {}
+            for chatbot_data in chatbot_data_list:
+                digest = self.chatbot_cache.digest(chatbot_data)
+                if not self.chatbot_cache.seen(chatbot_data['chatbot_id'], digest):
+                    changed[chatbot_data['chatbot_id']] = (chatbot_data, digest)
+            written = {}
+            if changed:
+                rows = await self._bulk_upsert("chatbots", [chatbot_data for chatbot_data, _ in changed.values()], "chatbot_id")
+                written = {row["chatbot_id"]: row for row in rows}
+                for chatbot_id, (_, digest) in changed.items():
+                    self.chatbot_cache.remember(chatbot_id, digest)
+            return [written.get(chatbot_data['chatbot_id'], chatbot_data) for chatbot_data in chatbot_data_list]
+        except Exception as e:
+            print(f"Error writing chatbots to database: {str(e)}")
+            raise Exception(f"Error writing chatbots to database: {str(e)}")
@@ -0,0 +1,244 @@
+"""
+Compression of the transcript columns (risky_events_log.messages and
+messages.message_text).
+
+The extension stores overlapping chat windows in both, so the text is large
+and repetitive. TextCodec.encode compresses values of at least `min_size`
+bytes with zlib, optionally primed with a shared dictionary trained on
+existing rows, and keeps them in the text column as
+
+    "\\x01z" + <dictionary id, or nothing> + ":" + base64(zlib data)
+
+Values that are short or do not shrink stay plain text, and decode passes
+plain text through, so old and new rows can be mixed and compression can be
+turned on or off at any time. Dashboard reads do not select these columns, so
+values are only decoded where a reader asks for them.
+
+Dictionaries are files of at most 32 KB (zlib's window). The first one in
+TEXT_CODEC_DICTIONARIES is used for new values; keep older ones listed for as
+long as rows compressed with them exist. Build one, and recompress existing
+rows, with
+
+    python -m db_utils.text_codec train-dictionary --output transcripts.zdict
+    python -m db_utils.text_codec backfill [--recompress]
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence
+
+from settings import app_settings
+
+MARKER = "\x01z"
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+# (table, primary key, transcript column) handled by the backfill
+TRANSCRIPT_COLUMNS = (
+    ("risky_events_log", "risky_event_id", "messages"),
+    ("messages", "message_id", "message_text"),
+)
+
+
+def dictionary_id(dictionary: bytes) -> str:
+    return f"{zlib.crc32(dictionary):08x}"
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, str) and value.startswith(MARKER)
+
+
+class TextCodec:
+    def __init__(self, min_size: int = 512, level: int = 6, dictionaries: Sequence[bytes] = ()) -> None:
+        self.min_size = min_size
+        self.level = level
+        self.dictionaries: Dict[str, bytes] = {dictionary_id(dictionary): dictionary for dictionary in dictionaries}
+        # new values use the first dictionary
+        self.dictionary = dictionaries[0] if dictionaries else None
+        self.dictionary_id = dictionary_id(self.dictionary) if self.dictionary else ""
+
+    def encode(self, value: Optional[str]) -> Optional[str]:
+        """The stored form of a column value; None, short and incompressible values are returned as is."""
+        if not isinstance(value, str) or is_encoded(value):
+            return value
+        data = value.encode("utf-8")
+        if len(data) < self.min_size:
+            return value
+        if self.dictionary:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionary)
+        else:
+            compressor = zlib.compressobj(self.level)
+        encoded = f"{MARKER}{self.dictionary_id}:" + base64.b64encode(compressor.compress(data) + compressor.flush()).decode("ascii")
+        return encoded if len(encoded) < len(data) else value
+
+    def decode(self, value: Optional[str]) -> Optional[str]:
+        """The original text of a stored column value."""
+        if not is_encoded(value):
+            return value
+        header, _, payload = value.partition(":")
+        dict_id = header[len(MARKER):]
+        try:
+            if dict_id:
+                dictionary = self.dictionaries.get(dict_id)
+                if dictionary is None:
+                    raise ValueError(f"Value compressed with unknown dictionary {dict_id}; add it to TEXT_CODEC_DICTIONARIES")
+                decompressor = zlib.decompressobj(zdict=dictionary)
+            else:
+                decompressor = zlib.decompressobj()
+            data = decompressor.decompress(base64.b64decode(payload)) + decompressor.flush()
+        except (binascii.Error, zlib.error) as e:
+            raise ValueError(f"Corrupt compressed value: {str(e)}")
+        return data.decode("utf-8")
+
+
+def train_dictionary(samples: Iterable[str], size: int = MAX_DICTIONARY_SIZE, min_count: int = 3) -> bytes:
+    """
+    zlib preset dictionary from sample values: their most frequent lines and
+    word 4-grams, by bytes saved, with the most valuable last (zlib reaches
+    the end of the dictionary with the shortest distances).
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        for line in sample.splitlines():
+            line = line.strip()
+            if line:
+                counts[line + "\n"] += 1
+                words = line.split()
+                counts.update(" ".join(words[i:i + 4]) + " " for i in range(len(words) - 3))
+    ranked = sorted(
+        (piece for piece, count in counts.items() if count >= min_count),
+        key=lambda piece: counts[piece] * len(piece.encode("utf-8")),
+        reverse=True,
+    )
+    chosen, total = [], 0
+    for piece in ranked:
+        data = piece.encode("utf-8")
+        if total + len(data) > size:
+            continue
+        chosen.append(data)
+        total += len(data)
+    return b"".join(reversed(chosen))
+
+
+def build_text_codec() -> TextCodec:
+    """The codec configured in settings; with TEXT_CODEC=none it only decodes."""
+    dictionaries = []
+    for path in filter(None, (path.strip() for path in (app_settings.text_codec_dictionaries or "").split(","))):
+        with open(path, "rb") as f:
+            dictionaries.append(f.read(MAX_DICTIONARY_SIZE))
+    if app_settings.text_codec == "none":
+        # still able to read values written while compression was on
+        return TextCodec(min_size=1 << 62, dictionaries=dictionaries)
+    if app_settings.text_codec != "zlib":
+        raise ValueError(f"Unknown TEXT_CODEC: {app_settings.text_codec}")
+    return TextCodec(app_settings.text_codec_min_size, app_settings.text_codec_level, dictionaries)
+
+
+async def sample_transcripts(client, limit: int) -> list:
+    samples = []
+    for table, key, column in TRANSCRIPT_COLUMNS:
+        rows = await client.read_transcripts(table, key, column, after=None, limit=limit)
+        samples.extend(client.text_codec.decode(row[column]) for row in rows if row[column])
+    return samples
+
+
+async def backfill(client, recompress: bool = False, batch_size: int = 500) -> dict:
+    """
+    Encode the transcript columns of existing rows in batches, by primary key.
+    With `recompress`, values already compressed (e.g. with an older
+    dictionary) are decoded and encoded again.
+    """
+    codec = client.text_codec
+    report = {}
+    for table, key, column in TRANSCRIPT_COLUMNS:
+        stats = {"rows": 0, "updated": 0, "bytes_before": 0, "bytes_after": 0}
+        after = None
+        while True:
+            rows = await client.read_transcripts(table, key, column, after=after, limit=batch_size)
+            if not rows:
+                break
+            after = rows[-1][key]
+            changed = []
+            for row in rows:
+                value = row[column]
+                if not value:
+                    continue
+                stats["rows"] += 1
+                stats["bytes_before"] += len(value.encode("utf-8"))
+                encoded = codec.encode(codec.decode(value)) if recompress or not is_encoded(value) else value
+                stats["bytes_after"] += len(encoded.encode("utf-8"))
+                if encoded != value:
+                    changed.append({key: row[key], column: encoded})
+            if changed:
+                await client.update_transcripts(table, key, column, changed)
+                stats["updated"] += len(changed)
+        report[table] = stats
+    return report
+
+
+def measure(codec: TextCodec, samples: Sequence[str], repeat: int = 3) -> dict:
+    """Compressed size and encode/decode throughput (MB of text per second) over samples."""
+    total = sum(len(sample.encode("utf-8")) for sample in samples)
+    encoded = [codec.encode(sample) for sample in samples]
+    encode_seconds = decode_seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sample in samples:
+            codec.encode(sample)
+        encode_seconds = min(encode_seconds, time.perf_counter() - start)
+        start = time.perf_counter()
+        for value in encoded:
+            codec.decode(value)
+        decode_seconds = min(decode_seconds, time.perf_counter() - start)
+    stored = sum(len(value.encode("utf-8")) for value in encoded)
+    return {
+        "values": len(samples),
+        "compressed": sum(1 for value in encoded if is_encoded(value)),
+        "bytes_before": total,
+        "bytes_after": stored,
+        "ratio": total / stored if stored else 0.0,
+        "encode_mb_per_s": total / encode_seconds / 1e6 if encode_seconds else 0.0,
+        "decode_mb_per_s": total / decode_seconds / 1e6 if decode_seconds else 0.0,
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    from db_utils.storage_backend import build_storage_backend
+
+    parser = argparse.ArgumentParser(description="Compression of transcript columns")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    train = subcommands.add_parser("train-dictionary", help="build a zlib dictionary from stored transcripts")
+    train.add_argument("--output", required=True)
+    train.add_argument("--samples", type=int, default=5000, help="rows sampled per table")
+    fill = subcommands.add_parser("backfill", help="compress the transcripts of existing rows")
+    fill.add_argument("--recompress", action="store_true", help="also re-encode compressed values (new dictionary)")
+    fill.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    async def run():
+        client = build_storage_backend()
+        try:
+            if args.command == "train-dictionary":
+                samples = await sample_transcripts(client, args.samples)
+                dictionary = train_dictionary(samples)
+                with open(args.output, "wb") as f:
+                    f.write(dictionary)
+                print(json.dumps({
+                    "dictionary": args.output, "id": dictionary_id(dictionary), "bytes": len(dictionary),
+                    "plain": measure(TextCodec(app_settings.text_codec_min_size), samples),
+                    "with_dictionary": measure(TextCodec(app_settings.text_codec_min_size, dictionaries=[dictionary]), samples),
+                }, indent=2))
+            else:
+                print(json.dumps(await backfill(client, args.recompress, args.batch_size), indent=2))
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 import logging
-logging.basicConfig(level=logging.INFO)
+from settings import app_settings
+from app.services.log_utils import configure_logging, log_event
+configure_logging(
+    app_settings.log_level, app_settings.log_queued, app_settings.log_sample_rates, app_settings.log_max_field_chars,
+)
 
 import os
+import time
 import uuid
 import shutil
 import json
 import copy
+from contextlib import asynccontextmanager
 from typing import List
 
 import numpy as np
@@ -13,15 +19,19 @@ import numpy as np
 from fastapi import FastAPI, Depends, HTTPException, status, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi import Body
 
 
 
 from starlette.requests import Request
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.sessions import SessionMiddleware
 
-from routers.base import baseRouter
+from routers.base import baseRouter, RDS_CLIENT, INGEST_QUEUE, EVENT_BROKER, EMAIL_DISPATCHER, NOTIFIER, RISK_GATEWAY
+from db_utils.query_plan import query_timings, server_timing_header
+from app.services.metrics import HTTP_REQUEST_SECONDS, REGISTRY, SLOW_REQUEST_PROFILES
+from app.services.profiling import SlowRequestProfiler
 
 from app.chains.custom_openai_exception import CustomOpenAIException
 
@@ -29,7 +39,26 @@ logger = logging.getLogger(__name__)
 
 HTTP_USER_ERROR = 491
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await EVENT_BROKER.start()
+    if EMAIL_DISPATCHER is not None:
+        await EMAIL_DISPATCHER.start()
+    if INGEST_QUEUE is not None:
+        await INGEST_QUEUE.start()
+    yield
+    if INGEST_QUEUE is not None:
+        await INGEST_QUEUE.stop()
+    if NOTIFIER is not None:
+        NOTIFIER.flush_all()
+    if EMAIL_DISPATCHER is not None:
+        await EMAIL_DISPATCHER.stop()
+    await EVENT_BROKER.stop()
+    if RISK_GATEWAY is not None:
+        await RISK_GATEWAY.aclose()
+    await RDS_CLIENT.aclose()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(baseRouter, prefix="/api/v1", tags=["api/v1"])
 
 origins = [
@@ -45,10 +74,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+PROFILER = SlowRequestProfiler(
+    app_settings.profile_sample_rate, app_settings.profile_slow_ms / 1000, app_settings.profile_dir,
+) if app_settings.profile_sample_rate > 0 else None
+
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request, adds the Server-Timing header of its query plans
+    and hands sampled requests to the slow request profiler. A plain ASGI
+    middleware that only wraps `send`: @app.middleware("http") would run each
+    request through BaseHTTPMiddleware's extra task and response streaming.
+    """
+
+    def __init__(self, app, profiler: SlowRequestProfiler = None) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # query plans append their per-step timings to this list
+        timings = []
+        query_timings.set(timings)
+        sampler = self.profiler.begin() if self.profiler is not None else None
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if timings:
+                    MutableHeaders(scope=message)["Server-Timing"] = server_timing_header(timings)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            # label by route template, not the raw path, to keep the series count bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status_code))
+            if sampler is not None:
+                profile = self.profiler.end(sampler, route, elapsed)
+                if profile is not None:
+                    SLOW_REQUEST_PROFILES.inc(route)
+                    log_event(logger, logging.WARNING, "request.slow", method=scope["method"], route=route,
+                              elapsed_ms=round(elapsed * 1000), profile=profile)
+
+app.add_middleware(RequestMetricsMiddleware, profiler=PROFILER)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
 	exc_str = f'{exc}'.replace('\n', ' ').replace('   ', ' ')
-	logging.error(f"{request}: {exc_str}")
+	log_event(logger, logging.ERROR, "request.invalid", method=request.method, path=request.url.path, error=exc_str)
 	content = {'status_code': 10422, 'message': exc_str, 'data': None}
 	return JSONResponse(content=content, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
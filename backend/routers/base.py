@@ -2,40 +2,189 @@ import asyncio
 import base64
 import json
 import logging
+import math
 import os
 import shutil
 import uuid
 from pathlib import Path
 from typing import Dict, List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, Request, Response, Security, status, WebSocket, Body
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Security, status, WebSocket, Body, Query
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from settings import app_settings
 from starlette.requests import Request
 
 import jwt
 
-from app.services.email import send_email_notification
+from app.services import crypto
+from app.services.auth import AppUserDirectory, TokenVerifier
+from app.services.context_store import SequenceGap, build_context_store
+from app.services.email import EmailQueueFull, build_email_dispatcher
+from app.services.event_stream import build_broker
+from app.services.ingest_queue import IngestQueueFull, WriteBehindQueue
+from app.services.log_utils import log_event
+from app.services.notifications import NotificationCoalescer, PendingAlert, risk_rank
+from app.services.rate_limit import SlidingWindowLimiter
+from app.services.read_cache import build_read_cache
+from app.services.risk_assessment import RiskModelError, build_risk_gateway, provider_error, split_messages
+from app.services.risk_summary import default_range, summarize_buckets
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 
 # from db_utils.aws_rds import RDSClient
-from db_utils.supabase_rds import RDSClient
-RDS_CLIENT = RDSClient()
+from db_utils.storage_backend import CONVERSATION_FIELDS, RISKY_EVENT_FIELDS, SEARCH_KINDS, build_storage_backend, decode_cursor
+RDS_CLIENT = build_storage_backend()
+
+# per-parent cache of the dashboard reads, invalidated by the write paths below
+READ_CACHE = build_read_cache(
+    ttl=app_settings.read_cache_ttl,
+    max_entries=app_settings.read_cache_max_entries,
+    sqlite_path=app_settings.read_cache_sqlite_path,
+) if app_settings.read_cache_enabled else None
+
+async def cached_read(parent_user_id, key: str, loader):
+    if READ_CACHE is None:
+        return await loader()
+    return await READ_CACHE.get_or_load(parent_user_id, key, loader)
+
+async def invalidate_parents(parent_user_ids) -> None:
+    if READ_CACHE is not None:
+        for parent_user_id in set(parent_user_ids):
+            await READ_CACHE.invalidate_parent(parent_user_id)
+
+async def invalidate_children(child_user_ids) -> None:
+    """Drop the cached dashboard reads of every parent of these children."""
+    if READ_CACHE is None:
+        return
+    child_user_ids = list({child_user_id for child_user_id in child_user_ids if child_user_id is not None})
+    if child_user_ids:
+        await invalidate_parents(await RDS_CLIENT.get_parent_user_ids(child_user_ids))
+
+# notification emails are sent in the background over pooled SMTP sessions (None without SMTP settings)
+EMAIL_DISPATCHER = build_email_dispatcher()
+
+# risk alerts are emailed to parents as one digest per (parent, child) and coalescing window
+NOTIFIER = NotificationCoalescer(
+    EMAIL_DISPATCHER,
+    window=app_settings.notify_coalesce_window,
+    max_per_hour=app_settings.notify_max_per_hour,
+) if EMAIL_DISPATCHER is not None and app_settings.notify_alert_emails else None
+
+def conversation_link(conversation_id) -> str:
+    return f"{app_settings.notify_dashboard_url}?conversation_id={conversation_id}"
+
+async def notify_parents(alert_rows: list, parents_by_child: dict) -> None:
+    """Add alerts at or above NOTIFY_MIN_RISK_LEVEL to the parents' pending digests."""
+    min_rank = risk_rank(app_settings.notify_min_risk_level)
+    rows = [row for row in alert_rows if risk_rank(row.get("riskLevel")) >= min_rank and parents_by_child.get(row.get("child_user_id"))]
+    if not rows:
+        return
+    child_user_ids = list({row["child_user_id"] for row in rows})
+    parent_user_ids = list({parent for child_user_id in child_user_ids for parent in parents_by_child[child_user_id]})
+    emails = await RDS_CLIENT.get_user_emails(parent_user_ids)
+    child_names = await RDS_CLIENT.get_usernames(child_user_ids)
+    for row in rows:
+        alert = PendingAlert(
+            risk_type=row.get("riskType") or "Unknown Risk",
+            risk_level=row.get("riskLevel"),
+            reason=row.get("riskyReason") or "",
+            link=conversation_link(row.get("conversation_id")),
+        )
+        child_name = child_names.get(row["child_user_id"], "your child")
+        for parent_user_id in parents_by_child[row["child_user_id"]]:
+            if parent_user_id in emails:
+                NOTIFIER.add(parent_user_id, row["child_user_id"], emails[parent_user_id], child_name, alert)
+
+# new risky events are pushed to the parents subscribed to /parental_control/stream
+EVENT_BROKER = build_broker(app_settings.event_stream_socket_dir, app_settings.event_stream_queue_size)
+
+def risky_event_message(row: dict) -> dict:
+    return {
+        "type": "risky_event",
+        "data": {
+            "riskyEvent_id": row.get("risky_event_id"),
+            "conversation_id": row.get("conversation_id"),
+            "child_user_id": row.get("child_user_id"),
+            "riskType": row.get("riskType") or "Unknown Risk",
+            "riskLevel": (row.get("riskLevel") or "Unknown").capitalize(),
+            "riskyReason": row.get("riskyReason") or "No reason provided",
+            "timestamp": row.get("timestamp"),
+        },
+    }
+
+async def alerts_written(alert_rows: list) -> None:
+    """Drop the cached dashboards of the children's parents and push them the new events."""
+    child_user_ids = list({row.get('child_user_id') for row in alert_rows if row.get('child_user_id') is not None})
+    if not child_user_ids:
+        return
+    parents_by_child = {}
+    for relation in await RDS_CLIENT.get_parent_child_relations(child_user_ids):
+        parents_by_child.setdefault(relation["child_user_id"], []).append(relation["parent_user_id"])
+    await invalidate_parents(parent for parents in parents_by_child.values() for parent in parents)
+    for row in alert_rows:
+        if (row.get("riskType") or "").lower() == "no risk":
+            continue
+        for parent_user_id in parents_by_child.get(row.get("child_user_id"), []):
+            await EVENT_BROKER.publish(parent_user_id, risky_event_message(row))
+    if NOTIFIER is not None:
+        try:
+            await notify_parents(alert_rows, parents_by_child)
+        except Exception as e:
+            # the alerts are saved; a failed email lookup only costs the notification
+            logger.error("Error queueing risk notifications: %s", e)
+
+async def write_alerts_and_invalidate(alert_details_list: list) -> list:
+    rows = await RDS_CLIENT.write_alerts(alert_details_list)
+    await alerts_written(rows)
+    return rows
+
+async def write_conversations_and_invalidate(conversation_details_list: list) -> list:
+    rows = await RDS_CLIENT.write_conversations(conversation_details_list)
+    await invalidate_children(details.get('child_user_id') for details in conversation_details_list)
+    return rows
+
+# message and alert writes are acknowledged once queued and flushed to Supabase in bulk
+INGEST_QUEUE: Optional[WriteBehindQueue] = WriteBehindQueue(
+    {"message": RDS_CLIENT.write_messages, "alert": write_alerts_and_invalidate},
+    max_batch=app_settings.ingest_max_batch,
+    flush_interval=app_settings.ingest_flush_interval,
+    max_pending=app_settings.ingest_max_pending,
+    spool_dir=app_settings.ingest_spool_dir,
+    max_attempts=app_settings.ingest_max_attempts,
+) if app_settings.ingest_write_behind else None
+# the extension's risk assessment model call, cached and deduplicated (None when no provider is configured)
+RISK_GATEWAY = build_risk_gateway()
+# the provider is paid per call and the extension sends no credential, so each client IP is limited
+RISK_RATE_LIMITER = SlidingWindowLimiter(
+    app_settings.risk_rate_limit, app_settings.risk_rate_window,
+) if app_settings.risk_rate_limit > 0 else None
+
+def check_risk_rate_limit(request: Request) -> None:
+    """Answer 429 once the client has used its assessments for the current window."""
+    if RISK_RATE_LIMITER is None:
+        return
+    wait = RISK_RATE_LIMITER.acquire(request.client.host if request.client else "unknown")
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many risk assessments, retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+# server-side transcripts, so the extension sends only the turns it has not sent yet
+CONTEXT_STORE = build_context_store(
+    RDS_CLIENT,
+    max_turns=app_settings.context_store_max_turns,
+    max_conversations=app_settings.context_store_max_conversations,
+    recent_turns=app_settings.context_store_recent_turns,
+)
 # test write
 # RDS_CLIENT.write_log("server_init_session_id", "server_init_type", {"server_init_log_body": ""}, "user_email_address")
 
-DUMMY_USER_ID = 1
-
 baseRouter = APIRouter()
 
 class LogData(BaseModel):
@@ -81,11 +230,9 @@ class EmailNotificationData(BaseModel):
     redirect_url: str
 
 class AddChildData(BaseModel):
-    parent_user_id: str
     child_name: str
     child_age: int
 class RemoveChildData(BaseModel):
-    parent_user_id: str
     child_user_id: str
 
 class RenameChildData(BaseModel):
@@ -110,6 +257,39 @@ class ChatbotData(BaseModel):
     metadata: dict = {}
     chatbotPlatform: str
 
+class RiskAssessData(BaseModel):
+    contextChat: str = ""
+    recentChat: Optional[str] = None
+    character_profile: str = "default"
+    user: Optional[str] = None
+    # alternatively the raw [{sender_type, content}] messages, split into context and the last two turns
+    messages: Optional[List[dict]] = None
+
+class TurnData(BaseModel):
+    sender_type: str
+    content: str
+
+class ConversationTurnsData(BaseModel):
+    # turns[0] is turn number `seq` of the conversation; turns the server already has are skipped
+    seq: int
+    turns: List[TurnData]
+    reset: bool = False  # the turns are the whole transcript from `seq` on
+    assess: bool = True
+    character_profile: str = "default"
+    user: Optional[str] = None
+    # with child_user_id the conversation row is written too, with the rebuilt context as its messages
+    child_user_id: Optional[int] = None
+    chatbot_id: Optional[int] = None
+    start_time: Optional[str] = None
+    platform: Optional[str] = "unknown"
+
+class IngestRecord(BaseModel):
+    type: str  # "alert", "conversation", "message" or "chatbot"
+    data: dict
+
+class IngestBatchData(BaseModel):
+    records: List[IngestRecord]
+
 def get_session_id(request: Request) -> str:
     request.session["session_id"] = request.session.get("session_id")
     session_id = request.session["session_id"]
@@ -126,26 +306,15 @@ JWT_ALGORITHM = "HS256"
 security = HTTPBearer()
 
 def decrypt_data(encrypted_data, key):
-    if not encrypted_data.strip():
-        return encrypted_data.strip()
-    encrypted_data_bytes = base64.b64decode(encrypted_data)
-    key_bytes = key.encode('utf-8')
-    backend = default_backend()
-    cipher = Cipher(algorithms.AES(key_bytes), modes.ECB(), backend=backend)
-    decryptor = cipher.decryptor()
-    decrypted_padded_data = decryptor.update(encrypted_data_bytes) + decryptor.finalize()
-    unpadder = padding.PKCS7(128).unpadder()
-    decrypted_data = unpadder.update(decrypted_padded_data) + unpadder.finalize()
-    return decrypted_data.decode()
+    # legacy ECB and authenticated "v2:" payloads; the cipher is reused per key
+    return crypto.decrypt(encrypted_data, key)
+
+# verified tokens are cached until their exp, so dashboard polling skips the signature check
+TOKEN_VERIFIER = TokenVerifier(JWT_SECRET, JWT_ALGORITHM, audience="authenticated", cache_size=app_settings.auth_token_cache_size)
+optional_security = HTTPBearer(auto_error=False)
 
 def decode_jwt(token: str) -> dict:
-    try:
-        decoded_token = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], audience="authenticated")
-        return decoded_token
-    except jwt.ExpiredSignatureError:
-        return None  # Token has expired
-    except jwt.InvalidTokenError:
-        return None  # Invalid token
+    return TOKEN_VERIFIER.verify(token)  # None if the token is invalid or expired
 
 def get_current_user(token, request: Request):
     decoded_token = decode_jwt(token)
@@ -157,7 +326,81 @@ def auth_middleware(request: Request):
     token = request.headers.get("Authorization")
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
-    return get_current_user(token, request)
+    return get_current_user(token.removeprefix("Bearer ").strip(), request)
+
+# the token's `sub` is the Supabase auth user; the tables key users by the app user linked to it
+APP_USERS = AppUserDirectory(RDS_CLIENT.get_user_by_auth_id, max_entries=app_settings.auth_token_cache_size)
+
+async def app_user_from_token(token: Optional[str]) -> dict:
+    """user_id (as a string) and role of the app user behind a verified bearer token."""
+    if token is None and app_settings.auth_dev_user_id is not None:
+        # local development: the dev user may also read the stats endpoints
+        return {"user_id": app_settings.auth_dev_user_id, "role": "admin"}
+    claims = decode_jwt(token) if token else None
+    if not claims or not claims.get("sub"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
+    user = await APP_USERS.resolve(claims["sub"])
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No user is linked to this account")
+    return {"user_id": str(user["user_id"]), "role": user.get("role")}
+
+# async so the dependencies run on the event loop instead of the threadpool
+async def current_parent_user_id(credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security)) -> str:
+    """Parent user of the request: the app user linked to the `sub` of its verified bearer token."""
+    return (await app_user_from_token(credentials.credentials if credentials else None))["user_id"]
+
+async def require_admin(credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security)) -> None:
+    """Only users with the admin role may read the per-worker stats endpoints."""
+    user = await app_user_from_token(credentials.credentials if credentials else None)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+
+def build_message_details(messageData: MessageData) -> dict:
+    return {
+        'message_id': messageData.message_id,
+        'conversation_id': messageData.conversation_id,
+        'sender': messageData.sender,
+        'message_text': messageData.message_text,
+        'timestamp': messageData.timestamp or datetime.now().isoformat(),
+        'sender_type': messageData.sender_type
+    }
+
+def build_chatbot_data(chatbotData: ChatbotData) -> dict:
+    return {
+        "chatbot_id": chatbotData.chatbot_id,
+        "name": chatbotData.name,
+        "metadata": json.dumps(chatbotData.metadata),  # Convert dict to JSON string
+        "chatbotPlatform": chatbotData.chatbotPlatform
+    }
+
+async def enqueue_message(message_details: dict) -> Optional[int]:
+    """Queue a message; returns the stored message_id instead if its text is a repeat."""
+    duplicate_of = await RDS_CLIENT.claim_message(message_details)
+    if duplicate_of is not None:
+        return duplicate_of
+    # IDs are fixed before queueing so a replayed spool upserts the same rows
+    if message_details.get('message_id') is None:
+        message_details['message_id'] = await RDS_CLIENT.generate_message_id(child_user_id=None)
+    try:
+        INGEST_QUEUE.submit("message", message_details)
+    except IngestQueueFull:
+        RDS_CLIENT.release_message_claims([message_details])
+        raise
+    return None
+
+def parse_alert_details(alert_details: str) -> dict:
+    """The alert_details JSON string as a dict; ValueError if it is not a JSON object."""
+    details = json.loads(alert_details)
+    if not isinstance(details, dict):
+        raise ValueError(f"alert_details must be a JSON object, got {type(details).__name__}")
+    return details
+
+def enqueue_alert(alert_details: dict) -> None:
+    alert_details.setdefault('timestamp', datetime.now().isoformat())
+    INGEST_QUEUE.submit("alert", alert_details)
+
+def ingest_queue_full(e: IngestQueueFull) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
 
 @baseRouter.get("/")
 def root_api_v1(request: Request):
@@ -206,13 +449,46 @@ async def generate_ids(data: IDGenerationRequest, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error generating IDs: {str(e)}")
+        logger.error("Error generating IDs: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error generating IDs: {str(e)}"
         )
     
 
+@baseRouter.post("/risk/assess")
+async def assess_risk(data: RiskAssessData, request: Request):
+    if RISK_GATEWAY is None:
+        raise HTTPException(status_code=503, detail="No risk model is configured")
+    check_risk_rate_limit(request)
+    context_chat, recent_chat = data.contextChat, data.recentChat
+    if data.messages is not None:
+        context_chat, recent_chat = split_messages(data.messages)
+    if not recent_chat:
+        raise HTTPException(status_code=400, detail="recentChat or messages is required")
+    try:
+        result, source = await RISK_GATEWAY.assess(context_chat, recent_chat, data.character_profile, data.user)
+    except RiskModelError as e:
+        logger.error("Error assessing risk: %s", e)
+        raise provider_error(e)
+    return {
+        "riskAssessment": result["riskAssessment"],
+        "riskNotification": result["riskNotification"],
+        "recentChat": recent_chat,
+        "contextChat": context_chat,
+        "cached": source in ("cache", "shared"),
+        "source": source,
+    }
+
+@baseRouter.get("/risk/stats", dependencies=[Depends(require_admin)])
+async def risk_stats():
+    if RISK_GATEWAY is None:
+        raise HTTPException(status_code=503, detail="No risk model is configured")
+    stats = RISK_GATEWAY.stats()
+    stats["rate_limit"] = RISK_RATE_LIMITER.stats() if RISK_RATE_LIMITER is not None else {"enabled": False}
+    return stats
+
+
 # endpoints for logging (json data: {type: str, log_body: dict}})
 @baseRouter.post("/log/save")
 async def log_data(logData: LogData, request: Request):
@@ -232,37 +508,72 @@ async def check_session_id(request: Request):
 async def receive_alert(alertData: AlertData, request: Request):
     try:
         # Parse the alert_details JSON string
-        alert_details = json.loads(alertData.alert_details)
+        alert_details = parse_alert_details(alertData.alert_details)
         
-        # Log the incoming data for debugging
-        logger.info(f"Received alert data: {alert_details}")
+        log_event(logger, logging.INFO, "alert.received", risk_event_id=alert_details.get('risk_event_id'),
+                  child_user_id=alert_details.get('child_user_id'), riskLevel=alert_details.get('riskLevel'),
+                  details=alert_details)
         
+        if INGEST_QUEUE is not None:
+            enqueue_alert(alert_details)
+            return {
+                "message": "Alert received and queued for saving",
+                "risk_event_id": alert_details.get('risk_event_id')
+            }
+
         # Write to risk_events_log table
-        risk_event = RDS_CLIENT.write_alert(alert_details)
+        risk_event = await RDS_CLIENT.write_alert(alert_details)
+        await alerts_written([risk_event])
         
         return {
             "message": "Alert received and risk event saved successfully",
             "risk_event_id": risk_event.get('risk_event_id') if risk_event else None
         }
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {str(e)}")
+    except IngestQueueFull as e:
+        raise ingest_queue_full(e)
+    except ValueError as e:
+        logger.error("JSON decode error: %s", e)
         raise HTTPException(
             status_code=400,
             detail=f"Invalid JSON in alert_details: {str(e)}"
         )
     except Exception as e:
-        logger.error(f"Error processing alert: {str(e)}")
+        logger.error("Error processing alert: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing alert: {str(e)}"
         )
 
+class ConversationUpdateData(BaseModel):
+    # the extension sends the whole conversation; only these fields are patched
+    end_time: Optional[str] = None
+    conversation_topic: Optional[str] = None
+    conversation_summary: Optional[str] = None
+
+@baseRouter.put("/conversations/update/{conversation_id}")
+async def update_conversation(conversation_id: int, data: ConversationUpdateData, request: Request):
+    try:
+        conversation = await RDS_CLIENT.update_conversation(conversation_id, data.model_dump(exclude_none=True))
+    except Exception as e:
+        logger.error("Error updating conversation: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error updating conversation: {str(e)}")
+    if conversation is None:
+        # the extension creates it through /conversations/receive
+        raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+    if conversation.get('child_user_id') is not None:
+        await invalidate_children([conversation['child_user_id']])
+    return {
+        "message": "Conversation updated successfully",
+        "conversation_id": conversation_id
+    }
+
 @baseRouter.post("/conversations/receive")
 async def receive_conversation(request: Request):
     try:
         # Get raw data from request
         raw_data = await request.json()
-        logger.info(f"Raw input data: {raw_data}")
+        log_event(logger, logging.INFO, "conversation.received", conversation_id=raw_data.get('conversation_id'),
+                  user=raw_data.get('user'), payload=raw_data)
 
         # Check if data is already in the expected format
         if 'user' in raw_data and 'conversation_details' in raw_data:
@@ -285,42 +596,122 @@ async def receive_conversation(request: Request):
             }
 
         # Write to conversations table
-        conversation = RDS_CLIENT.write_conversation(conversation_data['conversation_details'])
+        conversation = await RDS_CLIENT.write_conversation(conversation_data['conversation_details'])
+        await invalidate_children([conversation_data['conversation_details'].get('child_user_id')])
         
         return {
             "message": "Conversation received and saved successfully",
             "conversation_id": conversation.get('conversation_id') if conversation else None
         }
     except Exception as e:
-        logger.error(f"Error processing conversation: {str(e)}")
+        logger.error("Error processing conversation: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing conversation: {str(e)}"
         )
 
+@baseRouter.post("/conversations/{conversation_id}/turns")
+async def receive_conversation_turns(conversation_id: int, data: ConversationTurnsData, request: Request):
+    """
+    Appends new turns to the conversation's server-side transcript, assesses
+    the rebuilt window and saves the conversation, so the payload stays the
+    size of the new turns. Answers 409 with "expected_seq" when turns are
+    missing in between; the client resends from there.
+    """
+    if CONTEXT_STORE is None:
+        raise HTTPException(status_code=503, detail="The conversation context store is disabled")
+    if data.assess and RISK_GATEWAY is not None:
+        # before the append, so a limited client resends the same turns
+        check_risk_rate_limit(request)
+    try:
+        context, added = await CONTEXT_STORE.append(
+            conversation_id, data.seq, [turn.model_dump() for turn in data.turns], reset=data.reset,
+        )
+    except SequenceGap as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "expected_seq": e.expected_seq})
+    except Exception as e:
+        logger.error("Error appending conversation turns: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error appending conversation turns: {str(e)}")
+    context_chat, recent_chat = context.window(CONTEXT_STORE.recent_turns)
+
+    result, source = None, None
+    if data.assess and RISK_GATEWAY is not None and recent_chat:
+        try:
+            result, source = await RISK_GATEWAY.assess(context_chat, recent_chat, data.character_profile, data.user)
+        except RiskModelError as e:
+            logger.error("Error assessing risk: %s", e)
+            raise provider_error(e)
+
+    if data.child_user_id is not None and added:
+        conversation_details = {
+            'conversation_id': conversation_id,
+            'child_user_id': data.child_user_id,
+            'chatbot_id': data.chatbot_id,
+            'start_time': data.start_time,
+            'end_time': datetime.now().isoformat(),
+            'messages': context_chat,
+            'platform': data.platform,
+        }
+        if result:
+            conversation_details['conversation_topic'] = result["riskNotification"].get('conversation_topic')
+            conversation_details['conversation_summary'] = result["riskNotification"].get('conversation_summary')
+        try:
+            await write_conversations_and_invalidate([conversation_details])
+        except Exception as e:
+            logger.error("Error processing conversation: %s", e)
+            raise HTTPException(status_code=500, detail=f"Error processing conversation: {str(e)}")
+
+    return {
+        "conversation_id": conversation_id,
+        "next_seq": context.next_seq,
+        "added": added,
+        "recentChat": recent_chat,
+        "riskAssessment": result["riskAssessment"] if result else None,
+        "riskNotification": result["riskNotification"] if result else None,
+        "source": source,
+    }
+
 @baseRouter.post("/messages/receive")
 async def receive_message(messageData: MessageData, request: Request):
     try:
         # Prepare message details
-        message_details = {
-            'message_id': messageData.message_id,
-            'conversation_id': messageData.conversation_id,
-            'sender': messageData.sender,
-            'message_text': messageData.message_text,
-            'timestamp': messageData.timestamp or datetime.now().isoformat(),
-            'sender_type': messageData.sender_type
-        }
+        message_details = build_message_details(messageData)
+
+        log_event(logger, logging.INFO, "message.received", message_id=message_details.get('message_id'),
+                  conversation_id=message_details.get('conversation_id'), details=message_details)
+        if INGEST_QUEUE is not None:
+            duplicate_of = await enqueue_message(message_details)
+            if duplicate_of is not None:
+                return {
+                    "ok": True,
+                    "message": "Message already received",
+                    "message_id": duplicate_of,
+                    "duplicate": True
+                }
+            return {
+                "ok": True,
+                "message": "Message received and queued for saving",
+                "message_id": message_details['message_id']
+            }
 
-        logger.info(f"Received message data: {message_details}")
-        message = RDS_CLIENT.write_message(message_details)
+        message = await RDS_CLIENT.write_message(message_details)
+        if message and message.get('duplicate'):
+            return {
+                "ok": True,
+                "message": "Message already received",
+                "message_id": message.get('message_id'),
+                "duplicate": True
+            }
         
         return {    
             "ok": True,
             "message": "Message received successfully",
             "message_id": message.get('message_id') if message else None
         }
+    except IngestQueueFull as e:
+        raise ingest_queue_full(e)
     except Exception as e:
-        logger.error(f"Error processing message: {str(e)}")
+        logger.error("Error processing message: %s", e)
         return {
             "ok": False,
             "error": str(e),
@@ -336,55 +727,200 @@ async def receive_usage(usageData: UsageData, request: Request):
 
 
 # endpoints for parental control admin dashboard DB reads
+def parse_page_params(cursor: Optional[str], fields: Optional[str], allowed_fields: tuple) -> tuple:
+    """Validate the cursor and the comma-separated `fields` projection of a paged dashboard read."""
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if fields is None:
+        return allowed_fields
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in selected if field not in allowed_fields]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(allowed_fields)}")
+    return selected
+
+def page_cache_key(name: str, **params) -> str:
+    return name + ":" + json.dumps(params, sort_keys=True)
+
+# Without `limit` these return the full list as before; with it a page {"items", "next_cursor"}
 @baseRouter.get("/parental_control/get_all_conversations")
-async def get_all_conversations(request: Request):
-    return RDS_CLIENT.read_all_conversations(DUMMY_USER_ID)
+async def get_all_conversations(
+    request: Request,
+    parent_user_id: str = Depends(current_parent_user_id),
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    child_user_id: Optional[int] = None,
+    risk_level: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    platform: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    if limit is None and all(param is None for param in (cursor, child_user_id, risk_level, start_time, end_time, platform, fields)):
+        return await cached_read(parent_user_id, "read_all_conversations", lambda: RDS_CLIENT.read_all_conversations(parent_user_id))
+    selected = parse_page_params(cursor, fields, RISKY_EVENT_FIELDS)
+    params = dict(
+        limit=limit or 50, cursor=cursor, child_user_id=child_user_id, risk_level=risk_level,
+        start_time=start_time, end_time=end_time, platform=platform, fields=list(selected),
+    )
+    return await cached_read(parent_user_id, page_cache_key("read_risky_events_page", **params),
+                             lambda: RDS_CLIENT.read_risky_events_page(parent_user_id, **params))
 
 @baseRouter.get("/parental_control/get_all_convo")
-async def get_all_convo(request: Request):
-    return RDS_CLIENT.get_all_conversations(DUMMY_USER_ID)
+async def get_all_convo(
+    request: Request,
+    parent_user_id: str = Depends(current_parent_user_id),
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    child_user_id: Optional[int] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    platform: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    if limit is None and all(param is None for param in (cursor, child_user_id, start_time, end_time, platform, fields)):
+        return await cached_read(parent_user_id, "get_all_conversations", lambda: RDS_CLIENT.get_all_conversations(parent_user_id))
+    selected = parse_page_params(cursor, fields, CONVERSATION_FIELDS)
+    params = dict(
+        limit=limit or 50, cursor=cursor, child_user_id=child_user_id,
+        start_time=start_time, end_time=end_time, platform=platform, fields=list(selected),
+    )
+    return await cached_read(parent_user_id, page_cache_key("get_conversations_page", **params),
+                             lambda: RDS_CLIENT.get_conversations_page(parent_user_id, **params))
 
 @baseRouter.get("/parental_control/get_risky_event_by_id/{riskyEvent_id}")
-async def get_risky_event_by_id(riskyEvent_id: int):
-    return RDS_CLIENT.get_risky_event_by_id(riskyEvent_id)
+async def get_risky_event_by_id(
+    riskyEvent_id: int,
+    include_messages: bool = False,
+    parent_user_id: str = Depends(current_parent_user_id),
+):
+    event = await RDS_CLIENT.get_risky_event_by_id(riskyEvent_id, include_messages, parent_user_id)
+    if event is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Risky event not found")
+    return event
 
 # endpoints for parental control admin dashboard DB reads
 @baseRouter.get("/parental_control/get_conversation_times")
-async def get_conversation_times(request: Request):
-    return RDS_CLIENT.get_conversation_times(DUMMY_USER_ID)
+async def get_conversation_times(request: Request, parent_user_id: str = Depends(current_parent_user_id)):
+    return await cached_read(parent_user_id, "get_conversation_times", lambda: RDS_CLIENT.get_conversation_times(parent_user_id))
+
+@baseRouter.get("/parental_control/risk_summary")
+async def get_risk_summary(
+    request: Request,
+    parent_user_id: str = Depends(current_parent_user_id),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    child_user_id: Optional[int] = None,
+):
+    """Chart-ready risk counts per day, risk type and platform; defaults to the last 7 days."""
+    default_start, default_end = default_range()
+    start_date, end_date = start_date or default_start, end_date or default_end
+    try:
+        if date.fromisoformat(start_date) > date.fromisoformat(end_date):
+            raise ValueError("start_date is after end_date")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date range: {str(e)}")
+
+    async def load():
+        buckets = await RDS_CLIENT.get_risk_summary(parent_user_id, start_date, end_date, child_user_id)
+        return summarize_buckets(buckets, start_date, end_date)
+    key = page_cache_key("risk_summary", start_date=start_date, end_date=end_date, child_user_id=child_user_id)
+    return await cached_read(parent_user_id, key, load)
+
+@baseRouter.get("/parental_control/search")
+async def search(
+    request: Request,
+    q: str = Query(max_length=200),
+    parent_user_id: str = Depends(current_parent_user_id),
+    kinds: Optional[str] = None,
+    child_user_id: Optional[int] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0, le=1000),
+):
+    """Messages, conversations and risky events of the parent's children matching `q`, best match first."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search query")
+    selected = tuple(kind.strip() for kind in (kinds or ",".join(SEARCH_KINDS)).split(",") if kind.strip())
+    unknown = [kind for kind in selected if kind not in SEARCH_KINDS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown kinds: {', '.join(unknown)}; allowed: {', '.join(SEARCH_KINDS)}")
+    # not through the read cache: message writes do not invalidate it, and new messages should be found at once
+    results = await RDS_CLIENT.search(parent_user_id, q, list(selected), child_user_id, limit, offset)
+    return {"query": q, "results": results}
+
+@baseRouter.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats(request: Request):
+    return READ_CACHE.stats() if READ_CACHE is not None else {"enabled": False}
+
+# endpoints for family management; the parent is always the caller
+async def check_child(child_user_id, parent_user_id: str) -> None:
+    try:
+        parent_user_ids = await RDS_CLIENT.get_parent_user_ids([int(child_user_id)])
+    except ValueError:
+        parent_user_ids = []
+    if str(parent_user_id) not in {str(parent) for parent in parent_user_ids}:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to manage another parent's children")
 
-# endpoints for family management
 @baseRouter.get("/family/get_all_children")
-async def get_all_children(request: Request):
-    return RDS_CLIENT.get_all_children(DUMMY_USER_ID)
+async def get_all_children(request: Request, parent_user_id: str = Depends(current_parent_user_id)):
+    return await cached_read(parent_user_id, "get_all_children", lambda: RDS_CLIENT.get_all_children(parent_user_id))
 @baseRouter.post("/family/add_child")
-async def add_child(data: AddChildData, request: Request):
-    return RDS_CLIENT.add_child(data.parent_user_id, data.child_name, data.child_age)
+async def add_child(data: AddChildData, request: Request, parent_user_id: str = Depends(current_parent_user_id)):
+    result = await RDS_CLIENT.add_child(parent_user_id, data.child_name, data.child_age)
+    await invalidate_parents([parent_user_id])
+    return result
 @baseRouter.post("/family/remove_child")
-async def remove_child(data: RemoveChildData, request: Request):
-    return RDS_CLIENT.remove_child(data.parent_user_id, data.child_user_id)
+async def remove_child(data: RemoveChildData, request: Request, parent_user_id: str = Depends(current_parent_user_id)):
+    result = await RDS_CLIENT.remove_child(parent_user_id, data.child_user_id)
+    await invalidate_parents([parent_user_id])
+    return result
 @baseRouter.post("/family/rename_child")
-async def rename_child(data: RenameChildData, request: Request):
-    return RDS_CLIENT.rename_child(data.child_user_id, data.new_name)
+async def rename_child(data: RenameChildData, request: Request, parent_user_id: str = Depends(current_parent_user_id)):
+    await check_child(data.child_user_id, parent_user_id)
+    result = await RDS_CLIENT.rename_child(data.child_user_id, data.new_name)
+    await invalidate_children([data.child_user_id])
+    return result
 
 
 @baseRouter.post("/notify/email")
 async def send_email_notification_endpoint(data: EmailNotificationData, request: Request):
     try:
+        if EMAIL_DISPATCHER is None:
+            raise Exception("SMTP is not configured")
+        if NOTIFIER is not None:
+            # several calls for the same child within the window become one digest
+            NOTIFIER.add(data.email, data.child_name, data.email, data.child_name, PendingAlert(
+                risk_type="AI chat risk", risk_level=data.risk_level, reason="", link=data.redirect_url,
+            ))
+            return {"message": "Email notification queued for sending"}
+
         subject = f"AI Chat Risk Notification for {data.child_name}"
         body = f"Dear Parent,\n\nWe have detected a {data.risk_level} risk level in your child's AI chat activities. \n\nPlease click the following link to view the conversation: {data.redirect_url}\n\nBest regards,\YouthSafeAgent Team"
+        EMAIL_DISPATCHER.submit(data.email, subject, body)
         
-        send_email_notification(data.email, subject, body)
-        
-        return {"message": "Email notification sent successfully"}
+        return {"message": "Email notification queued for sending"}
+    except EmailQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
+        logger.error("Error sending email: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error sending email: {str(e)}"
         )
 
 
+@baseRouter.get("/notify/stats", dependencies=[Depends(require_admin)])
+async def notify_stats(request: Request):
+    if EMAIL_DISPATCHER is None:
+        return {"enabled": False}
+    stats = EMAIL_DISPATCHER.stats()
+    if NOTIFIER is not None:
+        stats["digests"] = NOTIFIER.stats()
+    return stats
+
 @baseRouter.get("/testing/email_send")
 async def testing_email_send(request: Request):
     await send_email_notification_endpoint(EmailNotificationData(
@@ -393,24 +929,18 @@ async def testing_email_send(request: Request):
         risk_level="High",
         redirect_url="http://localhost:3000/#"
     ), request)
-    return {"message": "Email sent successfully"}
+    return {"message": "Email queued successfully"}
 
 @baseRouter.post("/chatbots/receive")
 async def receive_chatbot(chatbotData: ChatbotData, request: Request):
     try:
-        # Log the incoming data
-        logger.info(f"Received chatbot data: {chatbotData}")
+        log_event(logger, logging.INFO, "chatbot.received", chatbot_id=chatbotData.chatbot_id, payload=chatbotData)
 
         # Prepare chatbot data for insertion
-        chatbot_data = {
-            "chatbot_id": chatbotData.chatbot_id,
-            "name": chatbotData.name,
-            "metadata": json.dumps(chatbotData.metadata),  # Convert dict to JSON string
-            "chatbotPlatform": chatbotData.chatbotPlatform
-        }
+        chatbot_data = build_chatbot_data(chatbotData)
 
         # Write to chatbots table
-        response = RDS_CLIENT.write_chatbot(chatbot_data)
+        response = await RDS_CLIENT.write_chatbot(chatbot_data)
         
         return Response(
             content=json.dumps({
@@ -422,7 +952,7 @@ async def receive_chatbot(chatbotData: ChatbotData, request: Request):
             status_code=200
         )
     except Exception as e:
-        logger.error(f"Error processing chatbot: {str(e)}")
+        logger.error("Error processing chatbot: %s", e)
         return Response(
             content=json.dumps({
                 "ok": False,
@@ -434,3 +964,125 @@ async def receive_chatbot(chatbotData: ChatbotData, request: Request):
         )
 
 
+# batched ingest: record type -> (pydantic model, details builder, bulk writer, id column)
+INGEST_TYPES = {
+    "chatbot": (ChatbotData, build_chatbot_data, RDS_CLIENT.write_chatbots, "chatbot_id"),
+    "conversation": (ConversationData, lambda data: data.model_dump(exclude={"user"}), write_conversations_and_invalidate, "conversation_id"),
+    "message": (MessageData, build_message_details, RDS_CLIENT.write_messages, "message_id"),
+    "alert": (AlertData, lambda data: parse_alert_details(data.alert_details), write_alerts_and_invalidate, "risky_event_id"),
+}
+# chatbots and conversations first so the foreign keys of later tables resolve
+INGEST_WRITE_ORDER = ["chatbot", "conversation", "message", "alert"]
+
+@baseRouter.post("/ingest/batch")
+async def ingest_batch(batch: IngestBatchData, request: Request):
+    """
+    Validate a list of mixed alert/conversation/message/chatbot records and
+    write each table with one bulk upsert. Returns a status per record, in
+    request order.
+    """
+    results = [None] * len(batch.records)
+    grouped = {record_type: [] for record_type in INGEST_WRITE_ORDER}
+
+    for index, record in enumerate(batch.records):
+        if record.type not in INGEST_TYPES:
+            results[index] = {"index": index, "type": record.type, "ok": False, "error": f"Unknown record type: {record.type}"}
+            continue
+        model, build_details, _, _ = INGEST_TYPES[record.type]
+        try:
+            grouped[record.type].append((index, build_details(model(**record.data))))
+        except (ValidationError, ValueError) as e:
+            # also invalid JSON and alert_details that is not an object
+            results[index] = {"index": index, "type": record.type, "ok": False, "error": str(e)}
+
+    for record_type in INGEST_WRITE_ORDER:
+        entries = grouped[record_type]
+        if not entries:
+            continue
+        if INGEST_QUEUE is not None and record_type in ("message", "alert"):
+            for index, details in entries:
+                try:
+                    if record_type == "message":
+                        duplicate_of = await enqueue_message(details)
+                        if duplicate_of is not None:
+                            results[index] = {"index": index, "type": record_type, "ok": True, "duplicate": True, "id": duplicate_of}
+                            continue
+                    else:
+                        enqueue_alert(details)
+                    record_id = details.get("message_id" if record_type == "message" else "risk_event_id")
+                    results[index] = {"index": index, "type": record_type, "ok": True, "queued": True, "id": record_id}
+                except IngestQueueFull as e:
+                    results[index] = {"index": index, "type": record_type, "ok": False, "error": str(e)}
+            continue
+        _, _, write_bulk, id_key = INGEST_TYPES[record_type]
+        try:
+            rows = await write_bulk([details for _, details in entries])
+            for (index, _), row in zip(entries, rows):
+                results[index] = {"index": index, "type": record_type, "ok": True, "id": row.get(id_key)}
+                if row.get("duplicate"):
+                    results[index]["duplicate"] = True
+        except Exception as e:
+            logger.error("Error ingesting %s records: %s", record_type, e)
+            for index, _ in entries:
+                results[index] = {"index": index, "type": record_type, "ok": False, "error": str(e)}
+
+    return {"ok": all(result["ok"] for result in results), "results": results}
+
+@baseRouter.get("/ingest/stats", dependencies=[Depends(require_admin)])
+async def ingest_stats(request: Request):
+    stats = INGEST_QUEUE.stats() if INGEST_QUEUE is not None else {"enabled": False}
+    if RDS_CLIENT.message_dedup is not None:
+        stats["message_dedup"] = RDS_CLIENT.message_dedup.stats()
+    if CONTEXT_STORE is not None:
+        stats["context_store"] = CONTEXT_STORE.stats()
+    return stats
+
+# live feed of new risky events for the parent dashboard
+@baseRouter.websocket("/parental_control/stream")
+async def risk_event_stream(websocket: WebSocket):
+    """
+    Sends {"type": "risky_event", "data": {...}} for every risky event written
+    for the parent's children, and {"type": "ping"} when the stream is idle so
+    proxies keep the connection open. Clients only listen.
+    """
+    # browsers cannot set headers on a WebSocket, so the token may come as ?token=
+    authorization = websocket.headers.get("Authorization")
+    token = authorization.removeprefix("Bearer ").strip() if authorization else websocket.query_params.get("token")
+    try:
+        parent_user_id = (await app_user_from_token(token))["user_id"]
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    with EVENT_BROKER.subscribe(parent_user_id) as subscription:
+        async def send_events():
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), app_settings.event_stream_heartbeat)
+                except asyncio.TimeoutError:
+                    message = {"type": "ping"}
+                await websocket.send_json(message)
+
+        async def wait_for_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        tasks = {asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())}
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                logger.info("Risk event stream closed: %s", task.exception())
+
+@baseRouter.get("/stream/stats", dependencies=[Depends(require_admin)])
+async def stream_stats(request: Request):
+    return EVENT_BROKER.stats()
+
+@baseRouter.get("/auth/stats", dependencies=[Depends(require_admin)])
+async def auth_stats(request: Request):
+    stats = TOKEN_VERIFIER.cache.stats() if TOKEN_VERIFIER.cache is not None else {"enabled": False}
+    stats["app_users"] = APP_USERS.stats()
+    return stats
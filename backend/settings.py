@@ -7,16 +7,106 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = Field(default=None, validation_alias="OPENAI_API_KEY")
     openai_api_base: Optional[str] = Field(default=None, validation_alias="OPENAI_API_BASE")
     jwt_secret: str = Field(default=None, validation_alias="SUPABASE_JWT_SECRET")
-    supabase_url: str = Field(default=None, validation_alias="SUPABASE_URL")
-    supabase_service_key: str = Field(default=None, validation_alias="SUPABASE_SERVICE_KEY")
-    # SMTP server settings
-    smtp_host: str = Field(default=None, validation_alias="SMTP_HOST")
-    smtp_port: str = Field(default=None, validation_alias="SMTP_PORT")
-    smtp_user: str = Field(default=None, validation_alias="SMTP_USER")
-    smtp_password: str = Field(default=None, validation_alias="SMTP_PASSWORD")
-    smtp_from: str = Field(default=None, validation_alias="SMTP_FROM")
-    smtp_sender_name: str = Field(default=None, validation_alias="SMTP_SENDER_NAME")
-    
+    # Supabase project; not needed with STORAGE_BACKEND=sqlite
+    supabase_url: Optional[str] = Field(default=None, validation_alias="SUPABASE_URL")
+    supabase_service_key: Optional[str] = Field(default=None, validation_alias="SUPABASE_SERVICE_KEY")
+    # verified access tokens remembered per worker until they expire
+    auth_token_cache_size: int = Field(default=10000, validation_alias="AUTH_TOKEN_CACHE_SIZE")
+    # local development only: requests without a token act as this parent user
+    auth_dev_user_id: Optional[str] = Field(default=None, validation_alias="AUTH_DEV_USER_ID")
+    # SMTP server settings; without SMTP_HOST no emails are sent
+    smtp_host: Optional[str] = Field(default=None, validation_alias="SMTP_HOST")
+    smtp_port: Optional[str] = Field(default=None, validation_alias="SMTP_PORT")
+    smtp_user: Optional[str] = Field(default=None, validation_alias="SMTP_USER")
+    smtp_password: Optional[str] = Field(default=None, validation_alias="SMTP_PASSWORD")
+    smtp_from: Optional[str] = Field(default=None, validation_alias="SMTP_FROM")
+    smtp_sender_name: Optional[str] = Field(default=None, validation_alias="SMTP_SENDER_NAME")
+    smtp_starttls: bool = Field(default=True, validation_alias="SMTP_STARTTLS")
+    # pooled SMTP sessions and background email queue (app/services/email.py)
+    smtp_pool_size: int = Field(default=2, validation_alias="SMTP_POOL_SIZE")
+    smtp_max_batch: int = Field(default=20, validation_alias="SMTP_MAX_BATCH")
+    smtp_max_attempts: int = Field(default=5, validation_alias="SMTP_MAX_ATTEMPTS")
+    smtp_max_pending: int = Field(default=10000, validation_alias="SMTP_MAX_PENDING")
+    # risk alert emails: one digest per (parent, child) per window, at most NOTIFY_MAX_PER_HOUR per parent
+    notify_alert_emails: bool = Field(default=True, validation_alias="NOTIFY_ALERT_EMAILS")
+    notify_min_risk_level: str = Field(default="high", validation_alias="NOTIFY_MIN_RISK_LEVEL")
+    notify_coalesce_window: float = Field(default=300.0, validation_alias="NOTIFY_COALESCE_WINDOW")
+    notify_max_per_hour: int = Field(default=6, validation_alias="NOTIFY_MAX_PER_HOUR")
+    notify_dashboard_url: str = Field(default="http://localhost:3000/#", validation_alias="NOTIFY_DASHBOARD_URL")
+    # logging (app/services/log_utils.py): LOG_SAMPLE_RATES="message.received=0.01,..." samples INFO events
+    log_level: str = Field(default="INFO", validation_alias="LOG_LEVEL")
+    log_queued: bool = Field(default=True, validation_alias="LOG_QUEUED")
+    log_sample_rates: str = Field(default="", validation_alias="LOG_SAMPLE_RATES")
+    log_max_field_chars: int = Field(default=200, validation_alias="LOG_MAX_FIELD_CHARS")
+    # opt-in slow request profiling: sample this fraction of requests, keep profiles of those over PROFILE_SLOW_MS
+    profile_sample_rate: float = Field(default=0.0, validation_alias="PROFILE_SAMPLE_RATE")
+    profile_slow_ms: float = Field(default=500.0, validation_alias="PROFILE_SLOW_MS")
+    profile_dir: str = Field(default="profiles", validation_alias="PROFILE_DIR")
+    # drop re-sent message texts per conversation; MESSAGE_DEDUP_PERSISTENT also relies on db_utils/sql/message_dedup.sql
+    message_dedup_enabled: bool = Field(default=True, validation_alias="MESSAGE_DEDUP_ENABLED")
+    message_dedup_per_conversation: int = Field(default=256, validation_alias="MESSAGE_DEDUP_PER_CONVERSATION")
+    message_dedup_max_conversations: int = Field(default=10000, validation_alias="MESSAGE_DEDUP_MAX_CONVERSATIONS")
+    message_dedup_persistent: bool = Field(default=False, validation_alias="MESSAGE_DEDUP_PERSISTENT")
+    # storage backend: "supabase", or "sqlite" for a local database file (offline mode, load tests)
+    storage_backend: str = Field(default="supabase", validation_alias="STORAGE_BACKEND")
+    storage_sqlite_path: str = Field(default="youthsafe.sqlite3", validation_alias="STORAGE_SQLITE_PATH")
+    # ID allocation ("supabase" uses the reserve_id_block RPC, "sqlite" a local counter file)
+    id_allocator_backend: str = Field(default="supabase", validation_alias="ID_ALLOCATOR_BACKEND")
+    id_allocator_block_size: int = Field(default=50, validation_alias="ID_ALLOCATOR_BLOCK_SIZE")
+    id_allocator_sqlite_path: str = Field(default="id_counters.sqlite3", validation_alias="ID_ALLOCATOR_SQLITE_PATH")
+    # join related tables with PostgREST embedded selects (falls back automatically if the FKs are missing)
+    supabase_embedded_joins: bool = Field(default=True, validation_alias="SUPABASE_EMBEDDED_JOINS")
+    # recently written chatbot payloads remembered per worker
+    chatbot_cache_size: int = Field(default=10000, validation_alias="CHATBOT_CACHE_SIZE")
+    # per-parent dashboard read cache (set READ_CACHE_SQLITE_PATH to share it between workers)
+    read_cache_enabled: bool = Field(default=True, validation_alias="READ_CACHE_ENABLED")
+    read_cache_ttl: float = Field(default=30.0, validation_alias="READ_CACHE_TTL")
+    read_cache_max_entries: int = Field(default=1000, validation_alias="READ_CACHE_MAX_ENTRIES")
+    read_cache_sqlite_path: Optional[str] = Field(default=None, validation_alias="READ_CACHE_SQLITE_PATH")
+    # incremental per-day risk counts for the dashboard charts (db_utils/sql/risk_summary.sql)
+    risk_summary_enabled: bool = Field(default=True, validation_alias="RISK_SUMMARY_ENABLED")
+    # full-text index behind GET /parental_control/search (db_utils/sql/search_index.sql), kept current on every write
+    search_index_enabled: bool = Field(default=True, validation_alias="SEARCH_INDEX_ENABLED")
+    # push of new risky events to dashboard WebSockets (set EVENT_STREAM_SOCKET_DIR to fan out across workers)
+    event_stream_socket_dir: Optional[str] = Field(default=None, validation_alias="EVENT_STREAM_SOCKET_DIR")
+    event_stream_queue_size: int = Field(default=100, validation_alias="EVENT_STREAM_QUEUE_SIZE")
+    event_stream_heartbeat: float = Field(default=25.0, validation_alias="EVENT_STREAM_HEARTBEAT")
+    # write-behind buffering of message and alert ingest
+    ingest_write_behind: bool = Field(default=True, validation_alias="INGEST_WRITE_BEHIND")
+    ingest_max_batch: int = Field(default=200, validation_alias="INGEST_MAX_BATCH")
+    ingest_flush_interval: float = Field(default=0.5, validation_alias="INGEST_FLUSH_INTERVAL")
+    ingest_max_pending: int = Field(default=10000, validation_alias="INGEST_MAX_PENDING")
+    ingest_spool_dir: Optional[str] = Field(default=None, validation_alias="INGEST_SPOOL_DIR")
+    ingest_max_attempts: int = Field(default=3, validation_alias="INGEST_MAX_ATTEMPTS")
+    # compression of transcript columns (db_utils/text_codec.py): "zlib" or "none"; dictionaries are comma-separated files
+    text_codec: str = Field(default="zlib", validation_alias="TEXT_CODEC")
+    text_codec_min_size: int = Field(default=512, validation_alias="TEXT_CODEC_MIN_SIZE")
+    text_codec_level: int = Field(default=6, validation_alias="TEXT_CODEC_LEVEL")
+    text_codec_dictionaries: Optional[str] = Field(default=None, validation_alias="TEXT_CODEC_DICTIONARIES")
+    # rolling transcripts for POST /conversations/{id}/turns (db_utils/sql/conversation_context.sql); 0 turns disables it
+    context_store_max_turns: int = Field(default=50, validation_alias="CONTEXT_STORE_MAX_TURNS")
+    context_store_max_conversations: int = Field(default=10000, validation_alias="CONTEXT_STORE_MAX_CONVERSATIONS")
+    context_store_recent_turns: int = Field(default=2, validation_alias="CONTEXT_STORE_RECENT_TURNS")
+    # /risk/assess model: "dify", "openai" (uses OPENAI_API_BASE and OPENAI_API_KEY) or "stub"
+    risk_model_provider: str = Field(default="dify", validation_alias="RISK_MODEL_PROVIDER")
+    risk_dify_url: str = Field(default="https://api.dify.ai/v1/workflows/run", validation_alias="RISK_DIFY_URL")
+    risk_dify_api_key: Optional[str] = Field(default=None, validation_alias="RISK_DIFY_API_KEY")
+    risk_openai_model: str = Field(default="gpt-4o-mini", validation_alias="RISK_OPENAI_MODEL")
+    risk_model_timeout: float = Field(default=60.0, validation_alias="RISK_MODEL_TIMEOUT")
+    risk_model_max_attempts: int = Field(default=3, validation_alias="RISK_MODEL_MAX_ATTEMPTS")
+    risk_stub_latency: float = Field(default=0.0, validation_alias="RISK_STUB_LATENCY")
+    # assessment results cached per worker, and model calls in flight per worker
+    risk_cache_size: int = Field(default=10000, validation_alias="RISK_CACHE_SIZE")
+    risk_cache_ttl: float = Field(default=3600.0, validation_alias="RISK_CACHE_TTL")
+    risk_max_concurrency: int = Field(default=8, validation_alias="RISK_MAX_CONCURRENCY")
+    # assessments each client IP may request per window, per worker; 0 disables the limit
+    risk_rate_limit: int = Field(default=60, validation_alias="RISK_RATE_LIMIT")
+    risk_rate_window: float = Field(default=60.0, validation_alias="RISK_RATE_WINDOW")
+    # local pre-screen (app/services/prescreen.py): windows scoring below the threshold skip the model
+    risk_prescreen_enabled: bool = Field(default=False, validation_alias="RISK_PRESCREEN_ENABLED")
+    risk_prescreen_threshold: float = Field(default=0.3, validation_alias="RISK_PRESCREEN_THRESHOLD")
+    risk_prescreen_weights: Optional[str] = Field(default=None, validation_alias="RISK_PRESCREEN_WEIGHTS")
+
     model_config = SettingsConfigDict(
         env_file=".env",
         extra="ignore",
@@ -1,2 +1,4 @@
 #!/bin/bash
+# workers share risk stream events through Unix sockets in this directory
+export EVENT_STREAM_SOCKET_DIR=${EVENT_STREAM_SOCKET_DIR:-/tmp/youthsafe-event-stream}
 gunicorn -k uvicorn.workers.UvicornH11Worker --workers 9 main:app --bind 0.0.0.0:8321 --access-logfile - --error-logfile - --capture-output --timeout 120
\ No newline at end of file
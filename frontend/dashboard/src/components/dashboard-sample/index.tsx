@@ -1,6 +1,6 @@
 'use client';
 
-import React, { useState, useEffect, useMemo } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { BarChart, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, Bar } from "recharts";
 import { Button } from "@/components/ui/button";
@@ -12,9 +12,7 @@ import { Alert, AlertDescription } from "@/components/ui/alert";
 import { AlertCircle, Home, AlertTriangle, MessageCircle, Settings } from 'lucide-react';
 import Reports from '@/components/reportpage';
 import Conversations from '@/components/conversationpage';
-import { useApi } from "@/controller/API";
-import supabase from "../../stores/supabaseClient";
-import { subscribeToRiskEvents } from "../../stores/supabaseClient";
+import { useApi, subscribeToRiskStream } from "@/controller/API";
 import RiskTypePieChart from '../riskPieChart';
 import { Info } from "lucide-react";
 import {
@@ -25,7 +23,6 @@ import {
 } from "@/components/ui/navigation-menu";
 import { useToast } from "@/hooks/use-toast";
 import { useAppStore } from '@/stores/appStore';
-import { RealtimePostgresInsertPayload } from '@supabase/supabase-js';
 
 interface ConversationData {
   riskyEvent_id: number;
@@ -235,9 +232,11 @@ export default function Dashboard() {
   const [newEmail, setNewEmail] = useState('');
   const [newPassword, setNewPassword] = useState('');
   const [error, setError] = useState('');
-  const { getAllConversations, sendEmailNotification } = useApi();
+  const { getAllConversations, getRiskSummary, sendEmailNotification } = useApi();
   const [totalUsageTime, setTotalUsageTime] = useState<number | null>(null);
   const [conversationCount, setConversationCount] = useState(0);
+  const [briefData, setBriefData] = useState<BriefData[]>([]);
+  const [riskTypeDistribution, setRiskTypeDistribution] = useState<{ name: string; value: number }[]>([]);
 
   const { conversations, setConversations, addConversations, showAlert, setShowAlert, clearAlert } = useAppStore();
 
@@ -304,10 +303,9 @@ export default function Dashboard() {
 
     fetchConversations();
 
-    // Realtime subscription
-    const channel = subscribeToRiskEvents((payload: RealtimePostgresInsertPayload<ConversationData>) => {
-      console.log("Realtime event received:", payload);
-      const newConversation = payload.new;
+    // Risk events pushed by the backend as they are ingested
+    const stream = subscribeToRiskStream((newConversation) => {
+      console.log("Risk event received:", newConversation);
       if (newConversation.riskLevel?.toLowerCase() === "high") {
         setShowAlert(true);
       }
@@ -325,48 +323,33 @@ export default function Dashboard() {
 
     // Cleanup the subscription on unmount
     return () => {
-      channel.unsubscribe();
-      console.log("Unsubscribed from realtime updates.");
+      stream.close();
+      console.log("Unsubscribed from risk event stream.");
     };
   }, []);
 
 
 
-  // Calculate risk summary data for the last 7 days
-  const briefData: BriefData[] = useMemo(() => {
-    const today = new Date();
-    const last7Days = Array.from({ length: 7 }, (_, i) => {
-      const date = new Date();
-      date.setDate(today.getDate() - i);
-      return date.toISOString().split("T")[0];
-    }).reverse();
-
-    const riskData: BriefData[] = last7Days.map((date) => ({
-      date,
-      lowRisk: 0,
-      mediumRisk: 0,
-      highRisk: 0,
-      riskTypeCount: {},
-    }));
-
-
-
-    conversations.forEach((conversation) => {
-      const conversationDate = new Date(conversation.timestamp)
-        .toISOString()
-        .split("T")[0];
-      const riskLevel = conversation.riskLevel.toLowerCase();
-      const riskType = conversation.riskType || "Unknown";
-      const riskEntry = riskData.find((entry) => entry.date === conversationDate);
-      if (riskEntry) {
-        if (riskLevel === "low") riskEntry.lowRisk++;
-        if (riskLevel === "medium") riskEntry.mediumRisk++;
-        if (riskLevel === "high") riskEntry.highRisk++;
-        riskEntry.riskTypeCount[riskType] = (riskEntry.riskTypeCount[riskType] || 0) + 1;
-      }
-    });
+  // Fetch the risk summary for the last 7 days (aggregated by the backend)
+  const fetchRiskSummary = async () => {
+    try {
+      const today = new Date();
+      const sixDaysAgo = new Date();
+      sixDaysAgo.setDate(today.getDate() - 6);
+      const summary = await getRiskSummary(
+        sixDaysAgo.toISOString().split("T")[0],
+        today.toISOString().split("T")[0]
+      );
+      setBriefData(summary.days);
+      setRiskTypeDistribution(summary.riskTypeDistribution);
+    } catch (error) {
+      console.error("Error fetching risk summary:", error);
+    }
+  };
 
-    return riskData;
+  // Refresh the summary whenever a new risk event arrives
+  useEffect(() => {
+    fetchRiskSummary();
   }, [conversations]);
 
   const todayData = briefData.reduce(
@@ -378,19 +361,6 @@ export default function Dashboard() {
     { lowRisk: 0, mediumRisk: 0, highRisk: 0 } // Initial values
   );
 
-  const riskTypeDistribution = useMemo(() => {
-    const riskTypeMap: Record<string, number> = {};
-
-    briefData.forEach((day) => {
-      Object.entries(day.riskTypeCount).forEach(([riskType, count]) => {
-        riskTypeMap[riskType] = (riskTypeMap[riskType] || 0) + count;
-      });
-    });
-
-    // Convert the map into an array format suitable for the PieChart
-    return Object.entries(riskTypeMap).map(([name, value]) => ({ name, value }));
-  }, [briefData]);
-
   const handleLogin = (e: React.FormEvent) => {
     e.preventDefault();
     if (loginEmail && loginPassword) {
@@ -57,7 +57,6 @@ export default function FamilyManagement() {
   }
 
   const dummy_parent = {
-    id: "1",
     name: "parent_john"
   }
 
@@ -174,7 +173,6 @@ export default function FamilyManagement() {
     }
 
     addChild({
-      parent_user_id: dummy_parent.id,
       child_name: newChildName,
       child_age: parseInt(newChildAge),
     });
@@ -184,7 +182,7 @@ export default function FamilyManagement() {
   };
 
   const handleDeleteChild = (id: string) => {
-    removeChild({ parent_user_id: dummy_parent.id, child_user_id: id.toString() });
+    removeChild({ child_user_id: id.toString() });
     setIsLoading(true);
   }
 
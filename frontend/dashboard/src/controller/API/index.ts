@@ -5,6 +5,7 @@ import { useCallback } from "react";
 import axios, { AxiosResponse } from "axios";
 
 import { toast } from "@/hooks/use-toast";
+import { useAuthStore } from "@/stores/authStore";
 
 export interface ConvoData {
   conversation_id: number;
@@ -36,6 +37,23 @@ export interface ConversationTimes {
   end_time: string;
 }
 
+export interface RiskSummaryDay {
+  date: string;
+  lowRisk: number;
+  mediumRisk: number;
+  highRisk: number;
+  riskTypeCount: Record<string, number>;
+}
+
+export interface RiskSummary {
+  start_date: string;
+  end_date: string;
+  total: number;
+  days: RiskSummaryDay[];
+  riskTypeDistribution: { name: string; value: number }[];
+  platformDistribution: { name: string; value: number }[];
+}
+
 export interface EmailNotificationData {
   email: string;
   child_name: string;
@@ -43,14 +61,13 @@ export interface EmailNotificationData {
   redirect_url: string;
 }
 
+// the parent is the signed-in user, taken from the access token
 export interface AddChildData {
-  parent_user_id: string;
   child_name: string;
   child_age: number;
 } 
 
 export interface RemoveChildData {
-  parent_user_id: string;
   child_user_id: string;
 }
 
@@ -59,6 +76,50 @@ export interface RenameChildData {
   new_name: string;
 }
 
+export interface RiskEventMessage {
+  type: "risky_event" | "ping";
+  data?: ConversationData;
+}
+
+// Subscribe to new risky events pushed by the backend; reconnects with backoff until closed.
+export function subscribeToRiskStream(onEvent: (event: ConversationData) => void) {
+  let socket: WebSocket | null = null;
+  let closed = false;
+  let retryDelay = 1000;
+
+  const connect = () => {
+    const protocol = window.location.protocol === "https:" ? "wss" : "ws";
+    // browsers cannot set headers on a WebSocket, so the token goes in the query string
+    const token = useAuthStore.getState().token ?? "";
+    socket = new WebSocket(
+      `${protocol}://${window.location.host}/api/v1/parental_control/stream?token=${encodeURIComponent(token)}`
+    );
+    socket.onopen = () => {
+      retryDelay = 1000;
+    };
+    socket.onmessage = (message) => {
+      const payload: RiskEventMessage = JSON.parse(message.data);
+      if (payload.type === "risky_event" && payload.data) {
+        onEvent(payload.data);
+      }
+    };
+    socket.onclose = () => {
+      if (!closed) {
+        setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      }
+    };
+  };
+
+  connect();
+  return {
+    close: () => {
+      closed = true;
+      socket?.close();
+    },
+  };
+}
+
 export function useApi() {
   // Helper function for standardized API calls with error handling
   const apiCall = async <T>(
@@ -67,8 +128,9 @@ export function useApi() {
     data: any, 
     additionalHeaders: Record<string, string> = {}
   ): Promise<AxiosResponse<T>> => {
-    // prepare headers
-    const headers = {};
+    // prepare headers; the backend resolves the parent user from the bearer token
+    const token = useAuthStore.getState().token;
+    const headers: Record<string, string> = token ? { Authorization: `Bearer ${token}` } : {};
 
     // Merge additional headers, overriding existing ones if necessary
     const finalHeaders = { ...headers, ...additionalHeaders };
@@ -128,6 +190,24 @@ export function useApi() {
     }
   }
 
+  // Per-day risk counts aggregated by the backend (dates are inclusive, YYYY-MM-DD)
+  const getRiskSummary = async (startDate?: string, endDate?: string) : Promise<RiskSummary> => {
+    try {
+      const params = new URLSearchParams();
+      if (startDate) params.append("start_date", startDate);
+      if (endDate) params.append("end_date", endDate);
+      const response = await apiCall<RiskSummary>(
+        `api/v1/parental_control/risk_summary?${params.toString()}`, // URL
+        "GET", // HTTP method
+        null // No data needed for GET request
+      );
+      return response.data;
+    } catch (error) {
+      console.error("Error fetching risk summary:", error);
+      throw error;
+    }
+  };
+
   const getRiskyEventById = async (id: number): Promise<ConversationData> => {
     try {
       const response = await apiCall<ConversationData>(
@@ -181,6 +261,7 @@ export function useApi() {
     getAllConversations,
     getRiskyEventById,
     getConversationTimes,
+    getRiskSummary,
     getAllConvo,
     sendEmailNotification,
     getAllChildren,